@@ -1,6 +1,9 @@
+import os
+import threading
 import streamlit as st
 from social_media_generator import SocialMediaPostGenerator
-from datetime import datetime
+from job_queue import FINISHED, JobWorker
+from history_view import HistoryView
 
 # Set page config
 st.set_page_config(page_title="AI Social Media Post Generator", page_icon="✨", layout="centered")
@@ -80,9 +83,90 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize session state
-if 'generator' not in st.session_state:
-    st.session_state.generator = SocialMediaPostGenerator()
+@st.cache_resource
+def shared_generator() -> SocialMediaPostGenerator:
+    """One generator per server process, shared by every session and the job workers."""
+    return SocialMediaPostGenerator()
+
+@st.cache_resource
+def shared_history_view() -> HistoryView:
+    """The History tab's rendered pages, shared by every session and refreshed when the history changes."""
+    return HistoryView(shared_generator().history_store)
+
+@st.cache_resource
+def start_job_workers(count: int) -> threading.Event:
+    """Start the job worker threads once per server process. Set the returned event to stop them."""
+    generator = shared_generator()
+    stop = threading.Event()
+    for i in range(count):
+        worker = JobWorker(generator.job_queue, generator, name=f"app-{os.getpid()}-{i}", stream=True)
+        threading.Thread(target=worker.run, args=(stop,), name=f"job-worker-{i}", daemon=True).start()
+    return stop
+
+# Posts are generated by job workers so a slow post doesn't block the page and
+# survives a refresh. The workers stream each post into its job, so the page
+# can show the text as it arrives. JOB_WORKERS=0 leaves the queue to
+# `--workers` processes, which don't stream.
+job_workers = int(os.getenv('JOB_WORKERS', '2'))
+if job_workers > 0:
+    start_job_workers(job_workers)
+
+def show_post(result):
+    """Show a finished post with its thread and image suggestions."""
+    metadata = result['metadata']
+    st.markdown(f"### 📝 Generated Post <span class='language-badge'>{metadata.get('language', 'EN')}</span>",
+                unsafe_allow_html=True)
+    post_class = "tiktok-post" if metadata['platform'] == "TikTok" else ""
+    content_html = result['content'].replace('\n', '<br>')
+    st.markdown(f"""
+    <div class="post-container {post_class}">
+    {content_html}
+    </div>
+    """, unsafe_allow_html=True)
+    
+    if result.get('thread'):
+        st.subheader("🧵 Thread")
+        for tweet in result['thread']:
+            st.markdown(f"""
+            <div class="suggestion-container">
+            {tweet}
+            </div>
+            """, unsafe_allow_html=True)
+    
+    st.subheader("🖼️ Image Suggestions")
+    for i, suggestion in enumerate(result['image_suggestions'], 1):
+        st.markdown(f"""
+        <div class="suggestion-container">
+        <strong>{i}.</strong> {suggestion}
+        </div>
+        """, unsafe_allow_html=True)
+
+@st.fragment(run_every=0.5)
+def show_pending_job(job_id: int):
+    """Poll a queued post, showing its text as it streams in, and rerun the page once it has finished."""
+    job = shared_generator().poll_post(job_id)
+    if job is None or job['status'] in FINISHED:
+        st.rerun()
+    spec = job['spec']
+    if job['status'] == 'queued':
+        message = "⏳ Waiting for a worker..." if job['attempts'] == 0 else f"🔁 Retrying (attempt {job['attempts'] + 1})..."
+    else:
+        message = f"✨ Generating your {spec['length']} {spec['platform']} post about {spec['topic']}..."
+    st.info(message)
+    if job['status'] == 'running' and job.get('partial'):
+        post_class = "tiktok-post" if spec['platform'] == "TikTok" else ""
+        partial_html = job['partial'].replace('\n', '<br>')
+        st.markdown(f"""
+        <div class="post-container {post_class}">
+        {partial_html}
+        </div>
+        """, unsafe_allow_html=True)
+    if st.button("✖️ Cancel"):
+        shared_generator().cancel_post(job_id)
+        st.rerun()
+
+# Sessions only keep their own page state; the generator and history are shared
+generator = shared_generator()
 if 'show_history' not in st.session_state:
     st.session_state.show_history = False
 
@@ -128,60 +212,50 @@ with tab1:
         
         submitted = st.form_submit_button("✨ Generate Post")
 
-    # Generate and display results
+    # Queue the post and keep its job in the URL so a refresh picks it back up
     if submitted:
-        with st.spinner("✨ Generating your post..."):
-            try:
-                result = st.session_state.generator.generate_post(topic, length, platform, tone, language)
-                
-                st.markdown(f"### 📝 Generated Post <span class='language-badge'>{language}</span>", unsafe_allow_html=True)
-                post_class = "tiktok-post" if platform == "TikTok" else ""
-                st.markdown(f"""
-                <div class="post-container {post_class}">
-                {result['content'].replace('\n', '<br>')}
-                </div>
-                """, unsafe_allow_html=True)
-                
-                st.subheader("🖼️ Image Suggestions")
-                for i, suggestion in enumerate(result['image_suggestions'], 1):
-                    st.markdown(f"""
-                    <div class="suggestion-container">
-                    <strong>{i}.</strong> {suggestion}
-                    </div>
-                    """, unsafe_allow_html=True)
-            except Exception as e:
-                st.error(f"Error generating post: {str(e)}")
+        job_id = generator.submit_post(topic, length, platform, tone, language)
+        st.query_params['job'] = str(job_id)
+    
+    if 'job' in st.query_params:
+        try:
+            job_id = int(st.query_params['job'])
+            job = generator.poll_post(job_id)
+            if job is None:
+                st.warning("That post is no longer in the queue.")
+            elif job['status'] not in FINISHED:
+                show_pending_job(job_id)
+            elif job['status'] == 'done' and job.get('result'):
+                show_post(job['result'])
+            elif job['status'] == 'cancelled':
+                st.info("Post generation was cancelled.")
+            else:
+                st.error(f"Error generating post: {job['error']}")
+        except Exception as e:
+            st.error(f"Error generating post: {str(e)}")
 
 with tab2:
     st.subheader("📚 Generated Posts History")
     
-    # Get history
-    history = st.session_state.generator.get_history()
+    # Pages come pre-rendered from the shared view, so a rerun only costs a version check
+    history_view = shared_history_view()
+    pages = history_view.page_count()
     
-    if not history:
+    if pages == 0:
         st.info("No posts generated yet. Start creating some posts!")
     else:
         # Add clear history button
         if st.button("🗑️ Clear History"):
-            st.session_state.generator.clear_history()
+            generator.clear_history()
+            st.session_state.history_page = 1
             st.rerun()
         
-        # Display history
-        for post in reversed(history):
-            timestamp = datetime.fromisoformat(post['timestamp']).strftime("%Y-%m-%d %H:%M:%S")
-            metadata = post['metadata']
-            post_class = "tiktok-post" if metadata['platform'] == "TikTok" else ""
-            
-            st.markdown(f"""
-            <div class="history-container {post_class}">
-                <div>{post['content'].replace('\n', '<br>')}</div>
-                <div class="metadata">
-                    Topic: {metadata['topic']} | Platform: {metadata['platform']} | 
-                    Length: {metadata['length']} | Tone: {metadata['tone']} | 
-                    Language: {metadata.get('language', 'EN')} | Generated: {timestamp}
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+        # Display one page of history, newest first
+        if st.session_state.get('history_page', 1) > pages:
+            st.session_state.history_page = pages
+        page = st.number_input("Page", min_value=1, max_value=pages, key='history_page',
+                               help=f"{pages} pages of {history_view.page_size} posts") if pages > 1 else 1
+        st.markdown(history_view.page(page - 1), unsafe_allow_html=True)
 
 # Footer
 st.markdown("""
@@ -0,0 +1,102 @@
+"""Post latency through an API outage, with and without circuit breakers.
+
+The stub API is healthy, then fails every request (with 500s, or by hanging
+past the request timeout), then recovers. Posts are generated from several
+threads throughout, with request timeouts cut to one second so the run stays
+short. Without breakers every post waits out its failed requests before
+falling back; with them the circuit opens after a few failures, posts fall
+back straight away, and a half-open probe closes it again once the API is
+back. Reported per phase: p50/p95 post latency, fallback share and requests
+that reached the stub, and how long after the API recovered the first post
+came from it again.
+
+Run from the repository root:  python benchmarks/bench_circuit_breaker.py
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_server import start_stub_server
+
+THREADS = 8
+OPEN_SECONDS = 2.0
+HEALTHY = {'latency': 0.05}
+OUTAGES = {
+    'errors': {'latency': 0.05, 'error_rate': 1.0},
+    'timeouts': {'latency': 3.0},
+}
+# Seconds to keep generating posts in each phase
+PHASES = [('healthy', 3.0), ('outage', 8.0), ('recovered', 6.0)]
+
+
+def run_phase(generator, server, phase: str, settings: dict, seconds: float) -> dict:
+    server.configure(**settings)
+    phase_start = time.perf_counter()
+    deadline = phase_start + seconds
+
+    def generate(thread: int):
+        samples = []
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            result = generator.generate_post(f"{phase} test {thread}-{len(samples)}", 'short', 'Twitter', 'Friendly')
+            end = time.perf_counter()
+            samples.append((end - start, bool(result['metadata'].get('fallback')), end - phase_start))
+        return samples
+
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=THREADS) as pool:
+        samples = [sample for thread in pool.map(generate, range(THREADS)) for sample in thread]
+    latencies = sorted(seconds for seconds, _, _ in samples)
+    answered = [finished for _, fallback, finished in samples if not fallback]
+    return {
+        'posts': len(samples),
+        'p50': latencies[len(latencies) // 2],
+        'p95': latencies[int(0.95 * len(latencies))],
+        'fallbacks': sum(fallback for _, fallback, _ in samples) / len(samples),
+        'first_answered': min(answered) if answered else None,
+        'requests': server.requests_served + server.requests_failed,
+    }
+
+
+def main():
+    server, api_base = start_stub_server(seed=7)
+    os.environ['OPENROUTER_API_BASE'] = api_base
+    os.environ.setdefault('OPENROUTER_API_KEY', 'stub-key')
+    from metrics import MetricsRegistry
+    from model_router import ModelRouter
+    from social_media_generator import SocialMediaPostGenerator
+    from token_budget import TokenBudget
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for outage, failing in OUTAGES.items():
+            for label, failure_rate in (("no breaker", None), ("breaker", 0.5)):
+                registry = MetricsRegistry()
+                generator = SocialMediaPostGenerator(history_path=os.path.join(tmp, f"{outage}-{failure_rate}.db"),
+                                                     token_stats_path=None, metrics=registry)
+                generator.token_budget = TokenBudget(min_timeout=1.0, max_timeout=1.0)
+                generator.router = ModelRouter(generator.models, failure_rate=failure_rate,
+                                               open_seconds=OPEN_SECONDS, metrics=registry)
+                print(f"{outage} outage, {label}")
+                for phase, seconds in PHASES:
+                    report = run_phase(generator, server, phase, failing if phase == 'outage' else HEALTHY, seconds)
+                    print(f"  {phase:<10} {report['posts']:5d} posts   p50 {report['p50'] * 1000:7.0f} ms   "
+                          f"p95 {report['p95'] * 1000:7.0f} ms   fallback {report['fallbacks']:6.1%}   "
+                          f"{report['requests']:5d} requests" +
+                          (f"   first API post after {report['first_answered']:.2f}s"
+                           if phase == 'recovered' and report['first_answered'] is not None else ""))
+                transitions = {item['labels']['state']: int(item['value'])
+                               for item in registry.snapshot()['counters'].get('circuit_transitions_total', [])}
+                if transitions:
+                    print(f"  transitions {transitions}")
+                generator.history_store.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Compare one-off requests.post calls with the pooled OpenRouterClient session.
+
+Run from the repository root:  python benchmarks/bench_connection_pool.py
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from openrouter_client import OpenRouterClient
+from stub_server import start_stub_server
+
+REQUESTS = 500
+THREADS = 8
+PAYLOAD = {"model": "stub", "messages": [{"role": "user", "content": "hello"}]}
+
+
+def run(label, send):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        statuses = list(pool.map(lambda _: send().status_code, range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {REQUESTS / elapsed:8.0f} req/s  ({statuses.count(200)}/{REQUESTS} ok)")
+
+
+def main():
+    server, api_base = start_stub_server()
+
+    run("requests.post", lambda: requests.post(f"{api_base}/chat/completions", json=PAYLOAD, timeout=10))
+
+    client = OpenRouterClient(api_base, "stub-key", pool_size=THREADS)
+    run("OpenRouterClient", lambda: client.chat_completion(PAYLOAD, timeout=10))
+    stats = client.connection_stats()
+    print(f"pooled session: {stats['requests']} requests, {stats['new_connections']} new connections, "
+          f"{stats['reused_connections']} reused")
+    assert stats['new_connections'] <= THREADS, "pooled session opened more connections than its pool size"
+
+    client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
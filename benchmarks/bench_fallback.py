@@ -0,0 +1,88 @@
+"""Throughput and variety of the offline fallback grammar, against the old template lists.
+
+For each length, composes posts for every tone and language, unseeded and
+with a fresh seed per post, and counts how many distinct posts seeds
+0..N-1 give for one request. The old fallback picked one of four fixed
+lines, rebuilding its template dicts on every call.
+
+Run from the repository root:  python benchmarks/bench_fallback.py [seeds]
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fallback_grammar import load_fallback_grammar
+from social_media_generator import EMOJIS
+
+TONES = ["Inspirational", "Urgent", "Emotional", "Empathetic", "Professional", "Friendly", "Casual"]
+LANGUAGES = ["EN", "BM"]
+LENGTHS = ["short", "medium", "long"]
+TOPIC = "morning routines"
+POSTS = 20000
+
+
+def legacy_fallback(topic: str, length: str, tone: str, language: str = 'EN') -> str:
+    """The old fallback: one of four lines, a second one appended for long posts."""
+    templates = {
+        'EN': [
+            f"✨ Struggling with {topic}?\n\nYou're not alone. Here's what changed everything for me...",
+            f"💡 The truth about {topic} that nobody tells you:\n\n",
+            f"🚀 Want to transform your {topic}?\n\nHere's how I did it:",
+            f"💪 Your {topic} doesn't have to be complicated.\n\nHere's why:"
+        ],
+        'BM': [
+            f"✨ Bermasalah dengan {topic}?\n\nKau tak keseorangan. Ini yang mengubah segalanya untuk aku...",
+            f"💡 Kebenaran tentang {topic} yang tiada siapa beritahu kau:\n\n",
+            f"🚀 Mahu ubah {topic} kau?\n\nIni cara aku lakukannya:",
+            f"💪 {topic} kau tak perlu rumit.\n\nIni sebabnya:"
+        ]
+    }
+    content = random.choice(templates[language])
+    if length == 'long':
+        content += "\n\n" + random.choice(templates[language])
+    return content
+
+
+def throughput(compose) -> float:
+    combos = [(tone, language) for tone in TONES for language in LANGUAGES]
+    start = time.perf_counter()
+    for i in range(POSTS):
+        tone, language = combos[i % len(combos)]
+        compose(i, tone, language)
+    return POSTS / (time.perf_counter() - start)
+
+
+def main():
+    seeds = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    grammar = load_fallback_grammar()
+    print(f"{POSTS} posts per run, distinct posts over {seeds} seeds for one request\n")
+    for length in LENGTHS:
+        # Compile every combination first, as a warmed-up generator would have
+        for tone in TONES:
+            for language in LANGUAGES:
+                grammar.compiled(tone, language, length)
+        unseeded = throughput(lambda i, tone, language: grammar.compose(
+            TOPIC, length, tone, language, EMOJIS[tone.lower()]))
+        seeded = throughput(lambda i, tone, language: grammar.compose(
+            TOPIC, length, tone, language, EMOJIS[tone.lower()], seed=i))
+        legacy = throughput(lambda i, tone, language: legacy_fallback(TOPIC, length, tone, language))
+
+        posts = [grammar.compose(TOPIC, length, "Friendly", "EN", EMOJIS['friendly'], seed=seed)
+                 for seed in range(seeds)]
+        words = statistics.mean(len(post.split()) for post in posts)
+        legacy_words = statistics.mean(len(legacy_fallback(TOPIC, length, "Friendly").split()) for _ in range(1000))
+        reproducible = all(grammar.compose(TOPIC, length, "Friendly", "EN", EMOJIS['friendly'], seed=seed) == post
+                           for seed, post in enumerate(posts[:1000]))
+        print(f"{length:<7} grammar {unseeded:9,.0f} posts/s unseeded {seeded:9,.0f} seeded   "
+              f"{len(set(posts)):6d}/{seeds} distinct   {words:5.0f} words   reproducible {reproducible}")
+        print(f"{'':<7} legacy  {legacy:9,.0f} posts/s            "
+              f"{len({legacy_fallback(TOPIC, length, 'Friendly') for _ in range(seeds)}):6d}/{seeds} distinct   "
+              f"{legacy_words:5.0f} words")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Requests and time per campaign: generate_campaign versus one generate_post per platform.
+
+Run from the repository root:  python benchmarks/bench_fanout.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_server import start_stub_server
+
+CAMPAIGNS = 10
+LATENCY = 0.05
+
+
+def run(label, server, campaign):
+    served = server.requests_served
+    start = time.perf_counter()
+    for i in range(CAMPAIGNS):
+        campaign(f"campaign topic {i}")
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {(server.requests_served - served) / CAMPAIGNS:5.1f} requests/campaign  "
+          f"{elapsed / CAMPAIGNS * 1000:6.1f} ms/campaign")
+
+
+def main():
+    server, api_base = start_stub_server(latency=LATENCY)
+    os.environ['OPENROUTER_API_BASE'] = api_base
+    os.environ.setdefault('OPENROUTER_API_KEY', 'stub-key')
+    from social_media_generator import CAMPAIGN_PLATFORMS, SocialMediaPostGenerator
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for single_call in (False, True):
+            mode = "single call" if single_call else "two calls"
+            generator = SocialMediaPostGenerator(history_path=os.path.join(tmp, f"{mode}.db"), single_call=single_call,
+                                                 token_stats_path=None)
+            run(f"per platform ({mode})", server, lambda topic: [
+                generator.generate_post(topic, "short", platform, "Casual", fresh=True) for platform in CAMPAIGN_PLATFORMS
+            ])
+            run(f"fan-out ({mode})", server, lambda topic: generator.generate_campaign(topic, "short", "Casual", fresh=True))
+            generator.history_store.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Throughput of the single-pass formatting engine versus the old split-based formatting.
+
+Formats synthetic ~1500 word posts (with emojis, abbreviations and decimals)
+as long Facebook, Instagram and TikTok posts. "streamed" feeds each post in CHUNK
+character pieces, as the model's stream arrives; the legacy path can only
+show formatted text mid-stream by reformatting everything received so far.
+
+Run from the repository root:  python benchmarks/bench_formatting.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from platform_rules import load_platform_rules
+from text_formatter import extract_hashtags
+
+POSTS = 40
+WORDS = 1500
+CHUNK = 8
+RULES = load_platform_rules()
+SENTENCES = [
+    "You deserve a morning routine that actually works for you",
+    "Dr. Lee says small habits compound, e.g. a 10 minute walk",
+    "Prices went up 2.5% this year, so plan ahead 💸",
+    "Start with one change today 🚀",
+    "Mr. and Mrs. Tan run a café in Kuala Lumpur, and their story is worth hearing",
+    "What would you do with an extra hour every day?",
+    "Keep going!",
+    "The U.S. and Malaysia both saw the trend... and it is not slowing down 😊🔥✨",
+]
+
+
+def make_post(rng):
+    words, sentences = 0, []
+    while words < WORDS:
+        sentence = rng.choice(SENTENCES)
+        if sentence[-1] not in '.!?':
+            sentence += '.'
+        sentences.append(sentence)
+        words += len(sentence.split())
+    return ' '.join(sentences)
+
+
+def legacy_format(content, platform):
+    """The split-based long post and platform formatting this engine replaced."""
+    sentences = content.split('. ')
+    paragraphs = []
+    current_paragraph = []
+    for sentence in sentences:
+        current_paragraph.append(sentence)
+        if len(current_paragraph) >= 3:
+            paragraphs.append('. '.join(current_paragraph) + '.')
+            current_paragraph = []
+    if current_paragraph:
+        paragraphs.append('. '.join(current_paragraph) + '.')
+    content = '\n\n'.join(paragraphs)
+
+    format_rules = RULES.get(platform).format_rules
+    if format_rules.get('line_breaks') == 'sentence':
+        content = '.\n\n'.join(content.split('. '))
+    if format_rules.get('hashtag_style'):
+        content += "\n\n" + " ".join(extract_hashtags(content))
+    return content
+
+
+def engine_format(content, platform):
+    formatter = RULES.formatter(platform, paragraph_sentences=3)
+    formatter.feed(content)
+    formatter.finish()
+    return formatter.text
+
+
+def engine_streamed(content, platform):
+    formatter = RULES.formatter(platform, paragraph_sentences=3)
+    for i in range(0, len(content), CHUNK):
+        formatter.feed(content[i:i + CHUNK])
+    formatter.finish()
+    return formatter.text
+
+
+def legacy_streamed(content, platform):
+    received = ''
+    for i in range(0, len(content), CHUNK):
+        received += content[i:i + CHUNK]
+        formatted = legacy_format(received, platform)
+    return formatted
+
+
+def run(label, posts, platform, format_post, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for post in posts:
+            format_post(post, platform)
+    elapsed = time.perf_counter() - start
+    print(f"{platform:<10} {label:<16} {len(posts) * repeat / elapsed:10.1f} posts/s")
+
+
+def main():
+    rng = random.Random(42)
+    posts = [make_post(rng) for _ in range(POSTS)]
+    print(f"{POSTS} posts of ~{WORDS} words ({sum(map(len, posts)) // POSTS} chars each), {CHUNK} char stream chunks")
+    for platform in ("Facebook", "Instagram", "TikTok"):
+        run("legacy", posts, platform, legacy_format)
+        run("engine", posts, platform, engine_format)
+        run("engine streamed", posts, platform, engine_streamed)
+        run("legacy streamed", posts[:4], platform, legacy_streamed, repeat=1)
+
+
+if __name__ == "__main__":
+    main()
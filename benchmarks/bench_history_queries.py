@@ -0,0 +1,79 @@
+"""Query latency of HistoryStore over a synthetic 500k-post history.
+
+Run from the repository root:  python benchmarks/bench_history_queries.py [posts]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_store import HistoryStore
+
+PLATFORMS = ["TikTok", "Facebook", "Instagram", "LinkedIn", "Twitter"]
+TONES = ["Inspirational", "Urgent", "Emotional", "Empathetic", "Professional", "Friendly", "Casual"]
+LENGTHS = ["short", "medium", "long"]
+LANGUAGES = ["EN", "BM"]
+TOPICS = ["self-doubt", "productivity", "morning routine", "personal finance", "remote work", "healthy eating",
+          "public speaking", "time management", "career change", "mindfulness", "side hustle", "parenting"]
+
+
+def synthetic_posts(count: int):
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        topic = f"{rng.choice(TOPICS)} {rng.randint(1, 5000)}"
+        yield {
+            'content': f"Post {i} about {topic}. " * 8,
+            'image_suggestions': [f"An image about {topic}", f"Another image about {topic}"],
+            'timestamp': (start + timedelta(seconds=60 * i)).isoformat(),
+            'metadata': {'topic': topic, 'length': rng.choice(LENGTHS), 'platform': rng.choice(PLATFORMS),
+                         'tone': rng.choice(TONES), 'language': rng.choice(LANGUAGES)}
+        }
+
+
+def measure(label, func, repeat=20):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"{label:<40} p50 {statistics.median(timings):7.2f} ms   max {max(timings):7.2f} ms")
+
+
+def paginate(store, pages, **filters):
+    cursor = None
+    for _ in range(pages):
+        page = store.query(limit=20, cursor=cursor, **filters)
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(os.path.join(tmp, "history.db"), legacy_path=None)
+        start = time.perf_counter()
+        store.append_many(synthetic_posts(count))
+        print(f"Loaded {count} posts in {time.perf_counter() - start:.1f}s\n")
+
+        middle = (datetime(2024, 1, 1) + timedelta(seconds=30 * count)).isoformat()
+        measure("latest page", lambda: store.query(limit=20))
+        measure("platform", lambda: store.query(platform="LinkedIn"))
+        measure("platform + language + tone", lambda: store.query(platform="Twitter", language="BM", tone="Urgent"))
+        measure("topic substring", lambda: store.query(topic="finance 42"))
+        measure("rare topic substring", lambda: store.query(topic="career change 4999"))
+        measure("time range", lambda: store.query(since=middle, until=middle[:13] + ":59:59"))
+        measure("platform, 50 pages by cursor", lambda: paginate(store, 50, platform="Instagram"), repeat=5)
+        measure("count by platform", lambda: store.count(platform="TikTok"), repeat=5)
+        measure("recent(10) for get_history", lambda: store.recent(10))
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""History tab rerun time and memory per session, shared view versus one generator per session.
+
+Runs the History tab as a Streamlit script with streamlit.testing for a
+growing number of concurrent sessions. The legacy tab is the old code: each
+session builds its own generator and every rerun re-reads and re-renders
+the latest posts. The shared tab is the one app.py uses now. Reruns are
+timed with the history unchanged and right after a new post is saved, and
+memory is what the process holds once every session has run: the Python
+heap, and resident memory, which also counts SQLite's page cache and
+thread stacks. Most of a
+streamlit.testing rerun is the harness itself, so the work each tab does
+per rerun is also timed on its own.
+
+Run from the repository root:  python benchmarks/bench_history_view.py [posts]
+"""
+import gc
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from history_store import HistoryStore
+
+SESSIONS = (1, 8, 32)
+RERUNS = 20
+
+# The History tab before the shared view
+LEGACY_TAB = f"""
+import sys
+sys.path.insert(0, {REPO!r})
+import streamlit as st
+from datetime import datetime
+from social_media_generator import SocialMediaPostGenerator
+
+if 'generator' not in st.session_state:
+    st.session_state.generator = SocialMediaPostGenerator()
+history = st.session_state.generator.get_history()
+for post in reversed(history):
+    timestamp = datetime.fromisoformat(post['timestamp']).strftime("%Y-%m-%d %H:%M:%S")
+    metadata = post['metadata']
+    post_class = "tiktok-post" if metadata['platform'] == "TikTok" else ""
+    content_html = post['content'].replace('\\n', '<br>')
+    st.markdown(f'''
+    <div class="history-container {{post_class}}">
+        <div>{{content_html}}</div>
+        <div class="metadata">
+            Topic: {{metadata['topic']}} | Platform: {{metadata['platform']}} |
+            Length: {{metadata['length']}} | Tone: {{metadata['tone']}} |
+            Language: {{metadata.get('language', 'EN')}} | Generated: {{timestamp}}
+        </div>
+    </div>
+    ''', unsafe_allow_html=True)
+"""
+
+# The History tab in app.py
+SHARED_TAB = f"""
+import sys
+sys.path.insert(0, {REPO!r})
+import streamlit as st
+from history_view import HistoryView
+from social_media_generator import SocialMediaPostGenerator
+
+@st.cache_resource
+def shared_generator():
+    return SocialMediaPostGenerator()
+
+@st.cache_resource
+def shared_history_view():
+    return HistoryView(shared_generator().history_store)
+
+history_view = shared_history_view()
+pages = history_view.page_count()
+if st.session_state.get('history_page', 1) > pages:
+    st.session_state.history_page = pages
+page = st.number_input("Page", min_value=1, max_value=pages, key='history_page') if pages > 1 else 1
+st.markdown(history_view.page(page - 1), unsafe_allow_html=True)
+"""
+
+
+def synthetic_post(i: int) -> dict:
+    content = "\n\n".join(f"Paragraph {j} of post {i}: small steps every morning add up to real progress. ✨"
+                          for j in range(4))
+    return {'content': content, 'timestamp': datetime.now().isoformat(), 'hashtags': ["#Habits", "#Growth"],
+            'image_suggestions': ["A sunrise run", "A checklist"],
+            'metadata': {'topic': f"habit {i}", 'platform': 'TikTok', 'length': 'medium', 'tone': 'Friendly',
+                         'language': 'EN'}}
+
+
+def rss() -> int:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def start_sessions(script: str, count: int) -> list:
+    sessions = []
+    for _ in range(count):
+        session = AppTest.from_string(script, default_timeout=60)
+        session.run()
+        sessions.append(session)
+    return sessions
+
+
+def timed_reruns(sessions: list, store: HistoryStore, new_posts: bool) -> list:
+    timings = []
+    for i in range(RERUNS):
+        if new_posts:
+            store.append(synthetic_post(1_000_000 + i))
+        session = sessions[i % len(sessions)]
+        start = time.perf_counter()
+        session.run()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def render_work(store: HistoryStore):
+    """Time what each tab does per rerun outside Streamlit."""
+    from history_view import HistoryView, render_post
+    from social_media_generator import SocialMediaPostGenerator
+    generator = SocialMediaPostGenerator(token_stats_path=None)
+    view = HistoryView(store)
+
+    def legacy():
+        return [render_post(post) for post in reversed(generator.get_history())]
+
+    def shared():
+        view.page_count()
+        return view.page(0)
+
+    for name, work in (("legacy", legacy), ("shared", shared)):
+        timings = []
+        for _ in range(200):
+            start = time.perf_counter()
+            work()
+            timings.append(time.perf_counter() - start)
+        store.append(synthetic_post(0))
+        start = time.perf_counter()
+        work()
+        changed = time.perf_counter() - start
+        print(f"{name:<7} render work per rerun p50 {statistics.median(timings) * 1000:7.3f} ms   "
+              f"after a new post {changed * 1000:7.3f} ms")
+    print(f"shared view: {view.stats()}\n")
+
+
+def main():
+    posts = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    os.environ['OPENROUTER_API_KEY'] = os.environ.get('OPENROUTER_API_KEY', 'stub-key')
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        store = HistoryStore("post_history.db", legacy_path=None)
+        store.append_many(synthetic_post(i) for i in range(posts))
+        print(f"{posts} posts in the history\n")
+        render_work(store)
+        # Load Streamlit and the generator's modules before measuring memory
+        start_sessions(LEGACY_TAB, 1)
+
+        for name, script in (("legacy", LEGACY_TAB), ("shared", SHARED_TAB)):
+            for count in SESSIONS:
+                st.cache_resource.clear()
+                gc.collect()
+                resident = rss()
+                tracemalloc.start()
+                sessions = start_sessions(script, count)
+                gc.collect()
+                memory = tracemalloc.get_traced_memory()[0]
+                tracemalloc.stop()
+                resident = rss() - resident
+
+                unchanged = timed_reruns(sessions, store, new_posts=False)
+                changed = timed_reruns(sessions, store, new_posts=True)
+                print(f"{name:<7} {count:3d} sessions   rerun p50 {statistics.median(unchanged) * 1000:7.2f} ms   "
+                      f"after a new post p50 {statistics.median(changed) * 1000:7.2f} ms   "
+                      f"heap {memory / count / 2 ** 10:6.1f} KiB/session   rss {resident / count / 2 ** 10:6.1f} KiB/session")
+                del sessions
+        store.close()
+        os.chdir(REPO)
+
+
+if __name__ == "__main__":
+    main()
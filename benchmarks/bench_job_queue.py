@@ -0,0 +1,60 @@
+"""Job queue throughput with 1, 2, 4 and 8 worker processes against a stub API.
+
+Each run queues the same number of posts in a fresh database and times worker
+processes draining it, including process start-up. Every post makes two
+requests to the stub, so one worker is bound by the stub's latency.
+
+Run from the repository root:  python benchmarks/bench_job_queue.py
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_server import start_stub_server
+
+JOBS = 48
+LATENCY = 0.2
+WORKER_COUNTS = (1, 2, 4, 8)
+
+
+def main():
+    server, api_base = start_stub_server(latency=LATENCY)
+    os.environ['OPENROUTER_API_BASE'] = api_base
+    os.environ.setdefault('OPENROUTER_API_KEY', 'stub-key')
+    from social_media_generator import SocialMediaPostGenerator, run_workers
+
+    print(f"{JOBS} short posts, {LATENCY * 1000:.0f} ms stub latency")
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in WORKER_COUNTS:
+            path = os.path.join(tmp, f"{workers}.db")
+            generator = SocialMediaPostGenerator(history_path=path, token_stats_path=None)
+            for i in range(JOBS):
+                generator.submit_post(f"job queue topic {i}", "short", "TikTok", "Casual")
+
+            start = time.perf_counter()
+            run_workers(workers, {'history_path': path, 'token_stats_path': None}, drain=True)
+            elapsed = time.perf_counter() - start
+
+            counts = generator.job_queue.counts()
+            throughput = counts.get('done', 0) / elapsed
+            # From the first post started to the last one saved, leaving out process start-up
+            posts = generator.history_store.all()
+            finished = [datetime.fromisoformat(post['timestamp']).timestamp() for post in posts]
+            started = [end - post['metadata']['timings']['total'] for end, post in zip(finished, posts)]
+            steady = len(posts) / (max(finished) - min(started))
+            baseline = baseline or steady
+            print(f"{workers} workers  {elapsed:6.2f} s  {throughput:5.2f} jobs/s with start-up  "
+                  f"{steady:5.2f} jobs/s processing  {steady / baseline:4.1f}x  {counts}")
+            generator.job_queue.close()
+            generator.history_store.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
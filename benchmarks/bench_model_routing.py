@@ -0,0 +1,68 @@
+"""Tail latency of a single model versus a routed, hedged model pool.
+
+The stub's "fast" model usually answers in 50 ms but stalls for 2 s on about
+one request in thirty; the "steady" model always takes 150 ms. Hedging fires a
+second request at the steady model once the fast one passes its p95.
+
+Run from the repository root:  python benchmarks/bench_model_routing.py
+"""
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from metrics import MetricsRegistry
+from model_router import ModelRouter
+from openrouter_client import OpenRouterClient
+from stub_server import start_stub_server
+
+REQUESTS = 300
+THREADS = 8
+PAYLOAD = {"model": "fast", "messages": [{"role": "user", "content": "hello"}]}
+
+
+def model_latency(model):
+    if model == "steady":
+        return 0.15
+    return 2.0 if random.random() < 0.03 else 0.05
+
+
+def run(label, client, router):
+    def send():
+        start = time.perf_counter()
+        response, _ = router.complete(lambda payload, timeout: client.chat_completion(payload, timeout), PAYLOAD, 10)
+        assert response.status_code == 200
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        latencies = sorted(pool.map(lambda _: send(), range(REQUESTS)))
+    p50, p95, p99 = (latencies[int(q * len(latencies))] for q in (0.5, 0.95, 0.99))
+    print(f"{label:<16} p50 {p50 * 1000:6.0f} ms  p95 {p95 * 1000:6.0f} ms  p99 {p99 * 1000:6.0f} ms")
+
+
+def main():
+    random.seed(7)
+    server, api_base = start_stub_server(latency=model_latency)
+    client = OpenRouterClient(api_base, "stub-key", pool_size=THREADS * 2)
+
+    run("single model", client, ModelRouter(["fast"], metrics=MetricsRegistry()))
+
+    registry = MetricsRegistry()
+    router = ModelRouter(["fast", "steady"], hedge=True, min_hedge_delay=0.05, metrics=registry)
+    run("hedged pool", client, router)
+    outcomes = {item['labels']['winner']: int(item['value'])
+                for item in registry.snapshot()['counters'].get('hedge_outcomes_total', [])}
+    hedged = sum(outcomes.values())
+    print(f"hedged {hedged}/{REQUESTS} requests, won by hedge: {outcomes.get('hedge', 0)}, "
+          f"by primary: {outcomes.get('primary', 0)}")
+
+    client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Memory and scan time of 1M history posts as dicts, PostRecords and PostColumns.
+
+Posts are shaped like generate_post results and decoded from JSON one at a
+time, as loading the history does, so no strings are shared between dicts.
+Each representation is built in its own process and measured as the growth
+in resident memory, with a deep sys.getsizeof of the first posts as a check.
+The scan counts the posts per platform in the last 30 days.
+
+Run from the repository root:  python benchmarks/bench_post_records.py [posts]
+"""
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from post_record import PostColumns, PostRecord, epoch_micros
+
+PLATFORMS = ["TikTok", "Facebook", "Instagram", "LinkedIn", "Twitter"]
+TONES = ["Inspirational", "Urgent", "Emotional", "Empathetic", "Professional", "Friendly", "Casual"]
+LENGTHS = ["short", "medium", "long"]
+WORDS = ["small", "steps", "every", "morning", "habit", "focus", "growth", "today", "believe", "progress"]
+START = datetime(2024, 1, 1)
+SAMPLE = 1000
+
+
+def post_json(i: int, rng: random.Random) -> str:
+    """One post as stored in the history."""
+    timings = {'first_token': round(rng.random(), 3), 'post_body': round(rng.random() * 3, 3),
+               'hashtags': round(rng.random(), 3), 'image_suggestions': round(rng.random() * 2, 3),
+               'total': round(rng.random() * 4, 3)}
+    return json.dumps({
+        'content': " ".join(rng.choices(WORDS, k=30)) + f" {i}.\n\nDrop a ❤️ if this resonates with you!",
+        'image_suggestions': [f"Image idea {i} {n}" for n in range(3)],
+        'hashtags': ["#Habits", "#Growth", f"#Day{i % 365}"],
+        'timestamp': (START + timedelta(seconds=i * 30, microseconds=rng.randrange(1_000_000))).isoformat(),
+        'metadata': {'topic': f"morning habits {i % 5000}", 'length': rng.choice(LENGTHS),
+                     'platform': rng.choice(PLATFORMS), 'tone': rng.choice(TONES),
+                     'language': rng.choice(["EN", "BM"]), 'prompt_version': "3f2a9c1e", 'timings': timings}
+    }, ensure_ascii=False)
+
+
+def posts(count: int):
+    rng = random.Random(42)
+    for i in range(count):
+        yield json.loads(post_json(i, rng))
+
+
+def rss() -> int:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def deep_size(value, seen: set) -> int:
+    """Bytes held by value and everything it refers to, counting shared objects once."""
+    if id(value) in seen or value is None or isinstance(value, (bool, type)):
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_size(key, seen) + deep_size(item, seen) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(deep_size(item, seen) for item in value)
+    elif hasattr(value, '__slots__') and not isinstance(value, str):
+        size += sum(deep_size(getattr(value, name), seen) for name in value.__slots__)
+    return size
+
+
+def build_dicts(count: int):
+    return list(posts(count))
+
+
+def build_records(count: int):
+    return [PostRecord.from_dict(post) for post in posts(count)]
+
+
+def build_columns(count: int):
+    columns = PostColumns()
+    for i, post in enumerate(posts(count), 1):
+        metadata = post['metadata']
+        columns.append(i, post['timestamp'], metadata['topic'], metadata['length'], metadata['platform'],
+                       metadata['tone'], metadata['language'])
+    return columns
+
+
+def scan_dicts(dicts, since: datetime) -> Counter:
+    return Counter(post['metadata']['platform'] for post in dicts if datetime.fromisoformat(post['timestamp']) >= since)
+
+
+def scan_records(records, since: datetime) -> Counter:
+    since = epoch_micros(since)
+    return Counter(record.platform.value for record in records if record.timestamp >= since)
+
+
+def scan_columns(columns, since: datetime) -> Counter:
+    return columns.counts('platform', since=since)
+
+
+REPRESENTATIONS = {
+    'dicts': ("list of dicts", build_dicts, scan_dicts),
+    'records': ("PostRecords", build_records, scan_records),
+    'columns': ("PostColumns", build_columns, scan_columns),
+}
+
+
+def measure(kind: str, count: int) -> dict:
+    """Build one representation in this process and report its memory and scan time."""
+    _, make, scan = REPRESENTATIONS[kind]
+    gc.collect()
+    before = rss()
+    start = time.perf_counter()
+    value = make(count)
+    built = time.perf_counter() - start
+    gc.collect()
+    grown = rss() - before
+
+    since = START + timedelta(seconds=count * 30) - timedelta(days=30)
+    start = time.perf_counter()
+    counts = scan(value, since)
+    scanned = time.perf_counter() - start
+    report = {'bytes': grown, 'built': built, 'scan': scanned, 'counts': dict(sorted(counts.items()))}
+    if kind != 'columns':
+        report['sample_bytes'] = deep_size(value[:SAMPLE], set()) / SAMPLE
+    if kind == 'records':
+        # Every record unpacks to exactly the post it was made from
+        report['mismatches'] = sum(record.to_dict() != post for record, post in zip(value, posts(count)))
+    return report
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == '--measure':
+        print(json.dumps(measure(sys.argv[2], int(sys.argv[3]))))
+        return
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"{count} posts, platform counts over the last 30 days\n")
+    reports = {}
+    for kind, (name, _, _) in REPRESENTATIONS.items():
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--measure', kind, str(count)],
+                                capture_output=True, text=True, check=True).stdout
+        report = reports[kind] = json.loads(output)
+        sample = f"   deep size {report['sample_bytes']:5.0f} bytes/post" if 'sample_bytes' in report else ""
+        print(f"{name:<14} {report['bytes'] / 2 ** 20:7.0f} MiB {report['bytes'] / count:6.0f} bytes/post   "
+              f"built in {report['built']:5.1f}s   scan {report['scan'] * 1000:7.1f} ms{sample}")
+    print(f"\nround trip mismatches: {reports['records']['mismatches']}, "
+          f"scans agree: {len({json.dumps(report['counts']) for report in reports.values()}) == 1}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Overhead of the per-stage profiler, off and in each mode, and a sample report.
+
+The stub API answers straight away, so each post is mostly the generator's
+own CPU work. Each mode (profiling off, the stage timers, cProfile sampling
+and tracemalloc) runs in its own process, since tracemalloc slows down the
+whole process once started, and the median of several rounds of posts is
+reported. With profiling off the only cost left is the check for a
+profiler in each phase and stage; that is also timed on its own, against
+phase() as it was before the profiler, and scaled to the phases and stages
+a post passes through.
+
+Run from the repository root:  python benchmarks/bench_profiler.py [posts per round]
+"""
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_server import start_stub_server
+
+ROUNDS = 7
+MODES = {'off': None, 'timers': 'timers', 'cprofile': 'cprofile', 'tracemalloc': 'tracemalloc'}
+SPECS = [('short', 'Twitter', 'Friendly', 'EN'), ('medium', 'Instagram', 'Inspirational', 'EN'),
+         ('long', 'Facebook', 'Empathetic', 'BM'), ('medium', 'LinkedIn', 'Professional', 'EN')]
+
+
+@contextmanager
+def legacy_phase(trace, name: str, call: str = 'post'):
+    """RequestTrace.phase() before profiling hooks."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        with trace._lock:
+            trace.phases[(call, name)] += seconds
+
+
+def disabled_hook_cost() -> dict:
+    """Nanoseconds the profiler checks add to a phase, and a stage costs, with profiling off."""
+    from metrics import MetricsRegistry
+    trace = MetricsRegistry().trace()
+    scope = {'trace': trace, 'legacy_phase': legacy_phase}
+
+    def best(statement: str) -> float:
+        return min(timeit.repeat(statement, globals=scope, number=100000, repeat=7)) / 100000 * 1e9
+
+    bare = best("pass")
+    legacy = best("with legacy_phase(trace, 'x'):\n    pass")
+    return {'phase': best("with trace.phase('x'):\n    pass") - legacy,
+            'stage': best("with trace.stage('x'):\n    pass") - bare}
+
+
+def measure(mode: str, posts: int) -> dict:
+    """Run rounds of posts with one profiling mode in this process."""
+    server, api_base = start_stub_server(post_words=120, seed=3)
+    os.environ['OPENROUTER_API_BASE'] = api_base
+    os.environ.setdefault('OPENROUTER_API_KEY', 'stub-key')
+    os.environ.pop('PROFILE_STAGES', None)
+    from metrics import MetricsRegistry
+    from social_media_generator import SocialMediaPostGenerator
+
+    report = {'hooks': disabled_hook_cost()} if mode == 'off' else {}
+    with tempfile.TemporaryDirectory() as tmp:
+        generator = SocialMediaPostGenerator(history_path=os.path.join(tmp, "history.db"), token_stats_path=None,
+                                             metrics=MetricsRegistry(), profile=MODES[mode], duplicate_check='flag')
+        rounds = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for round_number in range(-1, ROUNDS):
+                start = time.perf_counter()
+                for i in range(posts if round_number >= 0 else 10):
+                    length, platform, tone, language = SPECS[i % len(SPECS)]
+                    generator.generate_post(f"{mode} {round_number} {i}", length, platform, tone, language)
+                if round_number >= 0:
+                    rounds.append((time.perf_counter() - start) / posts)
+                elif generator.profiler is not None:
+                    # The warm-up round isn't part of the report
+                    generator.profiler.reset()
+        report['seconds_per_post'] = statistics.median(rounds)
+        if generator.profiler is not None:
+            report['stages'] = generator.profiler.report()['stages']
+            report['table'] = generator.profiler.format_table(top=3)
+        generator.history_store.close()
+    server.shutdown()
+    return report
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == '--measure':
+        print(json.dumps(measure(sys.argv[2], int(sys.argv[3]))))
+        return
+    posts = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    reports = {}
+    for mode in MODES:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--measure', mode, str(posts)],
+                                capture_output=True, text=True, check=True).stdout
+        reports[mode] = json.loads(output.strip().splitlines()[-1])
+
+    baseline = reports['off']['seconds_per_post']
+    print(f"median of {ROUNDS} rounds of {posts} posts, each mode in its own process\n")
+    for mode, report in reports.items():
+        seconds = report['seconds_per_post']
+        print(f"{mode:<12} {seconds * 1e6:8.0f} us/post   {seconds / baseline - 1:+7.1%}")
+
+    stages = reports['timers']['stages']
+    posts_done = sum(stage['count'] for stage in stages if stage['stage'].startswith('total.'))
+    per_post = sum(stage['count'] for stage in stages if not stage['stage'].startswith('total.')) / posts_done
+    hooks = reports['off']['hooks']
+    worst = per_post * max(hooks['phase'], hooks['stage']) / 1e9
+    print(f"\nprofiling off: the profiler check adds {hooks['phase']:.0f} ns to a phase and a stage costs "
+          f"{hooks['stage']:.0f} ns; at {per_post:.1f} phases and stages per post that is at most "
+          f"{worst * 1e6:.1f} us, {worst / baseline:.3%} of a post")
+
+    print("\nStage report, timers:\n")
+    print(reports['timers']['table'])
+    print("\ncProfile samples:\n")
+    print(reports['cprofile']['table'].split("\n\n", 1)[-1])
+
+
+if __name__ == "__main__":
+    main()
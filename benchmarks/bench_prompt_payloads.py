@@ -0,0 +1,101 @@
+"""Request payload construction throughput: per-request f-strings vs compiled prompt templates.
+
+Run from the repository root:  python benchmarks/bench_prompt_payloads.py
+"""
+import itertools
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_templates import PromptTemplates
+
+MODEL = "deepseek/deepseek-chat-v3-0324:free"
+TOKEN_LIMITS = {'short': 400, 'medium': 1200, 'long': 2000}
+PLATFORMS = ["TikTok", "Facebook", "Instagram", "LinkedIn", "Twitter"]
+TONES = ["Inspirational", "Urgent", "Emotional", "Empathetic", "Professional", "Friendly", "Casual"]
+SPECS = [(f"topic {i}", length, platform, tone, language)
+         for i, (length, platform, tone, language) in enumerate(
+             itertools.product(["short", "medium", "long"], PLATFORMS, TONES, ["EN", "BM"]))]
+ROUNDS = 200
+
+
+def legacy_payload(topic, length, platform, tone, language):
+    """The request body as _generate_ai_content used to build it, from scratch each time."""
+    language_instruction = "Write in English" if language == 'EN' else "Write in Bahasa Malaysia"
+    word_count_instruction = {
+        'short': "Write approximately 300 words",
+        'medium': "Write approximately 900 words",
+        'long': "Write approximately 1500 words"
+    }.get(length.lower(), "Write appropriate length")
+    prompt = f"""Create a {tone.lower()} social media post about {topic} for {platform}.
+        {language_instruction}.
+        {word_count_instruction}.
+        Write in second-person perspective (using 'you' and 'your').
+
+        IMPORTANT GUIDELINES:
+        1. Only include verified, factual information
+        2. Avoid making unsubstantiated claims
+        3. If citing statistics or facts, ensure they are from reliable sources
+        4. Do not generate content that could be misleading or false
+        5. Focus on well-established, widely accepted information
+        6. If uncertain about a fact, either omit it or clearly indicate it's an opinion
+
+        Make it engaging, emotional, and authentic while maintaining accuracy.
+        Include relevant emojis naturally in the text.
+        Focus on storytelling and relatability.
+        For long posts, ensure the content is well-structured with clear paragraphs.
+        Format: Return only the post content, no additional text."""
+    headers = {
+        "Authorization": "Bearer key",
+        "HTTP-Referer": "https://github.com/yourusername/social-media-generator",
+        "X-Title": "Social Media Post Generator"
+    }
+    return headers, {
+        "model": MODEL,
+        "messages": [
+            {"role": "system", "content": f"""You are a creative social media copywriter who specializes in writing engaging, emotionally resonant posts in {language}.
+                Your primary responsibility is to ensure all information is factual and verified.
+                For Bahasa Malaysia posts, use casual language with 'aku' and 'kau' instead of formal 'saya' and 'kamu'.
+                Use 'you' and 'your' to create a personal connection with the reader.
+                For long posts, ensure proper paragraph breaks and structure.
+                Never generate content that could be misleading or false.
+                If you're unsure about a fact, either omit it or clearly mark it as an opinion.
+                Always prioritize accuracy over engagement."""},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": TOKEN_LIMITS.get(length.lower(), 400),
+        "temperature": 0.5,
+        "presence_penalty": 0.6,
+        "frequency_penalty": 0.3
+    }
+
+
+def run(label, build, serialize=False):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for spec in SPECS:
+            payload = build(*spec)
+            if serialize:
+                json.dumps(payload)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<42} {ROUNDS * len(SPECS) / elapsed:>10,.0f} payloads/s")
+
+
+def main():
+    templates = PromptTemplates.load()
+
+    def compiled_payload(topic, length, platform, tone, language):
+        return templates.post(platform, tone, language, length).build(topic, MODEL, TOKEN_LIMITS.get(length, 400))
+
+    print(f"{len(SPECS)} (platform, tone, language, length) combinations x {ROUNDS} rounds\n")
+    run("per-request f-strings", legacy_payload)
+    run("compiled templates", compiled_payload)
+    run("per-request f-strings + json.dumps", legacy_payload, serialize=True)
+    run("compiled templates + json.dumps", compiled_payload, serialize=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Send a burst of requests to a rate limited stub with and without the RequestScheduler.
+
+The stub answers RATE_LIMIT requests per second and 429s the rest. Without a
+scheduler those 429s become fallback posts; with one they are requeued after
+the Retry-After pause, and interactive requests overtake the batch backlog.
+
+Run from the repository root:  python benchmarks/bench_rate_limiter.py
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from openrouter_client import OpenRouterClient
+from rate_limiter import PRIORITY_BATCH, PRIORITY_INTERACTIVE, RequestScheduler
+from stub_server import start_stub_server
+
+REQUESTS = 60
+THREADS = 16
+RATE_LIMIT = 20
+TIMEOUT = 30
+PAYLOAD = {"model": "stub", "messages": [{"role": "user", "content": "hello"}]}
+
+
+def run(label, send):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        statuses = list(pool.map(lambda _: send().status_code, range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+    ok = statuses.count(200)
+    print(f"{label:<26} {elapsed:6.2f}s  {ok / elapsed:6.1f} ok/s  "
+          f"fallback ratio {1 - ok / REQUESTS:5.1%}")
+
+
+def priority_latency(client):
+    """Queue a batch backlog, then time one interactive request behind it."""
+    with ThreadPoolExecutor(max_workers=REQUESTS + 1) as pool:
+        batch = [pool.submit(client.chat_completion, PAYLOAD, TIMEOUT, PRIORITY_BATCH) for _ in range(REQUESTS)]
+        time.sleep(0.2)
+        start = time.perf_counter()
+        pool.submit(client.chat_completion, PAYLOAD, TIMEOUT, PRIORITY_INTERACTIVE).result()
+        interactive = time.perf_counter() - start
+        for future in batch:
+            future.result()
+        backlog = time.perf_counter() - start
+    print(f"interactive request behind {REQUESTS} batch requests: {interactive:.2f}s "
+          f"(backlog drained after {backlog:.2f}s)")
+
+
+def main():
+    server, api_base = start_stub_server(rate_limit=RATE_LIMIT)
+    session = requests.Session()
+    run("no scheduler", lambda: session.post(f"{api_base}/chat/completions", json=PAYLOAD, timeout=TIMEOUT))
+    time.sleep(1)
+
+    client = OpenRouterClient(api_base, "stub-key", pool_size=THREADS)
+    run("adaptive scheduler", lambda: client.chat_completion(PAYLOAD, timeout=TIMEOUT))
+    print(f"  scheduler: {client.scheduler.stats()}")
+    time.sleep(1)
+
+    client = OpenRouterClient(api_base, "stub-key", pool_size=THREADS,
+                              scheduler=RequestScheduler(rate=RATE_LIMIT, burst=RATE_LIMIT, max_concurrency=THREADS))
+    run(f"token bucket ({RATE_LIMIT}/s)", lambda: client.chat_completion(PAYLOAD, timeout=TIMEOUT))
+    print(f"  scheduler: {client.scheduler.stats()}")
+    time.sleep(1)
+
+    priority_latency(client)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
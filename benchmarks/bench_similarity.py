@@ -0,0 +1,120 @@
+"""Near-duplicate lookup latency over a synthetic 1M-post history.
+
+Loads the posts into a HistoryStore, builds the SimHash index from the stored
+fingerprints the way the generator does on first use, then times lookups of
+reposts (the same text with a different CTA, casing and emojis, which should
+match) and of new posts (which should not), against a linear scan.
+
+Loading a million posts takes a few minutes.
+
+Run from the repository root:  python benchmarks/bench_similarity.py [posts]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_store import HistoryStore
+from similarity_index import NEAR_DUPLICATE_DISTANCE, SimilarityIndex, hamming, post_simhash, simhash
+
+VOCABULARY = [f"{stem}{suffix}" for stem in ("morning", "habit", "focus", "money", "career", "health", "family",
+                                              "coffee", "team", "goal", "story", "change", "skill", "sleep", "walk")
+              for suffix in range(400)]
+QUERIES = 2000
+WORDS = 60
+
+
+def post_text(rng: random.Random) -> str:
+    return " ".join(rng.choices(VOCABULARY, k=WORDS)) + "."
+
+
+def synthetic_posts(count: int, rng: random.Random):
+    for i in range(count):
+        yield {'content': f"{post_text(rng)}\n\nDrop a ❤️ if this resonates with you!", 'timestamp': str(i),
+               'metadata': {'topic': f"topic {i}", 'platform': 'TikTok'}}
+
+
+def build_index(store: HistoryStore) -> SimilarityIndex:
+    index = SimilarityIndex()
+    for post_id, fingerprint in store.fingerprints():
+        index.add(post_id, fingerprint)
+    return index
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return (f"p50 {statistics.median(timings) * 1000:7.3f} ms   "
+            f"p99 {timings[int(len(timings) * 0.99)] * 1000:7.3f} ms")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(os.path.join(tmp, "history.db"), legacy_path=None)
+        start = time.perf_counter()
+        store.append_many(synthetic_posts(count, rng))
+        print(f"Loaded {count} posts with fingerprints in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        index = build_index(store)
+        build = time.perf_counter() - start
+        # Build it again under tracemalloc, which slows it down too much to time
+        tracemalloc.start()
+        traced = build_index(store)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del traced
+        print(f"Built the index in {build:.1f}s, {memory / 2 ** 20:.0f} MiB\n")
+
+        # Reposts of stored posts with a different CTA, casing and emojis, and posts never seen before
+        reposts = []
+        for post_id in rng.sample(range(1, count + 1), QUERIES // 2):
+            content = store.get(post_id)['content'].rsplit("\n\n", 1)[0]
+            reposts.append((post_id, f"🔥 {content.upper()}!!\n\n💬 What's your take on this?"))
+        new_posts = [post_text(rng) for _ in range(QUERIES // 2)]
+
+        probe, end_to_end, found = [], [], 0
+        for expected, text in reposts:
+            start = time.perf_counter()
+            fingerprint = post_simhash({'content': text})
+            middle = time.perf_counter()
+            matches = index.find(fingerprint)
+            end = time.perf_counter()
+            probe.append(end - middle)
+            end_to_end.append(end - start)
+            found += any(post_id == expected for post_id, _ in matches)
+        false_matches = 0
+        for text in new_posts:
+            start = time.perf_counter()
+            fingerprint = simhash(text)
+            middle = time.perf_counter()
+            matches = index.find(fingerprint)
+            end = time.perf_counter()
+            probe.append(end - middle)
+            end_to_end.append(end - start)
+            false_matches += bool(matches)
+
+        print(f"{'index probe':<34} {percentiles(probe)}")
+        print(f"{'fingerprint + probe':<34} {percentiles(end_to_end)}")
+        print(f"reposts found {found}/{len(reposts)}, new posts matched {false_matches}/{len(new_posts)} "
+              f"(within {NEAR_DUPLICATE_DISTANCE} bits)")
+
+        fingerprints = [fingerprint for _, fingerprint in store.fingerprints()]
+        scans = []
+        for _, text in reposts[:10]:
+            fingerprint = post_simhash({'content': text})
+            start = time.perf_counter()
+            [f for f in fingerprints if hamming(f, fingerprint) <= NEAR_DUPLICATE_DISTANCE]
+            scans.append(time.perf_counter() - start)
+        print(f"{'linear scan (baseline)':<34} {percentiles(scans)}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Requests per post and latency of single-call JSON generation versus the two-call path.
+
+Each stub request takes LATENCY seconds. With --malformed the given share of
+single-call responses is unparseable prose, which sends those posts down the
+two-call path.
+
+Run from the repository root:  python benchmarks/bench_single_call.py [--malformed 0.1]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_server import start_stub_server
+
+POSTS = 50
+LATENCY = 0.05
+
+
+def run(label, generator, server):
+    served = server.requests_served
+    latencies = []
+    for i in range(POSTS):
+        start = time.perf_counter()
+        result = generator.generate_post(f"bench topic {i}", "short", "TikTok", "Casual", fresh=True)
+        latencies.append(time.perf_counter() - start)
+        assert result['image_suggestions']
+    latencies.sort()
+    requests_per_post = (server.requests_served - served) / POSTS
+    print(f"{label:<10} {requests_per_post:5.2f} requests/post  "
+          f"p50 {latencies[POSTS // 2] * 1000:6.1f} ms  p95 {latencies[int(POSTS * 0.95)] * 1000:6.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--malformed', type=float, default=0.0, help="Share of single-call responses to break")
+    args = parser.parse_args()
+
+    server, api_base = start_stub_server(latency=LATENCY, malformed=args.malformed)
+    os.environ['OPENROUTER_API_BASE'] = api_base
+    os.environ.setdefault('OPENROUTER_API_KEY', 'stub-key')
+    from social_media_generator import SocialMediaPostGenerator
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, single_call in (("two-call", False), ("single", True)):
+            generator = SocialMediaPostGenerator(history_path=os.path.join(tmp, f"{label}.db"), single_call=single_call,
+                                                 token_stats_path=None)
+            run(label, generator, server)
+            generator.history_store.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Startup cost: module import time and generator construction with a large history.
+
+Run from the repository root:  python benchmarks/bench_startup.py [posts]
+
+Every Streamlit session and batch worker pays for construction, so it must
+not grow with the size of the history.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = """
+import sys, time
+sys.path.insert(0, {repo!r})
+start = time.perf_counter()
+import social_media_generator
+print(time.perf_counter() - start)
+"""
+
+CONSTRUCT_SCRIPT = """
+import sys, time
+sys.path.insert(0, {repo!r})
+import social_media_generator
+start = time.perf_counter()
+generator = social_media_generator.SocialMediaPostGenerator(history_path="post_history.db")
+constructed = time.perf_counter() - start
+start = time.perf_counter()
+generator.get_history(10)
+first_access = time.perf_counter() - start
+start = time.perf_counter()
+generator.get_history(10)
+print(constructed, first_access, time.perf_counter() - start)
+"""
+
+
+def run(script, cwd):
+    output = subprocess.run([sys.executable, "-c", script.format(repo=REPO)], cwd=cwd,
+                            capture_output=True, text=True, check=True).stdout
+    return [float(value) for value in output.split()[-3:]] if output.strip() else []
+
+
+def main():
+    posts = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    with tempfile.TemporaryDirectory() as tmp:
+        imports = sorted(run(IMPORT_SCRIPT, tmp)[-1] for _ in range(5))
+        print(f"import social_media_generator   median {imports[2] * 1000:8.1f} ms")
+        print(f"import side effects              {sorted(os.listdir(tmp)) or 'none'}")
+
+        history = [{
+            'content': f"Post {i}. " * 40,
+            'image_suggestions': ["An image", "Another image"],
+            'timestamp': "2024-01-01T00:00:00",
+            'metadata': {'topic': f"topic {i}", 'length': "medium", 'platform': "Facebook",
+                         'tone': "Inspirational", 'language': "EN"}
+        } for i in range(posts)]
+        with open(os.path.join(tmp, "post_history.json"), 'w', encoding='utf-8') as f:
+            json.dump(history, f, ensure_ascii=False, indent=2)
+
+        constructed, migration, _ = run(CONSTRUCT_SCRIPT, tmp)
+        print(f"\nWith a {posts}-post post_history.json:")
+        print(f"construct generator              {constructed * 1000:8.2f} ms")
+        print(f"first history access (migration) {migration * 1000:8.2f} ms")
+
+        constructed, first_access, warm = run(CONSTRUCT_SCRIPT, tmp)
+        print(f"\nWith {posts} posts already in post_history.db:")
+        print(f"construct generator              {constructed * 1000:8.2f} ms")
+        print(f"first history access             {first_access * 1000:8.2f} ms")
+        print(f"later history access             {warm * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Truncations, timeouts and timeout budget: fixed per-length limits versus TokenBudget.
+
+Simulates requests for EN and BM posts of every length against a fast and a
+slow model. Each completion's true length varies around the word target,
+and BM needs more tokens per word. "cold" starts without throughput stats,
+"warm" loads the stats a previous run saved.
+
+Run from the repository root:  python benchmarks/bench_token_budget.py
+"""
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_templates import load_prompt_templates
+from token_budget import TokenBudget
+
+REQUESTS = 2000
+# True tokens per word and model speed (tokens/second), with per-request jitter
+TRUE_TOKENS_PER_WORD = {'EN': 1.3, 'BM': 1.85}
+MODELS = {'fast-model': 80.0, 'slow-model': 25.0}
+OVERHEAD = 0.8
+FIXED_TOKENS = {'short': 400, 'medium': 1200, 'long': 2000}
+FIXED_TIMEOUTS = {'short': 30, 'medium': 60, 'long': 90}
+
+
+def simulate(label, limits, rng, budget=None):
+    word_targets = load_prompt_templates().word_targets
+    truncated = timed_out = 0
+    budgets = {model: [] for model in MODELS}
+    slack = {model: [] for model in MODELS}
+    for _ in range(REQUESTS):
+        language = rng.choice(('EN', 'BM'))
+        length = rng.choice(('short', 'medium', 'long'))
+        model = rng.choice(list(MODELS))
+        max_tokens, timeout = limits(length, language, model)
+        words = word_targets[length] * rng.uniform(0.8, 1.2)
+        tokens = int(words * TRUE_TOKENS_PER_WORD[language] * rng.uniform(0.9, 1.1))
+        if tokens > max_tokens:
+            truncated += 1
+            tokens = max_tokens
+        seconds = OVERHEAD + tokens / (MODELS[model] * rng.uniform(0.75, 1.25))
+        budgets[model].append(timeout)
+        if seconds > timeout:
+            timed_out += 1
+            if budget is not None:
+                budget.observe_timeout([model])
+        else:
+            slack[model].append(timeout - seconds)
+            if budget is not None:
+                budget.observe(model, tokens, seconds)
+    print(f"{label:<18} truncated {truncated / REQUESTS:6.1%}  timed out {timed_out / REQUESTS:6.1%}")
+    for model in MODELS:
+        print(f"  {model:<16} mean timeout {sum(budgets[model]) / len(budgets[model]):6.1f} s  "
+              f"unused {sum(slack[model]) / len(slack[model]):6.1f} s")
+
+
+def main():
+    rng = random.Random(7)
+    word_targets = load_prompt_templates().word_targets
+    simulate("fixed", lambda length, language, model: (FIXED_TOKENS[length], FIXED_TIMEOUTS[length]), rng)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "token_stats.json")
+        for label in ("estimator (cold)", "estimator (warm)"):
+            budget = TokenBudget(path)
+
+            def limits(length, language, model):
+                max_tokens = budget.for_words(word_targets[length], language)
+                return max_tokens, budget.timeout(max_tokens, [model])
+
+            simulate(label, limits, rng, budget)
+            budget.save()
+
+
+if __name__ == "__main__":
+    main()
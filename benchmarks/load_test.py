@@ -0,0 +1,236 @@
+"""Load test SocialMediaPostGenerator against the local stub API at increasing concurrency.
+
+Each scenario sets the stub's latency distribution, error and 429 rates and
+post length, then generates posts from that many threads at each
+concurrency level. Reported per level: throughput, p50/p95/p99 latency,
+fallback rate, requests the stub answered, failed or throttled, process
+RSS and the cost of each history write. Results are written as JSON. Pass
+--compare with a file from an earlier version to flag regressions (the
+exit status is 1 if there are any).
+
+Run from the repository root:
+    python benchmarks/load_test.py --output results.json
+    python benchmarks/load_test.py --scenario steady --concurrency 1,8,32 --compare results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_server import start_stub_server
+
+# Stub settings (see StubOpenRouterServer) and generator options per scenario
+SCENARIOS = {
+    'steady': {'server': {'latency': 'lognormal:0.3,0.3', 'post_words': 80}},
+    'flaky': {'server': {'latency': 'lognormal:0.3,0.3', 'post_words': 80, 'error_rate': 0.2, 'throttle_rate': 0.05}},
+    'heavy-tail': {'server': {'latency': 'lognormal:0.3,1.0', 'post_words': 80}},
+    'streaming': {'server': {'latency': 'lognormal:0.3,0.3', 'post_words': 80, 'chunk_delay': 0.002},
+                  'stream': True},
+    'single-call': {'server': {'latency': 'lognormal:0.3,0.3', 'post_words': 80},
+                    'generator': {'single_call': True}},
+}
+POST_SPECS = [
+    ('short', 'TikTok', 'Inspirational', 'EN'),
+    ('medium', 'Instagram', 'Friendly', 'EN'),
+    ('short', 'Twitter', 'Urgent', 'BM'),
+    ('medium', 'LinkedIn', 'Professional', 'EN'),
+    ('long', 'Facebook', 'Empathetic', 'BM'),
+]
+QUANTILES = {'p50': 0.5, 'p95': 0.95, 'p99': 0.99}
+
+
+def percentiles(values, scale: float = 1000.0) -> dict:
+    """p50/p95/p99 and mean of values, in milliseconds for values in seconds."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    summary = {name: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * scale, 3)
+               for name, q in QUANTILES.items()}
+    summary['mean'] = round(sum(ordered) / len(ordered) * scale, 3)
+    return summary
+
+
+def rss_mb() -> float:
+    """Resident memory of this process, or its peak where /proc isn't available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return round(int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20, 1)
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1)
+
+
+def counter_total(snapshot: dict, name: str, **labels) -> float:
+    return sum(item['value'] for item in snapshot['counters'].get(name, [])
+               if all(item['labels'].get(key) == value for key, value in labels.items()))
+
+
+def version() -> dict:
+    """The git commit being measured, if this is a git checkout."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=root,
+                                    capture_output=True, text=True).stdout.strip())
+        return {'commit': commit, 'dirty': dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+
+
+def run_level(generator, server, name: str, scenario: dict, concurrency: int, posts: int,
+              verbose: bool = False) -> dict:
+    """Generate posts from concurrency threads and summarize the run."""
+    generator.metrics.reset()
+    served, failed, limited = server.requests_served, server.requests_failed, server.requests_limited
+
+    def generate(i: int):
+        length, post_platform, tone, language = POST_SPECS[i % len(POST_SPECS)]
+        topic = f"{name} load test {concurrency}-{i}"
+        start = time.perf_counter()
+        try:
+            if scenario.get('stream'):
+                stream = generator.generate_post_stream(topic, length, post_platform, tone, language)
+                for _ in stream:
+                    pass
+                result = stream.result
+            else:
+                result = generator.generate_post(topic, length, post_platform, tone, language)
+            return result, time.perf_counter() - start, None
+        except Exception as e:
+            return None, time.perf_counter() - start, f"{type(e).__name__}: {e}"
+
+    # The generator prints a line per post; keep them out of the report unless asked for
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    start = time.perf_counter()
+    with output, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(generate, range(posts)))
+    elapsed = time.perf_counter() - start
+
+    results = [result for result, _, error in outcomes if error is None]
+    snapshot = generator.metrics.snapshot()
+    history_writes = [item for item in snapshot['histograms'].get('generation_phase_seconds', [])
+                      if item['labels'] == {'call': 'post', 'phase': 'history_persist'}]
+    history_ms = {}
+    if history_writes:
+        writes = history_writes[0]
+        history_ms = {name: round(writes['quantiles'][str(q)] * 1000, 3) for name, q in QUANTILES.items()}
+        history_ms['mean'] = round(writes['sum'] / writes['count'] * 1000, 3)
+    return {
+        'scenario': name,
+        'concurrency': concurrency,
+        'posts': posts,
+        'errors': posts - len(results),
+        'seconds': round(elapsed, 3),
+        'throughput': round(len(results) / elapsed, 3),
+        'latency_ms': percentiles([seconds for _, seconds, _ in outcomes]),
+        'fallback_rate': round(sum(bool(result['metadata'].get('fallback')) for result in results) / posts, 4),
+        'image_fallback_rate': round(counter_total(snapshot, 'generation_fallbacks_total', call='image_suggestions')
+                                     / posts, 4),
+        'requests': {
+            'served': server.requests_served - served,
+            'failed': server.requests_failed - failed,
+            'throttled': server.requests_limited - limited,
+            'retried': int(counter_total(snapshot, 'openrouter_retries_total')),
+        },
+        'rss_mb': rss_mb(),
+        'history_write_ms': history_ms,
+        'error_samples': sorted({error for _, _, error in outcomes if error})[:3],
+    }
+
+
+def compare(results: list, baseline_path: str, threshold: float) -> int:
+    """Print throughput and p95 changes against a baseline file and return the number of regressions."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(item['scenario'], item['concurrency']): item for item in baseline['results']}
+    print(f"\nCompared with {baseline_path} ({baseline['version'].get('commit')}), "
+          f"regression threshold {threshold:.0%}:")
+    regressions = 0
+    for item in results:
+        before = previous.get((item['scenario'], item['concurrency']))
+        if before is None:
+            continue
+        throughput = item['throughput'] / before['throughput'] - 1 if before['throughput'] else 0.0
+        p95 = item['latency_ms']['p95'] / before['latency_ms']['p95'] - 1 if before['latency_ms'].get('p95') else 0.0
+        regressed = throughput < -threshold or p95 > threshold
+        regressions += regressed
+        print(f"  {item['scenario']:<12} x{item['concurrency']:<3} throughput {throughput:+7.1%}   "
+              f"p95 {p95:+7.1%}{'   REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help="Scenario to run (repeat for several; default all)")
+    parser.add_argument('--concurrency', default='1,4,16,32', help="Comma-separated concurrency levels")
+    parser.add_argument('--posts-per-thread', type=int, default=4, help="Posts generated per thread at each level")
+    parser.add_argument('--min-posts', type=int, default=16, help="Minimum posts generated at each level")
+    parser.add_argument('--output', default='load_test_results.json', help="JSON file to write the results to")
+    parser.add_argument('--compare', metavar='BASELINE', help="Results file from an earlier version to compare with")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="Relative throughput drop or p95 increase counted as a regression")
+    parser.add_argument('--verbose', action='store_true', help="Show the generator's output")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(',')]
+    names = args.scenario or list(SCENARIOS)
+
+    server, api_base = start_stub_server(seed=42)
+    os.environ['OPENROUTER_API_BASE'] = api_base
+    os.environ.setdefault('OPENROUTER_API_KEY', 'stub-key')
+    from metrics import MetricsRegistry
+    from social_media_generator import SocialMediaPostGenerator
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in names:
+            scenario = SCENARIOS[name]
+            server.configure(**scenario['server'])
+            generator = SocialMediaPostGenerator(history_path=os.path.join(tmp, f"{name}.db"), token_stats_path=None,
+                                                 metrics=MetricsRegistry(), pool_size=max(16, 2 * max(levels)),
+                                                 **scenario.get('generator', {}))
+            print(f"{name}: {scenario['server']}")
+            for concurrency in levels:
+                posts = max(args.min_posts, args.posts_per_thread * concurrency)
+                item = run_level(generator, server, name, scenario, concurrency, posts, args.verbose)
+                results.append(item)
+                latency = item['latency_ms']
+                print(f"  x{concurrency:<3} {item['throughput']:7.2f} posts/s   p50 {latency['p50']:8.1f} ms   "
+                      f"p95 {latency['p95']:8.1f} ms   p99 {latency['p99']:8.1f} ms   "
+                      f"fallback {item['fallback_rate']:6.1%}   history write {item['history_write_ms'].get('mean', 0):.2f} ms   "
+                      f"rss {item['rss_mb']:.0f} MB" + (f"   errors {item['errors']}" if item['errors'] else ""))
+            generator.history_store.close()
+    server.shutdown()
+
+    report = {
+        'version': version(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {'concurrency': levels, 'posts_per_thread': args.posts_per_thread, 'min_posts': args.min_posts,
+                     'scenarios': {name: SCENARIOS[name] for name in names}},
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""Local stand-in for the OpenRouter chat completions API.
+
+Used by the benchmarks in this directory, or run on its own to point the app
+or CLI at (set OPENROUTER_API_BASE to the printed URL):
+
+    python benchmarks/stub_server.py --port 8765 --latency lognormal:0.8,0.5 --error-rate 0.02 --post-words 120
+"""
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional, Tuple, Union
+
+CANNED_POST = "You can do this. Start small today. Keep going every day."
+# Words and emojis generated posts are made of when post_words is set
+POST_VOCABULARY = ("you", "your", "today", "small", "steps", "habit", "every", "morning", "start", "keep", "going",
+                   "focus", "on", "what", "matters", "most", "and", "the", "progress", "will", "follow", "with",
+                   "time", "believe", "in", "yourself", "because", "growth", "takes", "patience", "courage")
+POST_EMOJIS = ("✨", "💪", "🚀", "🌱")
+# Rough tokens per word, for the usage field
+TOKENS_PER_WORD = 1.35
+
+Latency = Union[float, str, Callable[[Optional[str]], float]]
+
+
+def latency_distribution(spec: Union[float, str], seed: Optional[int] = None) -> Callable[[Optional[str]], float]:
+    """Parse a latency spec into a function of the model that returns seconds.
+
+    A spec is a number of seconds, or one of "uniform:LOW,HIGH",
+    "lognormal:MEDIAN,SIGMA", "exponential:MEAN" and "normal:MEAN,STDDEV".
+    """
+    rng = random.Random(seed)
+    if isinstance(spec, (int, float)) or ':' not in spec:
+        seconds = float(spec)
+        return lambda model: seconds
+    kind, _, params = spec.partition(':')
+    values = [float(value) for value in params.split(',')]
+    if kind == 'uniform':
+        return lambda model: rng.uniform(values[0], values[1])
+    if kind == 'lognormal':
+        return lambda model: rng.lognormvariate(math.log(values[0]), values[1])
+    if kind == 'exponential':
+        return lambda model: rng.expovariate(1 / values[0])
+    if kind == 'normal':
+        return lambda model: max(0.0, rng.gauss(values[0], values[1]))
+    raise ValueError(f"Unknown latency distribution: {kind}")
+
+
+class StubOpenRouterHandler(BaseHTTPRequestHandler):
+    """Answers /chat/completions with a canned or generated post, over keep-alive HTTP/1.1."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+        request = json.loads(body or b"{}")
+        server = self.server
+        retry_after = server.take_quota() or (1 if server.roll(server.throttle_rate) else 0)
+        if retry_after:
+            server.count('requests_limited')
+            self._send_json(429, {"error": {"message": "Rate limit exceeded"}}, {"Retry-After": str(retry_after)})
+            return
+        latency = server.latency
+        time.sleep(latency(request.get("model")) if callable(latency) else latency)
+        if server.roll(server.error_rate):
+            server.count('requests_failed')
+            self._send_json(500, {"error": {"message": "Upstream provider error"}})
+            return
+        server.count('requests_served')
+
+        content, finish_reason = server.post_content(request.get("max_tokens"))
+        prompt = " ".join(message.get("content", "") for message in request.get("messages", []))
+        if '"image_suggestions"' in prompt:
+            # Single-call prompt: answer with the JSON object it asks for, or prose for the malformed share
+            if not server.roll(server.malformed):
+                content = json.dumps({
+                    "post": content,
+                    "hashtags": ["#StartSmall", "#KeepGoing"],
+                    "image_suggestions": ["A runner lacing up at sunrise", "A notebook with a ticked-off checklist"]
+                })
+        usage = {"prompt_tokens": max(1, len(prompt) // 4),
+                 "completion_tokens": max(1, round(len(content.split()) * TOKENS_PER_WORD))}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        if request.get("stream"):
+            self._send_stream(content, finish_reason, usage)
+            return
+        self._send_json(200, {
+            "id": f"stub-{server.requests_served}",
+            "model": request.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": finish_reason}],
+            "usage": usage
+        })
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, content: str, finish_reason: str, usage: dict):
+        """Send content word by word as chat completion server-sent events, with usage on the last one."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self._write_chunk(": OPENROUTER PROCESSING\n\n")
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            delta = word if i == 0 else " " + word
+            event = {"choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]}
+            self._write_chunk(f"data: {json.dumps(event)}\n\n")
+            time.sleep(self.server.chunk_delay)
+        event = {"choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}], "usage": usage}
+        self._write_chunk(f"data: {json.dumps(event)}\n\n")
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, text: str):
+        data = text.encode('utf-8')
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubOpenRouterServer(ThreadingHTTPServer):
+    """Threaded stub server with configurable latency, failures and a requests-per-window quota like the free tier.
+
+    error_rate is the share of requests answered with a 500 after the
+    latency, and throttle_rate the share answered with an immediate 429.
+    With post_words set, each post is that many generated words, cut short
+    with finish_reason "length" if it would exceed the request's max_tokens.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency: Latency = 0.0, chunk_delay: float = 0.0,
+                 rate_limit: Optional[int] = None, window: float = 1.0, malformed: float = 0.0,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, post_words: Optional[int] = None,
+                 port: int = 0, seed: Optional[int] = None):
+        super().__init__(("127.0.0.1", port), StubOpenRouterHandler)
+        self.rate_limit = rate_limit
+        self.window = window
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.configure(latency, chunk_delay, malformed, error_rate, throttle_rate, post_words)
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    def configure(self, latency: Latency = 0.0, chunk_delay: float = 0.0, malformed: float = 0.0,
+                  error_rate: float = 0.0, throttle_rate: float = 0.0, post_words: Optional[int] = None):
+        """Change how requests are answered and reset the request counters."""
+        self.latency = latency_distribution(latency, self._rng.random()) if isinstance(latency, str) else latency
+        self.chunk_delay = chunk_delay
+        self.malformed = malformed
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.post_words = post_words
+        self.requests_served = 0
+        self.requests_limited = 0
+        self.requests_failed = 0
+
+    def count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def roll(self, rate: float) -> bool:
+        """True for a rate share of calls."""
+        if not rate:
+            return False
+        with self._lock:
+            return self._rng.random() < rate
+
+    def post_content(self, max_tokens: Optional[int]) -> Tuple[str, str]:
+        """The post to answer with and its finish reason."""
+        if self.post_words is None:
+            return CANNED_POST, "stop"
+        words = self.post_words
+        finish_reason = "stop"
+        if max_tokens is not None and words * TOKENS_PER_WORD > max_tokens:
+            words = max(1, int(max_tokens / TOKENS_PER_WORD))
+            finish_reason = "length"
+        with self._lock:
+            picks = self._rng.choices(POST_VOCABULARY, k=words)
+            sentence_lengths = [self._rng.randint(6, 14) for _ in range(words // 6 + 1)]
+            emojis = self._rng.choices(POST_EMOJIS, k=len(sentence_lengths))
+        sentences, start = [], 0
+        for length, emoji in zip(sentence_lengths, emojis):
+            if start >= words:
+                break
+            chunk = picks[start:start + length]
+            start += length
+            sentences.append(" ".join(chunk).capitalize() + f". {emoji}")
+        if finish_reason == "length":
+            # A cut-off completion ends mid-sentence
+            sentences[-1] = sentences[-1].rsplit(".", 1)[0]
+        return " ".join(sentences), finish_reason
+
+    def handle_error(self, request, client_address):
+        # Clients that timed out close the connection before the answer is written
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def take_quota(self) -> int:
+        """Count a request against the quota; return seconds to wait if it is exhausted, else 0."""
+        if self.rate_limit is None:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= self.window:
+                self._window_start = now
+                self._window_count = 0
+            if self._window_count >= self.rate_limit:
+                return max(1, math.ceil(self._window_start + self.window - now))
+            self._window_count += 1
+            return 0
+
+
+def start_stub_server(latency: Latency = 0.0, chunk_delay: float = 0.0,
+                      rate_limit: Optional[int] = None, window: float = 1.0,
+                      malformed: float = 0.0, **options) -> Tuple[StubOpenRouterServer, str]:
+    """Start a stub OpenRouter server in a background thread and return it with its API base URL.
+
+    latency is the delay before each response: seconds, a latency_distribution
+    spec, or a function of the requested model that returns one. With
+    rate_limit set, only that many requests are answered per window seconds;
+    the rest get a 429 with a Retry-After header. malformed is the share of
+    single-call (JSON) requests answered with plain prose instead. Other
+    options (error_rate, throttle_rate, post_words, port, seed) are passed
+    to StubOpenRouterServer.
+    """
+    server = StubOpenRouterServer(latency, chunk_delay, rate_limit, window, malformed, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the OpenRouter chat completions API.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='0.5', help="Seconds, or uniform:LOW,HIGH, lognormal:MEDIAN,SIGMA, "
+                                                         "exponential:MEAN or normal:MEAN,STDDEV")
+    parser.add_argument('--chunk-delay', type=float, default=0.02, help="Seconds between streamed words")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered with a 500")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Share of requests answered with a 429")
+    parser.add_argument('--rate-limit', type=int, help="Requests answered per --window seconds")
+    parser.add_argument('--window', type=float, default=1.0)
+    parser.add_argument('--post-words', type=int, help="Words per generated post (default: a short canned post)")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    server = StubOpenRouterServer(args.latency, args.chunk_delay, args.rate_limit, args.window,
+                                  error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                                  post_words=args.post_words, port=args.port, seed=args.seed)
+    print(f"Stub OpenRouter API at http://127.0.0.1:{server.server_address[1]}/api/v1 (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+import requests
+
+from metrics import MetricsRegistry, default_registry
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+# Values of the circuit_state gauge
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of sending a request while every circuit it could go through is open."""
+
+
+class CircuitBreaker:
+    """Closed/open/half-open circuit breaker over the recent requests to one model.
+
+    Closed, it lets every request through and keeps the outcomes of the last
+    window of them. Once min_calls outcomes are in and at least failure_rate
+    of them failed (an error status, a timeout or a connection error), it
+    opens and turns requests away for open_seconds. It is then half-open and
+    lets probes requests through: once that many succeed it closes again, and
+    any failure opens it for another open_seconds. A probe that never reports
+    back frees its place after open_seconds. A request whose result says
+    nothing about the model, such as a 429, is neither a success nor a
+    failure: release() gives back its place. With failure_rate=None it never
+    opens.
+
+    allow() returns the circuit's generation, which changes with every state
+    change; pass it back to record() so that late results of requests let
+    through before the last change, such as a slow request sent while the
+    circuit was closed, don't decide a half-open probe.
+    """
+
+    def __init__(self, name: str, failure_rate: Optional[float] = 0.5, min_calls: int = 5, window: int = 20,
+                 open_seconds: float = 30.0, probes: int = 1, metrics: Optional[MetricsRegistry] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.metrics = metrics or default_registry
+        self.clock = clock
+        self.state = CLOSED
+        self._generation = 1
+        self._outcomes = deque(maxlen=window)
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._probe_deadline = 0.0
+        self._lock = threading.Lock()
+        self.metrics.set('circuit_state', STATE_VALUES[CLOSED], model=name)
+
+    def _transition(self, state: str, now: float):
+        self.state = state
+        self._generation += 1
+        if state == OPEN:
+            self._opened_at = now
+        elif state == HALF_OPEN:
+            self._probes_in_flight = self._probe_successes = 0
+        else:
+            self._outcomes.clear()
+            self._failures = 0
+        self.metrics.inc('circuit_transitions_total', model=self.name, state=state)
+        self.metrics.set('circuit_state', STATE_VALUES[state], model=self.name)
+
+    def _refresh(self, now: float):
+        """Half-open an open circuit once open_seconds have passed, and free probes that never reported back."""
+        if self.state == OPEN and now >= self._opened_at + self.open_seconds:
+            self._transition(HALF_OPEN, now)
+        elif self.state == HALF_OPEN and self._probes_in_flight and now >= self._probe_deadline:
+            self._probes_in_flight = 0
+
+    def _has_room(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        return self.state == HALF_OPEN and self._probes_in_flight + self._probe_successes < self.probes
+
+    def available(self) -> bool:
+        """Whether allow() would let a request through now."""
+        with self._lock:
+            self._refresh(self.clock())
+            return self._has_room()
+
+    def allow(self) -> Optional[int]:
+        """The generation to record a request under if it may be sent now, else None.
+
+        In the half-open state a request let through takes one of the probe places.
+        """
+        with self._lock:
+            now = self.clock()
+            self._refresh(now)
+            if not self._has_room():
+                return None
+            if self.state == HALF_OPEN:
+                self._probes_in_flight += 1
+                self._probe_deadline = now + self.open_seconds
+            return self._generation
+
+    def record(self, ok: bool, generation: Optional[int] = None):
+        """Record the outcome of a request that allow() let through, with the generation it returned.
+
+        Without a generation the outcome counts towards the current state.
+        """
+        with self._lock:
+            now = self.clock()
+            self._refresh(now)
+            if generation is not None and generation != self._generation:
+                # Sent before the circuit last changed state, so it says nothing about the current one
+                return
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if not ok:
+                    self._transition(OPEN, now)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.probes:
+                        self._transition(CLOSED, now)
+            elif self.state == CLOSED:
+                outcomes = self._outcomes
+                if len(outcomes) == outcomes.maxlen and not outcomes[0]:
+                    self._failures -= 1
+                outcomes.append(ok)
+                if not ok:
+                    self._failures += 1
+                    if (self.failure_rate is not None and len(outcomes) >= self.min_calls
+                            and self._failures >= self.failure_rate * len(outcomes)):
+                        self._transition(OPEN, now)
+            # Requests sent before the circuit opened don't change an open circuit
+
+    def release(self, generation: Optional[int] = None):
+        """Give back the place of a request allow() let through that has no outcome to record, such as a 429."""
+        with self._lock:
+            if self.state == HALF_OPEN and (generation is None or generation == self._generation):
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def retry_in(self) -> float:
+        """Seconds until an open circuit lets probes through, 0 if it isn't open."""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.open_seconds - self.clock())
+
+    def stats(self) -> Dict:
+        """State, failures among the recent outcomes and seconds until probing."""
+        retry_in = self.retry_in()
+        with self._lock:
+            return {
+                'state': self.state,
+                'recent_calls': len(self._outcomes),
+                'recent_failures': self._failures,
+                'retry_in': round(retry_in, 3)
+            }
@@ -0,0 +1,126 @@
+import json
+import os
+import random
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+DEFAULT_GRAMMAR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fallback_grammar.json")
+
+# "step*3" in a paragraph is a numbered list of three different step fragments, after any other slots
+_REPEAT = re.compile(r"^(\w+)\*(\d+)$")
+_PLACEHOLDERS = frozenset({'topic', 'Topic', 'emoji'})
+_FIELD = re.compile(r"\{(\w*)\}")
+
+
+class CompiledGrammar:
+    """A (tone, language, length) grammar ready to compose posts from.
+
+    slots maps each slot used to its fragments for the tone, and counts to
+    how many different ones a post needs. plan lists the paragraphs as
+    (sentences, list items), each a list of (slot, index) where index picks
+    among the fragments drawn for that slot.
+    """
+
+    __slots__ = ('slots', 'counts', 'plan')
+
+    def __init__(self, slots: Dict[str, Tuple[str, ...]], counts: Dict[str, int], plan: List[Tuple[List, List]]):
+        self.slots = slots
+        self.counts = counts
+        self.plan = plan
+
+    def compose(self, topic: str, emojis: Sequence[str], rng) -> str:
+        """Compose one post, drawing fragments and emojis with rng."""
+        drawn = {slot: rng.sample(self.slots[slot], count) for slot, count in self.counts.items()}
+        fields = {'topic': topic, 'Topic': topic[:1].upper() + topic[1:], 'emoji': ''}
+
+        def fill(slot: str, index: int) -> str:
+            if emojis:
+                fields['emoji'] = rng.choice(emojis)
+            return drawn[slot][index].format_map(fields).strip()
+
+        paragraphs = []
+        for sentences, items in self.plan:
+            lines = [" ".join(fill(*part) for part in sentences)] if sentences else []
+            lines.extend(f"{number}. {fill(*part)}" for number, part in enumerate(items, 1))
+            paragraphs.append("\n".join(lines))
+        return "\n\n".join(paragraphs)
+
+
+class FallbackGrammar:
+    """Offline post grammar loaded from a JSON config file, used when the API can't write a post.
+
+    Each length is a list of paragraphs, each a list of slots ("hook",
+    "insight", or "step*3" for a numbered list). Each language has fragments
+    per slot under "any" and under tone names; a post for a tone draws from
+    both. Fragments use {topic}, {Topic} (capitalized) and {emoji}, which is
+    filled from the tone's emojis. Grammars are compiled once per (tone,
+    language, length), and the same seed always composes the same post.
+    """
+
+    def __init__(self, config: Dict):
+        self.version = config.get('version', 'unversioned')
+        self.lengths = config['lengths']
+        self.languages = {name: slots for name, slots in config.items() if name not in ('version', 'lengths')}
+        self._compiled: Dict[Tuple[str, str, str], CompiledGrammar] = {}
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        # Check every fragment up front rather than on the first outage
+        for language, slots in self.languages.items():
+            for slot, variants in slots.items():
+                for fragments in variants.values():
+                    for fragment in fragments:
+                        unknown = set(_FIELD.findall(fragment)) - _PLACEHOLDERS
+                        if unknown:
+                            raise ValueError(f"Unknown placeholder {{{unknown.pop()}}} in {language} {slot}: {fragment}")
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_GRAMMAR_PATH) -> 'FallbackGrammar':
+        """Load a grammar from a JSON config file."""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def _compile(self, tone: str, language: str, length: str) -> CompiledGrammar:
+        slots = self.languages.get(language) or self.languages['EN']
+        paragraphs = self.lengths.get(length) or self.lengths['medium']
+        fragments, counts, plan = {}, {}, []
+        for paragraph in paragraphs:
+            sentences, items = [], []
+            for name in paragraph:
+                repeat = _REPEAT.match(name)
+                slot, times = (repeat.group(1), int(repeat.group(2))) if repeat else (name, 1)
+                if slot not in fragments:
+                    variants = slots[slot]
+                    fragments[slot] = tuple(variants.get('any', [])) + tuple(variants.get(tone, []))
+                for _ in range(times):
+                    (items if repeat else sentences).append((slot, counts.get(slot, 0)))
+                    counts[slot] = counts.get(slot, 0) + 1
+                if counts[slot] > len(fragments[slot]):
+                    raise ValueError(f"{language} {slot} has {len(fragments[slot])} fragments for {tone}, "
+                                     f"but a {length} post needs {counts[slot]}")
+            plan.append((sentences, items))
+        return CompiledGrammar(fragments, counts, plan)
+
+    def compiled(self, tone: str, language: str, length: str) -> CompiledGrammar:
+        """The compiled grammar for a combination, compiling it on first use."""
+        key = (tone.lower(), language, length.lower())
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            with self._lock:
+                compiled = self._compiled.get(key)
+                if compiled is None:
+                    compiled = self._compiled[key] = self._compile(*key)
+        return compiled
+
+    def compose(self, topic: str, length: str, tone: str, language: str = 'EN', emojis: Sequence[str] = (),
+                seed: Optional[Union[int, str]] = None) -> str:
+        """Compose a post. With a seed the post is reproducible; without one each call varies."""
+        rng = random.Random(seed) if seed is not None else self._random
+        return self.compiled(tone, language, length).compose(topic, emojis, rng)
+
+
+@lru_cache(maxsize=None)
+def load_fallback_grammar(path: str = DEFAULT_GRAMMAR_PATH) -> FallbackGrammar:
+    """Load and cache a grammar file, so every generator in the process shares its compiled grammars."""
+    return FallbackGrammar.load(path)
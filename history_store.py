@@ -0,0 +1,334 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from post_record import PostColumns, PostRecord
+from similarity_index import from_signed, post_simhash, to_signed, topic_key
+
+
+INSERT_POST = ("INSERT INTO posts (timestamp, topic, length, platform, tone, language, record, simhash, topic_key) "
+               "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+
+class HistoryStore:
+    """Append-only post history backed by SQLite in WAL mode.
+
+    Each generated post is one INSERT, so saving costs the same no matter how
+    long the history is. SQLite's locking makes it safe for several Streamlit
+    sessions or batch workers to write to the same file at once. The WAL is
+    checkpointed every checkpoint_interval appends to keep it compact.
+
+    Metadata columns are indexed and topics have a trigram full-text index,
+    so filtered, paginated queries stay fast without loading the history.
+    Each post also stores a SimHash fingerprint of its content and a
+    normalized topic key for near-duplicate detection.
+
+    version() changes whenever the history does, so views of it can be
+    cached until then.
+    """
+
+    def __init__(self, path: str = "post_history.db", legacy_path: str = "post_history.json",
+                 checkpoint_interval: int = 1000):
+        self.path = path
+        self.checkpoint_interval = checkpoint_interval
+        self._appends = 0
+        self._lock = threading.Lock()
+        self._version = 0
+        self._data_version = None
+
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            topic TEXT,
+            length TEXT,
+            platform TEXT,
+            tone TEXT,
+            language TEXT,
+            record TEXT NOT NULL,
+            simhash INTEGER,
+            topic_key TEXT
+        )""")
+        self._db.execute("CREATE TABLE IF NOT EXISTS migrations (source TEXT PRIMARY KEY, imported INTEGER NOT NULL)")
+        self._db.create_function('post_simhash', 1, lambda record: to_signed(post_simhash(json.loads(record))),
+                                 deterministic=True)
+        self._db.create_function('topic_key', 1, topic_key, deterministic=True)
+        self._add_similarity_columns()
+        self._create_indexes()
+
+        if legacy_path and os.path.exists(legacy_path):
+            self._migrate_legacy(legacy_path)
+
+    @staticmethod
+    def _row(post: Dict, fingerprint: Optional[int] = None) -> tuple:
+        metadata = post.get('metadata', {})
+        if fingerprint is None:
+            fingerprint = post_simhash(post)
+        return (
+            post.get('timestamp', ''),
+            metadata.get('topic'),
+            metadata.get('length'),
+            metadata.get('platform'),
+            metadata.get('tone'),
+            metadata.get('language', 'EN'),
+            json.dumps(post, ensure_ascii=False),
+            to_signed(fingerprint),
+            topic_key(metadata.get('topic'))
+        )
+
+    def _add_similarity_columns(self):
+        """Add the fingerprint and topic key columns to databases created before them.
+
+        Topic keys are filled in here; content fingerprints are filled in by
+        the first fingerprints() call, since they take longer to compute.
+        """
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(posts)")}
+        if 'topic_key' in columns:
+            return
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(posts)")}
+            if 'topic_key' not in columns:
+                self._db.execute("ALTER TABLE posts ADD COLUMN simhash INTEGER")
+                self._db.execute("ALTER TABLE posts ADD COLUMN topic_key TEXT")
+                self._db.execute("UPDATE posts SET topic_key = topic_key(topic)")
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def _create_indexes(self):
+        """Create the query indexes, backfilling the topic index for existing databases."""
+        for column in ('platform', 'language', 'tone', 'timestamp'):
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS posts_{column} ON posts ({column}, id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS posts_topic_key ON posts (topic_key, platform, id)")
+
+        exists = self._db.execute("SELECT 1 FROM sqlite_master WHERE name = 'posts_topic_fts'").fetchone()
+        if not exists:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS posts_topic_fts
+                    USING fts5(topic, content='posts', content_rowid='id', tokenize='trigram')""")
+                self._db.execute("""CREATE TRIGGER IF NOT EXISTS posts_topic_insert AFTER INSERT ON posts BEGIN
+                    INSERT INTO posts_topic_fts (rowid, topic) VALUES (new.id, new.topic);
+                END""")
+                self._db.execute("""CREATE TRIGGER IF NOT EXISTS posts_topic_delete AFTER DELETE ON posts BEGIN
+                    INSERT INTO posts_topic_fts (posts_topic_fts, rowid, topic) VALUES ('delete', old.id, old.topic);
+                END""")
+                self._db.execute("INSERT INTO posts_topic_fts (posts_topic_fts) VALUES ('rebuild')")
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _migrate_legacy(self, legacy_path: str):
+        """Import a post_history.json file written by earlier versions, once."""
+        source = os.path.abspath(legacy_path)
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM migrations WHERE source = ?", (source,)).fetchone():
+                return
+        try:
+            with open(legacy_path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            posts = json.loads(text) if text.strip() else []
+        except Exception as e:
+            print(f"Error migrating history from {legacy_path}: {e}")
+            return
+
+        if self.append_many(posts, source=source) and posts:
+            print(f"Imported {len(posts)} posts from {legacy_path}")
+
+    def append(self, post: Dict, fingerprint: Optional[int] = None) -> int:
+        """Append one post to the history and return its id.
+
+        Pass the post's post_simhash as fingerprint if it has already been computed.
+        """
+        with self._lock:
+            post_id = self._db.execute(INSERT_POST, self._row(post, fingerprint)).lastrowid
+            self._appends += 1
+            self._version += 1
+            if self._appends % self.checkpoint_interval == 0:
+                self.compact()
+        return post_id
+
+    def get(self, post_id: int) -> Optional[Dict]:
+        """Return the post with this id, or None if it isn't in the history."""
+        with self._lock:
+            row = self._db.execute("SELECT record FROM posts WHERE id = ?", (post_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def fingerprints(self, after: int = 0) -> List[Tuple[int, int]]:
+        """(id, content simhash) for every post after an id, oldest first."""
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM posts WHERE id > ? AND simhash IS NULL LIMIT 1", (after,)).fetchone():
+                # Posts saved before fingerprints were stored
+                self._db.execute("UPDATE posts SET simhash = post_simhash(record) WHERE id > ? AND simhash IS NULL",
+                                 (after,))
+            rows = self._db.execute("SELECT id, simhash FROM posts WHERE id > ? ORDER BY id", (after,)).fetchall()
+        return [(post_id, from_signed(value)) for post_id, value in rows]
+
+    def find_repeat(self, topic: str, length: str, platform: str, tone: str,
+                    language: str) -> Optional[Tuple[int, Dict]]:
+        """The latest (id, post) generated with the same settings and a matching topic key, if any.
+
+        Fallback posts are skipped, since they are not worth reusing.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, record FROM posts WHERE topic_key = ? AND platform = ? AND length = ? AND tone = ? "
+                "AND language = ? AND json_extract(record, '$.metadata.fallback') IS NULL ORDER BY id DESC LIMIT 1",
+                (topic_key(topic), platform, length, tone, language)
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def append_many(self, posts: Iterable[Dict], source: Optional[str] = None) -> bool:
+        """Append several posts in a single transaction.
+
+        source names the file the posts are imported from. The import is
+        recorded in the same transaction and skipped, returning False, if
+        that file has already been imported.
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # Another process may have finished the import while we waited for the lock
+                imported = source is None or not self._db.execute(
+                    "SELECT 1 FROM migrations WHERE source = ?", (source,)).fetchone()
+                if imported:
+                    cursor = self._db.executemany(INSERT_POST, (self._row(post) for post in posts))
+                    if source is not None:
+                        self._db.execute("INSERT INTO migrations (source, imported) VALUES (?, ?)",
+                                         (source, max(cursor.rowcount, 0)))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            if imported:
+                self._version += 1
+                self.compact()
+            return imported
+
+    def recent(self, limit: int = 10) -> List[Dict]:
+        """Return the latest posts, oldest first."""
+        with self._lock:
+            rows = self._db.execute("SELECT record FROM posts ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [json.loads(record) for (record,) in reversed(rows)]
+
+    def query(self, platform: Optional[str] = None, language: Optional[str] = None, tone: Optional[str] = None,
+              topic: Optional[str] = None, since: Optional[Union[str, datetime]] = None,
+              until: Optional[Union[str, datetime]] = None, limit: int = 20, offset: int = 0,
+              cursor: Optional[int] = None) -> Dict:
+        """Return a page of posts matching the filters, newest first.
+
+        topic matches any part of the topic, ignoring case. since and until
+        bound the timestamp (inclusive). Pass the returned next_cursor back as
+        cursor to fetch the following page; it is None on the last page. The
+        posts' ids are returned alongside them in 'ids'.
+        """
+        clauses, params = self._filters(platform, language, tone, topic, since, until)
+        if cursor is not None:
+            clauses.append("id < ?")
+            params.append(cursor)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, record FROM posts {where} ORDER BY id DESC LIMIT ? OFFSET ?",
+                params + [limit + 1, offset]
+            ).fetchall()
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return {'posts': [json.loads(record) for _, record in rows[:limit]], 'next_cursor': next_cursor,
+                'ids': [post_id for post_id, _ in rows[:limit]]}
+
+    def count(self, platform: Optional[str] = None, language: Optional[str] = None, tone: Optional[str] = None,
+              topic: Optional[str] = None, since: Optional[Union[str, datetime]] = None,
+              until: Optional[Union[str, datetime]] = None) -> int:
+        """Number of posts matching the filters."""
+        clauses, params = self._filters(platform, language, tone, topic, since, until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM posts {where}", params).fetchone()[0]
+
+    @staticmethod
+    def _filters(platform, language, tone, topic, since, until) -> tuple:
+        """Build the WHERE clauses and parameters for a query."""
+        clauses, params = [], []
+        for column, value in (('platform', platform), ('language', language), ('tone', tone)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if topic:
+            if len(topic) >= 3 and not any(char in topic for char in '%_\\'):
+                # Trigram index lookup; shorter terms have no trigrams to match on
+                clauses.append("id IN (SELECT rowid FROM posts_topic_fts WHERE topic LIKE ?)")
+                params.append(f"%{topic}%")
+            else:
+                escaped = topic.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                clauses.append("topic LIKE ? ESCAPE '\\'")
+                params.append(f"%{escaped}%")
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since.isoformat() if isinstance(since, datetime) else since)
+        if until:
+            clauses.append("timestamp <= ?")
+            params.append(until.isoformat() if isinstance(until, datetime) else until)
+        return clauses, params
+
+    def all(self) -> List[Dict]:
+        """Return every post, oldest first."""
+        with self._lock:
+            rows = self._db.execute("SELECT record FROM posts ORDER BY id").fetchall()
+        return [json.loads(record) for (record,) in rows]
+
+    def records(self) -> List[PostRecord]:
+        """Every post as a compact PostRecord, oldest first; use to_dict() for the usual dict."""
+        with self._lock:
+            rows = self._db.execute("SELECT record FROM posts ORDER BY id").fetchall()
+        return [PostRecord.from_dict(json.loads(record)) for (record,) in rows]
+
+    def columns(self) -> PostColumns:
+        """Every post's id, timestamp, topic, length, platform, tone and language as columns, oldest first.
+
+        Read from the indexed columns without decoding the posts, for scans over the whole history.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, timestamp, topic, length, platform, tone, language FROM posts ORDER BY id"
+            ).fetchall()
+        return PostColumns.from_rows(rows)
+
+    def clear(self):
+        """Delete every post and reclaim the space."""
+        with self._lock:
+            self._db.execute("DELETE FROM posts")
+            self._db.execute("VACUUM")
+            self._version += 1
+            self.compact()
+
+    def version(self) -> int:
+        """A number that goes up whenever posts are added or deleted, by this store or another connection.
+
+        Other connections are noticed through SQLite's data_version, which
+        also changes on writes to other tables in the file (the job queue);
+        those only cost a cached view a needless refresh.
+        """
+        with self._lock:
+            data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                self._data_version = data_version
+                self._version += 1
+            return self._version
+
+    def compact(self):
+        """Checkpoint the write-ahead log back into the database file and truncate it."""
+        self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._db.close()
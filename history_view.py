@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict
+
+from history_store import HistoryStore
+
+
+def render_post(post: Dict) -> str:
+    """HTML for one post in the History tab."""
+    metadata = post['metadata']
+    timestamp = datetime.fromisoformat(post['timestamp']).strftime("%Y-%m-%d %H:%M:%S")
+    post_class = "tiktok-post" if metadata['platform'] == "TikTok" else ""
+    content_html = post['content'].replace('\n', '<br>')
+    return f"""
+    <div class="history-container {post_class}">
+        <div>{content_html}</div>
+        <div class="metadata">
+            Topic: {metadata['topic']} | Platform: {metadata['platform']} |
+            Length: {metadata['length']} | Tone: {metadata['tone']} |
+            Language: {metadata.get('language', 'EN')} | Generated: {timestamp}
+        </div>
+    </div>
+    """
+
+
+class HistoryView:
+    """Paginated, pre-rendered HTML view of the post history, meant to be shared by every session.
+
+    Pages are rendered once per history version and reused until a post is
+    added or the history is cleared, by this process or another. Each post's
+    HTML is memoized by id, so when a new post shifts the pages only that one
+    post is rendered. Up to max_posts fragments are kept, least recently used
+    first out.
+    """
+
+    def __init__(self, store: HistoryStore, page_size: int = 10, max_posts: int = 1000):
+        self.store = store
+        self.page_size = page_size
+        self.max_posts = max_posts
+        self._fragments: OrderedDict = OrderedDict()
+        self._pages: Dict[int, str] = {}
+        self._total = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self._stats = {'page_hits': 0, 'page_renders': 0, 'post_renders': 0}
+
+    def _refresh(self):
+        """Drop the cached pages if the history has changed. Call with the lock held."""
+        version = self.store.version()
+        if version != self._version:
+            self._version = version
+            self._pages = {}
+            self._total = self.store.count()
+
+    def page_count(self) -> int:
+        """Number of pages in the history; 0 if it is empty."""
+        with self._lock:
+            self._refresh()
+            return -(-self._total // self.page_size)
+
+    def page(self, number: int) -> str:
+        """HTML for a page of posts, newest first. Pages are numbered from 0."""
+        with self._lock:
+            self._refresh()
+            html = self._pages.get(number)
+            if html is not None:
+                self._stats['page_hits'] += 1
+                return html
+            result = self.store.query(limit=self.page_size, offset=number * self.page_size)
+            fragments = []
+            for post_id, post in zip(result['ids'], result['posts']):
+                fragment = self._fragments.get(post_id)
+                if fragment is None:
+                    fragment = self._fragments[post_id] = render_post(post)
+                    self._stats['post_renders'] += 1
+                    if len(self._fragments) > self.max_posts:
+                        self._fragments.popitem(last=False)
+                else:
+                    self._fragments.move_to_end(post_id)
+                fragments.append(fragment)
+            html = self._pages[number] = "".join(fragments)
+            self._stats['page_renders'] += 1
+            return html
+
+    def stats(self) -> Dict[str, int]:
+        """Cached page hits and page and post renders so far."""
+        with self._lock:
+            return dict(self._stats, cached_posts=len(self._fragments), cached_pages=len(self._pages))
@@ -0,0 +1,274 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from rate_limiter import PRIORITY_INTERACTIVE
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+JOB_COLUMNS = ("id, idempotency_key, spec, status, priority, attempts, max_attempts, run_after, worker, "
+               "post_id, error, partial, created, updated")
+
+
+class JobQueue:
+    """Durable queue of post generation jobs backed by SQLite in WAL mode.
+
+    Jobs survive restarts and can be shared by several worker processes:
+    claim() hands each job to exactly one worker, which holds it for lease
+    seconds. A job whose worker dies is handed out again once its lease runs
+    out. A failed attempt is retried after an exponential backoff until
+    max_attempts is reached. Finished jobs point at their post in the
+    history by post_id, so the queue lives in the history database by default.
+    While a job runs, its worker can keep the text generated so far in
+    'partial' for pollers to show.
+    """
+
+    def __init__(self, path: str = "post_history.db", lease: float = 300.0, backoff: float = 2.0,
+                 max_backoff: float = 60.0):
+        self.path = path
+        self.lease = lease
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idempotency_key TEXT UNIQUE,
+            spec TEXT NOT NULL,
+            status TEXT NOT NULL,
+            priority INTEGER NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            run_after REAL NOT NULL,
+            lease_until REAL,
+            worker TEXT,
+            post_id INTEGER,
+            error TEXT,
+            partial TEXT,
+            created REAL NOT NULL,
+            updated REAL NOT NULL
+        )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority, run_after, id)")
+        if 'partial' not in {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}:
+            try:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN partial TEXT")
+            except sqlite3.OperationalError:
+                # Another process added it first
+                pass
+
+    def submit(self, spec: Dict, idempotency_key: Optional[str] = None, priority: int = PRIORITY_INTERACTIVE,
+               max_attempts: int = 3) -> int:
+        """Queue a job and return its id.
+
+        spec holds generate_post's arguments (topic, length, platform, tone,
+        language). Submitting again with the same idempotency_key returns the
+        first job's id instead of queueing a duplicate.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO jobs (idempotency_key, spec, status, priority, max_attempts, run_after, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (idempotency_key) DO NOTHING",
+                (idempotency_key, json.dumps(spec, ensure_ascii=False), QUEUED, priority, max_attempts, now, now, now)
+            )
+            if cursor.rowcount:
+                return cursor.lastrowid
+            return self._db.execute("SELECT id FROM jobs WHERE idempotency_key = ?", (idempotency_key,)).fetchone()[0]
+
+    def poll(self, job_id: int) -> Optional[Dict]:
+        """Return a job's status, attempts, error, partial text and post_id, or None if there is no such job."""
+        with self._lock:
+            row = self._db.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a job that hasn't finished. Returns False if it already had.
+
+        A running job finishes generating, but its post is discarded.
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, lease_until = NULL, updated = ? WHERE id = ? AND status IN (?, ?)",
+                (CANCELLED, time.time(), job_id, QUEUED, RUNNING)
+            )
+        return cursor.rowcount > 0
+
+    def claim(self, worker: str) -> Optional[Dict]:
+        """Take the next due job for a worker, highest priority first, or None if there is none."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs whose worker died on the last attempt have nothing left to retry
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated = ? "
+                    "WHERE status = ? AND lease_until < ? AND attempts >= max_attempts",
+                    (FAILED, "Worker stopped before finishing", now, RUNNING, now)
+                )
+                row = self._db.execute(
+                    f"SELECT {JOB_COLUMNS} FROM jobs WHERE (status = ? AND run_after <= ?) OR (status = ? AND lease_until < ?) "
+                    "ORDER BY priority, id LIMIT 1",
+                    (QUEUED, now, RUNNING, now)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_until = ?, worker = ?, updated = ? "
+                        "WHERE id = ?",
+                        (RUNNING, now + self.lease, worker, now, row[0])
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = self._job(row)
+        job.update(status=RUNNING, attempts=job['attempts'] + 1, worker=worker)
+        return job
+
+    def progress(self, job_id: int, partial: str) -> bool:
+        """Store the text generated so far for a running job. Returns False if it is no longer running."""
+        with self._lock:
+            cursor = self._db.execute("UPDATE jobs SET partial = ?, updated = ? WHERE id = ? AND status = ?",
+                                      (partial, time.time(), job_id, RUNNING))
+        return cursor.rowcount > 0
+
+    def complete(self, job_id: int, post_id: int) -> bool:
+        """Mark a running job done with its post. Returns False if it was cancelled meanwhile."""
+        return self._finish(job_id, DONE, post_id=post_id)
+
+    def fail(self, job_id: int, error: str) -> bool:
+        """Record a failed attempt: retry after a backoff, or fail the job once it is out of attempts."""
+        with self._lock:
+            row = self._db.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ? AND status = ?",
+                                   (job_id, RUNNING)).fetchone()
+        if row is None:
+            return False
+        attempts, max_attempts = row
+        if attempts >= max_attempts:
+            return self._finish(job_id, FAILED, error=error)
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+        return self._finish(job_id, QUEUED, error=error, run_after=time.time() + delay)
+
+    def release(self, job_id: int) -> bool:
+        """Put a running job back in the queue without counting the attempt, e.g. when its worker shuts down."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts - 1, lease_until = NULL, worker = NULL, partial = NULL, "
+                "updated = ? WHERE id = ? AND status = ?",
+                (QUEUED, time.time(), job_id, RUNNING)
+            )
+        return cursor.rowcount > 0
+
+    def _finish(self, job_id: int, status: str, post_id: Optional[int] = None, error: Optional[str] = None,
+                run_after: Optional[float] = None) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, post_id = ?, error = ?, run_after = COALESCE(?, run_after), "
+                "lease_until = NULL, partial = NULL, updated = ? WHERE id = ? AND status = ?",
+                (status, post_id, error, run_after, now, job_id, RUNNING)
+            )
+        return cursor.rowcount > 0
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in each status."""
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    @staticmethod
+    def _job(row: tuple) -> Dict:
+        job = dict(zip([column.strip() for column in JOB_COLUMNS.split(',')], row))
+        job['spec'] = json.loads(job['spec'])
+        return job
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._db.close()
+
+
+class JobWorker:
+    """Runs queued jobs one at a time with a generator.
+
+    A post that comes back as fallback content (the API could not be reached)
+    counts as a failed attempt while attempts remain, so it is retried
+    after the backoff instead of being stored.
+
+    With stream=True the post is streamed and the text so far is written to
+    the job every progress_interval seconds, so a poller can show it.
+    """
+
+    def __init__(self, queue: JobQueue, generator, name: Optional[str] = None, poll_interval: float = 0.5,
+                 stream: bool = False, progress_interval: float = 0.25):
+        self.queue = queue
+        self.generator = generator
+        self.name = name or f"{os.getpid()}-{threading.get_ident()}"
+        self.poll_interval = poll_interval
+        self.stream = stream
+        self.progress_interval = progress_interval
+
+    def run(self, stop: Optional[threading.Event] = None, drain: bool = False):
+        """Run jobs until stop is set, or with drain until no job is queued or running."""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            if self.run_once():
+                continue
+            if drain and not any(self.queue.counts().get(status) for status in (QUEUED, RUNNING)):
+                return
+            stop.wait(self.poll_interval)
+
+    def run_once(self) -> bool:
+        """Run the next due job, if there is one. Returns whether a job was run."""
+        job = self.queue.claim(self.name)
+        if job is None:
+            return False
+        try:
+            # A retry asks the API for a new post rather than the cached response
+            if self.stream:
+                result = self._generate_streamed(job)
+            else:
+                result = self.generator.generate_post(**job['spec'], fresh=job['attempts'] > 1,
+                                                      priority=job['priority'], save=False)
+            if result['metadata'].get('fallback') and job['attempts'] < job['max_attempts']:
+                self.queue.fail(job['id'], "The API could not be reached, got fallback content")
+                return True
+            if self.queue.poll(job['id'])['status'] == RUNNING:
+                post_id = self.generator._save_history(result)
+                if post_id is None:
+                    raise RuntimeError("The post could not be saved to the history")
+                self.queue.complete(job['id'], post_id)
+        except KeyboardInterrupt:
+            self.queue.release(job['id'])
+            raise
+        except Exception as e:
+            print(f"Job {job['id']} failed: {e}")
+            self.queue.fail(job['id'], f"{type(e).__name__}: {e}")
+        return True
+
+    def _generate_streamed(self, job: Dict) -> Dict:
+        """Stream a job's post, writing the text so far to the job as it arrives."""
+        stream = self.generator.generate_post_stream(**job['spec'], fresh=job['attempts'] > 1,
+                                                     priority=job['priority'], save=False)
+        text = ""
+        written_at = 0.0
+        for chunk in stream:
+            text += chunk
+            now = time.monotonic()
+            if now - written_at >= self.progress_interval:
+                self.queue.progress(job['id'], text)
+                written_at = now
+        return stream.result
@@ -0,0 +1,239 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, Tuple
+
+logger = logging.getLogger("social_media_generator.metrics")
+
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+# What RequestTrace.stage() returns without a profiler
+_NO_STAGE = nullcontext()
+
+HELP = {
+    'generation_phase_seconds': "Wall-clock seconds spent in each generation phase",
+    'generation_seconds': "End-to-end seconds per generated post",
+    'time_to_first_token_seconds': "Seconds until the first streamed token arrived",
+    'openrouter_requests_total': "OpenRouter requests by call and HTTP status",
+    'openrouter_timeouts_total': "OpenRouter requests that timed out",
+    'openrouter_retries_total': "Retries made by the HTTP session after 429/5xx responses",
+    'openrouter_tokens_total': "Tokens reported in the API usage field",
+    'openrouter_truncations_total': "Completions cut off by max_tokens (finish_reason length)",
+    'generation_fallbacks_total': "Calls answered by fallback content instead of the API",
+    'response_cache_hits_total': "Calls answered from the response cache",
+    'structured_parse_failures_total': "Single-call responses that could not be parsed and were retried as separate calls",
+    'model_routed_total': "Requests routed to each model as first choice",
+    'model_requests_total': "Requests answered by each model, by outcome",
+    'model_latency_seconds': "Seconds per successful non-streaming request, by model",
+    'hedged_requests_total': "Hedge requests sent to an alternate model",
+    'hedge_outcomes_total': "Hedged requests by which request answered first",
+    'near_duplicates_total': "Posts that repeated an earlier request or content, by whether they were reused or flagged",
+    'circuit_state': "Circuit breaker state per model: 0 closed, 1 half-open, 2 open",
+    'circuit_transitions_total': "Circuit breaker state changes per model, by the state entered",
+    'circuit_short_circuits_total': "Calls sent straight to the fallback because every model's circuit was open"
+}
+
+
+class Histogram:
+    """Sliding-window sample of observations with percentile summaries."""
+
+    def __init__(self, window: int = 2048):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+        self.sum += value
+
+    def quantiles(self) -> Dict[float, float]:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+
+class MetricsRegistry:
+    """In-process store of counters, gauges and percentile histograms.
+
+    Export it with to_prometheus() for a /metrics endpoint or to_json() for
+    logs. Finished request traces are also logged as one JSON line each on
+    the social_media_generator.metrics logger.
+    """
+
+    def __init__(self, window: int = 2048):
+        self.window = window
+        self._counters: Dict[str, Dict[Tuple, float]] = defaultdict(lambda: defaultdict(float))
+        self._gauges: Dict[str, Dict[Tuple, float]] = defaultdict(dict)
+        self._histograms: Dict[str, Dict[Tuple, Histogram]] = defaultdict(dict)
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Add value to a counter."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._counters[name][key] += value
+
+    def set(self, name: str, value: float, **labels):
+        """Set a gauge to value."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._gauges[name][key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record one observation in a histogram."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            histogram = self._histograms[name].get(key)
+            if histogram is None:
+                histogram = self._histograms[name][key] = Histogram(self.window)
+            histogram.observe(value)
+
+    def trace(self, profiler=None, **labels) -> 'RequestTrace':
+        """Start tracing one request, feeding its phases to profiler (a StageProfiler) too if given."""
+        return RequestTrace(self, labels, profiler)
+
+    def snapshot(self) -> Dict:
+        """All counters, gauges and histogram summaries as plain data."""
+        with self._lock:
+            counters = {
+                name: [{'labels': dict(key), 'value': value} for key, value in series.items()]
+                for name, series in self._counters.items()
+            }
+            gauges = {
+                name: [{'labels': dict(key), 'value': value} for key, value in series.items()]
+                for name, series in self._gauges.items()
+            }
+            histograms = {
+                name: [{
+                    'labels': dict(key),
+                    'count': histogram.count,
+                    'sum': round(histogram.sum, 6),
+                    'quantiles': {str(q): round(v, 6) for q, v in histogram.quantiles().items()}
+                } for key, histogram in series.items()]
+                for name, series in self._histograms.items()
+            }
+        return {'counters': counters, 'gauges': gauges, 'histograms': histograms}
+
+    def to_json(self) -> str:
+        """The snapshot as a JSON document."""
+        return json.dumps(self.snapshot(), sort_keys=True)
+
+    def to_prometheus(self) -> str:
+        """The registry in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, series in sorted(snapshot['counters'].items()):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for item in series:
+                lines.append(f"{name}{_format_labels(item['labels'])} {_format_value(item['value'])}")
+        for name, series in sorted(snapshot['gauges'].items()):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} gauge")
+            for item in series:
+                lines.append(f"{name}{_format_labels(item['labels'])} {_format_value(item['value'])}")
+        for name, series in sorted(snapshot['histograms'].items()):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} summary")
+            for item in series:
+                for q, value in item['quantiles'].items():
+                    lines.append(f"{name}{_format_labels({**item['labels'], 'quantile': q})} {_format_value(value)}")
+                lines.append(f"{name}_sum{_format_labels(item['labels'])} {_format_value(item['sum'])}")
+                lines.append(f"{name}_count{_format_labels(item['labels'])} {item['count']}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Drop every recorded metric."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+class RequestTrace:
+    """Phase timings and details for one request, committed to the registry by finish()."""
+
+    def __init__(self, registry: MetricsRegistry, labels: Dict[str, str], profiler=None):
+        self.registry = registry
+        self.labels = labels
+        self.profiler = profiler
+        self.start = time.perf_counter()
+        self.phases: Dict[Tuple[str, str], float] = defaultdict(float)
+        self.details: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str, call: str = 'post') -> Iterator[None]:
+        """Time a block as one phase of the request."""
+        start = time.perf_counter()
+        try:
+            if self.profiler is None:
+                yield
+            else:
+                with self.profiler.stage(name, call):
+                    yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self.phases[(call, name)] += seconds
+
+    def add_phase(self, name: str, seconds: float, call: str = 'post'):
+        """Add already-measured time to a phase."""
+        with self._lock:
+            self.phases[(call, name)] += seconds
+        if self.profiler is not None:
+            self.profiler.record(name, seconds, call=call)
+
+    def stage(self, name: str, call: str = 'post'):
+        """Time a block for the profiler only; a no-op context without one."""
+        return self.profiler.stage(name, call) if self.profiler is not None else _NO_STAGE
+
+    def record(self, key: str, value):
+        """Attach a detail (token counts, outcome, ...) to the request log line."""
+        with self._lock:
+            self.details[key] = value
+
+    def finish(self, outcome: str = 'ok', log: bool = True) -> Dict:
+        """Record the phase histograms and log the trace as one JSON line."""
+        total = time.perf_counter() - self.start
+        with self._lock:
+            phases = dict(self.phases)
+            details = dict(self.details)
+        for (call, name), seconds in phases.items():
+            self.registry.observe('generation_phase_seconds', seconds, call=call, phase=name)
+        self.registry.observe('generation_seconds', total, outcome=outcome)
+        if self.profiler is not None:
+            self.profiler.record(outcome, total, call='total')
+
+        entry = {
+            'event': 'generation',
+            **self.labels,
+            'outcome': outcome,
+            'seconds': round(total, 6),
+            'phases': {f"{call}.{name}": round(seconds, 6) for (call, name), seconds in phases.items()},
+            **details
+        }
+        if log and logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(entry, ensure_ascii=False, default=str))
+        return entry
+
+
+def _format_labels(labels: Dict) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+default_registry = MetricsRegistry()
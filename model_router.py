@@ -0,0 +1,241 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from metrics import Histogram, MetricsRegistry, default_registry
+from rate_limiter import QueueTimeout
+
+
+def rate_limited(error: requests.RequestException) -> bool:
+    """Whether a request failed because it was rate limited, locally or with a 429, rather than by the model."""
+    if isinstance(error, QueueTimeout):
+        return True
+    response = getattr(error, 'response', None)
+    return response is not None and response.status_code == 429
+
+
+class ModelHealth:
+    """Latency window, failure streak and circuit breaker for one model."""
+
+    def __init__(self, breaker: CircuitBreaker, window: int = 200):
+        self.breaker = breaker
+        self.latency = Histogram(window)
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+
+
+class ModelRouter:
+    """Routes chat completion requests across a pool of OpenRouter models.
+
+    Each request goes to the healthy model with the lowest median latency;
+    models without samples yet are tried first so every model gets measured.
+    Each model has a CircuitBreaker: once failure_rate of its last
+    failure_window requests (at least min_calls) failed with an error status
+    or timeout, it is skipped for open_seconds and then probed with probes
+    requests before taking traffic again. Rate limiting (429 responses and
+    requests that timed out in the scheduler's queue) says nothing about the
+    model, so it counts as neither a success nor a failure. While every model's circuit is
+    open, complete() raises CircuitOpenError straight away so callers can
+    fall back instead of waiting out a timeout. failure_rate=None turns the
+    breakers off.
+
+    With hedge=True a second request is sent to the next best model when the
+    first has not answered within that model's p95 latency (hedge_quantile),
+    and whichever answers first wins. The loser is cancelled if it has not
+    started yet, otherwise its response is closed and discarded.
+    """
+
+    def __init__(self, models: Iterable[str], hedge: bool = False, hedge_quantile: float = 0.95,
+                 min_hedge_delay: float = 0.5, min_samples: int = 5, failure_rate: Optional[float] = 0.5,
+                 failure_window: int = 20, min_calls: int = 5, open_seconds: float = 30.0, probes: int = 1,
+                 metrics: Optional[MetricsRegistry] = None):
+        self.models: List[str] = list(dict.fromkeys(models))
+        if not self.models:
+            raise ValueError("ModelRouter needs at least one model")
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.metrics = metrics or default_registry
+        self._health = {
+            model: ModelHealth(CircuitBreaker(model, failure_rate, min_calls, failure_window, open_seconds, probes,
+                                              self.metrics))
+            for model in self.models
+        }
+        self._lock = threading.Lock()
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+
+    def _score(self, model: str) -> float:
+        health = self._health[model]
+        if not health.latency.samples:
+            return 0.0
+        return health.latency.quantiles()[0.5]
+
+    def choose(self, exclude: Iterable[str] = ()) -> Optional[str]:
+        """The fastest model not in exclude whose circuit lets requests through, or None if there is none."""
+        with self._lock:
+            healthy = [model for model in self.models
+                       if model not in exclude and self._health[model].breaker.available()]
+            if not healthy:
+                return None
+            # min() keeps pool order between equal scores, so the first model wins ties
+            return min(healthy, key=self._score)
+
+    def acquire(self, exclude: Iterable[str] = ()) -> Tuple[str, int]:
+        """choose() a model and pass its circuit breaker, for a request about to be sent.
+
+        Returns the model and the circuit generation to record() the outcome
+        under. Raises CircuitOpenError if every model's circuit is open.
+        """
+        exclude = set(exclude)
+        while True:
+            model = self.choose(exclude)
+            if model is None:
+                raise CircuitOpenError(f"Circuit open for every model, next probe in {self.retry_in():.1f}s")
+            # Another thread may have taken the last half-open probe since choose()
+            generation = self._health[model].breaker.allow()
+            if generation is not None:
+                return model, generation
+            exclude.add(model)
+
+    def retry_in(self) -> float:
+        """Seconds until the first open circuit lets probes through."""
+        return min(self._health[model].breaker.retry_in() for model in self.models)
+
+    def record(self, model: str, seconds: Optional[float], ok: bool, generation: Optional[int] = None):
+        """Record the outcome of one request; seconds is None when latency is not comparable (streaming).
+
+        generation is the circuit generation acquire() returned for the request.
+        """
+        with self._lock:
+            health = self._health[model]
+            if ok:
+                health.successes += 1
+                health.consecutive_failures = 0
+                if seconds is not None:
+                    health.latency.observe(seconds)
+            else:
+                health.failures += 1
+                health.consecutive_failures += 1
+        health.breaker.record(ok, generation)
+        self.metrics.inc('model_requests_total', model=model, outcome='ok' if ok else 'error')
+        if ok and seconds is not None:
+            self.metrics.observe('model_latency_seconds', seconds, model=model)
+
+    def release(self, model: str, generation: Optional[int] = None):
+        """Record a request that was rate limited: it gives back its circuit place without an outcome."""
+        self._health[model].breaker.release(generation)
+        self.metrics.inc('model_requests_total', model=model, outcome='rate_limited')
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """Seconds to wait on model before hedging, or None until it has enough latency samples."""
+        with self._lock:
+            latency = self._health[model].latency
+            if len(latency.samples) < self.min_samples:
+                return None
+            return max(self.min_hedge_delay, latency.quantiles()[self.hedge_quantile])
+
+    def _send(self, send: Callable[[Dict, float], requests.Response], model: str, data: Dict,
+              timeout: float, generation: Optional[int] = None) -> requests.Response:
+        start = time.perf_counter()
+        try:
+            response = send({**data, 'model': model}, timeout)
+        except requests.RequestException as e:
+            if rate_limited(e):
+                self.release(model, generation)
+            else:
+                self.record(model, None, False, generation)
+            raise
+        if response.status_code == 429:
+            self.release(model, generation)
+        else:
+            self.record(model, time.perf_counter() - start, response.status_code == 200, generation)
+        return response
+
+    def complete(self, send: Callable[[Dict, float], requests.Response], data: Dict,
+                 timeout: float) -> Tuple[requests.Response, str]:
+        """Send data to the routed model (hedging if enabled) and return the response and the model that answered.
+
+        send(data, timeout) performs one HTTP request; data['model'] is replaced
+        by the routed model. Raises CircuitOpenError without sending anything
+        if every model's circuit is open.
+        """
+        primary, generation = self.acquire()
+        self.metrics.inc('model_routed_total', model=primary)
+        alternate = self.choose(exclude=(primary,)) if self.hedge else None
+        delay = self.hedge_delay(primary) if alternate else None
+        if delay is None or delay >= timeout:
+            return self._send(send, primary, data, timeout, generation), primary
+
+        deadline = time.monotonic() + timeout
+        executor = self._executor()
+        first = executor.submit(self._send, send, primary, data, timeout, generation)
+        done, _ = wait([first], timeout=delay)
+        remaining = deadline - time.monotonic()
+        if done or remaining <= 0:
+            return first.result(), primary
+        alternate_generation = self._health[alternate].breaker.allow()
+        if alternate_generation is None:
+            # The alternate's circuit opened in the meantime, so only the primary request runs
+            return first.result(), primary
+
+        self.metrics.inc('hedged_requests_total', model=alternate)
+        second = executor.submit(self._send, send, alternate, data, remaining, alternate_generation)
+        models = {first: primary, second: alternate}
+        pending = set(models)
+        result, error = None, None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except requests.RequestException as e:
+                    error = e
+                    continue
+                if result is None or (result[0].status_code != 200 and response.status_code == 200):
+                    if result is not None:
+                        result[0].close()
+                    result = (response, models[future])
+                else:
+                    response.close()
+            if result is not None and result[0].status_code == 200:
+                break
+
+        for future in pending:
+            # Already running requests can't be interrupted; drop their responses when they land
+            if not future.cancel():
+                future.add_done_callback(_discard_response)
+        if result is None:
+            raise error
+        self.metrics.inc('hedge_outcomes_total', winner='primary' if result[1] == primary else 'hedge')
+        return result
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+            return self._hedge_executor
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-model request counts, failure streaks, circuit state and latency percentiles."""
+        with self._lock:
+            return {
+                model: {
+                    'successes': health.successes,
+                    'failures': health.failures,
+                    'consecutive_failures': health.consecutive_failures,
+                    'circuit': health.breaker.stats(),
+                    'latency': {str(q): round(v, 6) for q, v in health.latency.quantiles().items()}
+                }
+                for model, health in self._health.items()
+            }
+
+
+def _discard_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
@@ -0,0 +1,143 @@
+import json
+import time
+from typing import Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from rate_limiter import PRIORITY_INTERACTIVE, QueueTimeout, RequestScheduler
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that can report how many requests reused a pooled connection."""
+
+    def connection_stats(self) -> Dict[str, int]:
+        """Sum connection and request counts over all live connection pools."""
+        pools = self.poolmanager.pools
+        new_connections = requests_sent = 0
+        with pools.lock:
+            for key in list(pools.keys()):
+                pool = pools[key]
+                new_connections += pool.num_connections
+                requests_sent += pool.num_requests
+        return {
+            'requests': requests_sent,
+            'new_connections': new_connections,
+            'reused_connections': max(0, requests_sent - new_connections)
+        }
+
+
+class OpenRouterClient:
+    """Keep-alive HTTP client for the OpenRouter chat completions API.
+
+    One session is shared across threads and batch runs, so requests to
+    openrouter.ai reuse pooled connections instead of paying a new TCP+TLS
+    handshake each time. 5xx responses are retried with backoff. Every request
+    goes through a RequestScheduler, which queues it by priority and requeues
+    it after a 429 as long as it can still finish before its timeout.
+    """
+
+    def __init__(self, api_base: str, api_key: Optional[str], pool_size: int = 16,
+                 max_retries: int = 2, backoff_factor: float = 0.5,
+                 scheduler: Optional[RequestScheduler] = None):
+        self.api_base = api_base
+        self.api_key = api_key
+        self.pool_size = pool_size
+        self.scheduler = scheduler or RequestScheduler(max_concurrency=pool_size)
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            # 429s are handled by the scheduler, which can let other requests go first.
+            # urllib3 would otherwise sleep out any Retry-After itself while holding the slot
+            status_forcelist=(500, 502, 503, 504),
+            # A read timeout already used up the request's time, so it isn't sent again
+            read=False,
+            allowed_methods=frozenset(['POST']),
+            respect_retry_after_header=False,
+            raise_on_status=False
+        )
+        self.adapter = PooledHTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry, pool_block=False)
+
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "HTTP-Referer": "https://github.com/yourusername/social-media-generator",
+            "X-Title": "Social Media Post Generator"
+        })
+
+    def _should_retry(self, response: requests.Response, deadline: float) -> bool:
+        """Whether a rate limited request can be requeued and still finish before its deadline."""
+        if response.status_code != 429:
+            return False
+        return self.scheduler.resume_at() < deadline - 1
+
+    @staticmethod
+    def _remaining(deadline: float) -> float:
+        """Seconds left before a monotonic deadline; raises QueueTimeout once it has passed."""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise QueueTimeout("Deadline passed before the request was sent")
+        return remaining
+
+    def chat_completion(self, data: Dict, timeout: float, priority: int = PRIORITY_INTERACTIVE) -> requests.Response:
+        """POST a chat completion request and return the raw response, within timeout seconds in all."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.scheduler.slot(priority, deadline):
+                response = self.session.post(f"{self.api_base}/chat/completions", json=data,
+                                             timeout=self._remaining(deadline))
+            self.scheduler.observe(response.status_code, response.headers)
+            if not self._should_retry(response, deadline):
+                return response
+
+    def stream_chat_completion(self, data: Dict, timeout: float,
+                               priority: int = PRIORITY_INTERACTIVE) -> Iterator[str]:
+        """POST a streaming chat completion request and yield the text deltas as they arrive.
+
+        Raises requests.HTTPError for error responses and requests.Timeout if the
+        whole stream takes longer than timeout seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.scheduler.slot(priority, deadline):
+                response = self.session.post(f"{self.api_base}/chat/completions", json={**data, "stream": True},
+                                             timeout=self._remaining(deadline), stream=True)
+                self.scheduler.observe(response.status_code, response.headers)
+                if not self._should_retry(response, deadline):
+                    # Hold the slot until the whole stream has been read
+                    yield from self._iter_stream(response, deadline, timeout)
+                    return
+                response.close()
+
+    def _iter_stream(self, response: requests.Response, deadline: float, timeout: float) -> Iterator[str]:
+        """Yield the text deltas from a streaming chat completion response."""
+        with response:
+            response.raise_for_status()
+            response.encoding = 'utf-8'
+            for line in response.iter_lines(decode_unicode=True):
+                if time.monotonic() > deadline:
+                    raise requests.Timeout(f"Stream did not finish within {timeout} seconds")
+                # Server-sent events: skip keep-alive comments and blank separators
+                if not line or not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                chunk = json.loads(payload)
+                if 'error' in chunk:
+                    raise requests.HTTPError(f"Stream error: {chunk['error'].get('message', chunk['error'])}")
+                delta = chunk['choices'][0].get('delta', {}).get('content')
+                if delta:
+                    yield delta
+
+    def connection_stats(self) -> Dict[str, int]:
+        """Connection reuse counters for the pooled session."""
+        return self.adapter.connection_stats()
+
+    def close(self):
+        """Close the session and its pooled connections."""
+        self.session.close()
@@ -0,0 +1,132 @@
+import json
+import os
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Iterator, List, Optional
+
+from text_formatter import PostFormatter, segment_sentences, truncate_graphemes
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "platform_rules.json")
+
+# Rule keys PostFormatter reads
+FORMAT_KEYS = ('max_length', 'max_words', 'max_hashtags', 'hashtag_style', 'emojis_per_line', 'line_breaks')
+
+
+class PlatformRules:
+    """One platform's rules, compiled once when the registry is loaded.
+
+    max_length is the limit for a single post and limit the limit for the
+    whole formatted post. A platform with a "thread" rule takes posts up to
+    the thread's max_length and split_thread() spreads them over up to
+    max_posts numbered posts.
+    """
+
+    __slots__ = ('platform', 'max_length', 'limit', 'thread_posts', 'thread_numbering', 'format_rules')
+
+    def __init__(self, platform: str, rules: Dict):
+        self.platform = platform
+        self.max_length = rules.get('max_length')
+        thread = rules.get('thread') or {}
+        self.thread_posts = thread.get('max_posts', 1)
+        self.thread_numbering = thread.get('numbering', " {index}/{total}")
+
+        format_rules = {key: rules[key] for key in FORMAT_KEYS if key in rules}
+        if thread:
+            format_rules['max_length'] = thread['max_length']
+        # Validates line_breaks up front rather than on the first post
+        PostFormatter(format_rules)
+        self.format_rules = MappingProxyType(format_rules)
+        self.limit = format_rules.get('max_length')
+
+    @property
+    def threaded(self) -> bool:
+        return self.thread_posts > 1
+
+    def formatter(self, paragraph_sentences: Optional[int] = None, hashtags: Optional[List[str]] = None,
+                  reserve: int = 0, truncation: str = 'word') -> PostFormatter:
+        """A new PostFormatter for one post on this platform."""
+        return PostFormatter(self.format_rules, paragraph_sentences, hashtags, reserve, truncation)
+
+    def split_thread(self, content: str) -> List[str]:
+        """Split a post longer than max_length into numbered thread posts.
+
+        Posts break between sentences, or between words inside a sentence too
+        long for one post. If that takes more than max_posts, the middle posts
+        are dropped so the closing one (with the CTA) is kept.
+        """
+        if self.max_length is None or len(content) <= self.max_length:
+            return [content]
+        width = len(self.thread_numbering.format(index=self.thread_posts, total=self.thread_posts))
+        room = self.max_length - width
+        posts, current = [], ""
+        for segment in segment_sentences(content):
+            for piece in _pieces(segment.text, room):
+                if current and len(current) + 1 + len(piece) > room:
+                    posts.append(current)
+                    current = piece
+                else:
+                    current = f"{current} {piece}" if current else piece
+        if current:
+            posts.append(current)
+        if len(posts) > self.thread_posts:
+            posts = posts[:self.thread_posts - 1] + posts[-1:]
+        total = len(posts)
+        return [post + self.thread_numbering.format(index=index, total=total) for index, post in enumerate(posts, 1)]
+
+
+def _pieces(text: str, room: int) -> Iterator[str]:
+    """text in pieces of at most room characters, broken between words."""
+    if len(text) <= room:
+        yield text
+        return
+    piece = ""
+    for word in text.split():
+        if len(word) > room:
+            word = truncate_graphemes(word, room)
+        if piece and len(piece) + 1 + len(word) > room:
+            yield piece
+            piece = word
+        else:
+            piece = f"{piece} {word}" if piece else word
+    if piece:
+        yield piece
+
+
+class PlatformRuleRegistry:
+    """Per-platform length, hashtag, emoji, line break and thread rules loaded from a JSON config file.
+
+    Each platform's rules are compiled into a PlatformRules once, at load.
+    Platforms without rules get unformatted posts and no length limit.
+    """
+
+    def __init__(self, config: Dict):
+        self.version = config.get('version', 'unversioned')
+        self.platforms: Dict[str, PlatformRules] = {
+            platform: PlatformRules(platform, rules) for platform, rules in config['platforms'].items()
+        }
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_RULES_PATH) -> 'PlatformRuleRegistry':
+        """Load rules from a JSON config file."""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def get(self, platform: Optional[str]) -> Optional[PlatformRules]:
+        return self.platforms.get(platform)
+
+    def __contains__(self, platform: str) -> bool:
+        return platform in self.platforms
+
+    def formatter(self, platform: Optional[str], paragraph_sentences: Optional[int] = None,
+                  hashtags: Optional[List[str]] = None, reserve: int = 0, truncation: str = 'word') -> PostFormatter:
+        """A new PostFormatter for one post on a platform."""
+        rules = self.platforms.get(platform)
+        if rules is None:
+            return PostFormatter(None, paragraph_sentences, hashtags, reserve, truncation)
+        return rules.formatter(paragraph_sentences, hashtags, reserve, truncation)
+
+
+@lru_cache(maxsize=None)
+def load_platform_rules(path: str = DEFAULT_RULES_PATH) -> PlatformRuleRegistry:
+    """Load and cache the rules for a config file, shared by every generator in the process."""
+    return PlatformRuleRegistry.load(path)
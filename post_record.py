@@ -0,0 +1,301 @@
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import datetime, timedelta
+from enum import Enum
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+
+class Platform(str, Enum):
+    TIKTOK = 'TikTok'
+    FACEBOOK = 'Facebook'
+    INSTAGRAM = 'Instagram'
+    LINKEDIN = 'LinkedIn'
+    TWITTER = 'Twitter'
+
+
+class Tone(str, Enum):
+    INSPIRATIONAL = 'Inspirational'
+    URGENT = 'Urgent'
+    EMOTIONAL = 'Emotional'
+    EMPATHETIC = 'Empathetic'
+    PROFESSIONAL = 'Professional'
+    FRIENDLY = 'Friendly'
+    CASUAL = 'Casual'
+
+
+class Length(str, Enum):
+    SHORT = 'short'
+    MEDIUM = 'medium'
+    LONG = 'long'
+
+
+class Language(str, Enum):
+    EN = 'EN'
+    BM = 'BM'
+
+
+_MEMBERS = {enum: {member.value: member for member in enum} for enum in (Platform, Tone, Length, Language)}
+# Interned key tuples for timings dicts, so posts with the same phases share one
+_TIMING_KEYS: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Top-level and metadata keys PostRecord keeps in slots; anything else is kept as is in its extra dicts
+_NO_EXTRA = MappingProxyType({})
+_POST_KEYS = frozenset({'content', 'image_suggestions', 'hashtags', 'timestamp', 'metadata'})
+_METADATA_KEYS = frozenset({'topic', 'length', 'platform', 'tone', 'language', 'prompt_version', 'timings'})
+
+
+def encode(enum, value):
+    """The enum member for value, or value itself, interned, if it isn't one (custom platforms and tones)."""
+    member = _MEMBERS[enum].get(value)
+    return member if member is not None else sys.intern(value)
+
+
+def decode(value) -> str:
+    return value.value if isinstance(value, Enum) else value
+
+
+def to_epoch(timestamp: str) -> Union[int, str]:
+    """Microseconds since the epoch for a naive ISO timestamp, or the timestamp itself if it wouldn't round-trip."""
+    try:
+        moment = datetime.fromisoformat(timestamp)
+    except ValueError:
+        return timestamp
+    if moment.tzinfo is not None:
+        return timestamp
+    micros = epoch_micros(moment)
+    return micros if from_epoch(micros) == timestamp else timestamp
+
+
+def epoch_micros(moment: datetime) -> int:
+    """Microseconds since the epoch for a naive datetime, comparable with PostRecord and PostColumns timestamps."""
+    return (moment - _EPOCH) // _MICROSECOND
+
+
+def from_epoch(micros: int) -> str:
+    """The ISO timestamp for microseconds since the epoch, as datetime.isoformat() writes it."""
+    return (_EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+def _strings(value) -> bool:
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+class PostRecord:
+    """Compact form of a history post, for holding many of them in memory.
+
+    Platform, tone, length and language are enum members (or interned
+    strings for values outside the enums), the timestamp is microseconds
+    since the epoch, lists are tuples and timings share their key tuple with
+    every post timed in the same phases. from_dict() and to_dict() round-trip
+    the dict generate_post returns exactly; keys and values that don't fit the
+    usual shape are kept as they are in extra and metadata_extra. A None slot
+    means the post had no such key, and metadata_extra is None if it had no
+    metadata at all.
+    """
+
+    __slots__ = ('content', 'timestamp', 'topic', 'length', 'platform', 'tone', 'language', 'prompt_version',
+                 'image_suggestions', 'hashtags', 'timing_keys', 'timing_values', 'metadata_extra', 'extra')
+
+    def __init__(self, content: Optional[str] = None, timestamp: Union[int, str, None] = None,
+                 topic: Optional[str] = None, length=None, platform=None, tone=None, language=None,
+                 prompt_version: Optional[str] = None, image_suggestions: Optional[Tuple[str, ...]] = None,
+                 hashtags: Optional[Tuple[str, ...]] = None, timing_keys: Optional[Tuple[str, ...]] = None,
+                 timing_values: Optional[tuple] = None, metadata_extra: Optional[Dict] = None,
+                 extra: Optional[Dict] = None):
+        self.content = content
+        self.timestamp = timestamp
+        self.topic = topic
+        self.length = length
+        self.platform = platform
+        self.tone = tone
+        self.language = language
+        self.prompt_version = prompt_version
+        self.image_suggestions = image_suggestions
+        self.hashtags = hashtags
+        self.timing_keys = timing_keys
+        self.timing_values = timing_values
+        self.metadata_extra = metadata_extra
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, post: Dict) -> 'PostRecord':
+        """Pack a post dict."""
+        record = cls()
+        extra = {key: value for key, value in post.items() if key not in _POST_KEYS}
+        for key in ('content', 'timestamp'):
+            value = post.get(key)
+            if isinstance(value, str):
+                setattr(record, key, to_epoch(value) if key == 'timestamp' else value)
+            elif key in post:
+                extra[key] = value
+        for key in ('image_suggestions', 'hashtags'):
+            value = post.get(key)
+            if _strings(value):
+                setattr(record, key, tuple(value))
+            elif key in post:
+                extra[key] = value
+
+        metadata = post.get('metadata')
+        if isinstance(metadata, dict):
+            metadata_extra = {key: value for key, value in metadata.items() if key not in _METADATA_KEYS}
+            for key, enum in (('length', Length), ('platform', Platform), ('tone', Tone), ('language', Language),
+                              ('topic', None), ('prompt_version', None)):
+                value = metadata.get(key)
+                if isinstance(value, str):
+                    setattr(record, key, encode(enum, value) if enum else sys.intern(value))
+                elif key in metadata:
+                    metadata_extra[key] = value
+            timings = metadata.get('timings')
+            if isinstance(timings, dict):
+                keys = tuple(timings)
+                record.timing_keys = _TIMING_KEYS.setdefault(keys, keys)
+                record.timing_values = tuple(timings.values())
+            elif 'timings' in metadata:
+                metadata_extra['timings'] = timings
+            record.metadata_extra = metadata_extra or _NO_EXTRA
+        elif 'metadata' in post:
+            extra['metadata'] = metadata
+        record.extra = extra or None
+        return record
+
+    def to_dict(self) -> Dict:
+        """Unpack into the dict generate_post returns."""
+        post = {}
+        if self.content is not None:
+            post['content'] = self.content
+        if self.image_suggestions is not None:
+            post['image_suggestions'] = list(self.image_suggestions)
+        if self.hashtags is not None:
+            post['hashtags'] = list(self.hashtags)
+        if self.timestamp is not None:
+            post['timestamp'] = from_epoch(self.timestamp) if isinstance(self.timestamp, int) else self.timestamp
+        metadata = {}
+        for key in ('topic', 'length', 'platform', 'tone', 'language', 'prompt_version'):
+            value = getattr(self, key)
+            if value is not None:
+                metadata[key] = decode(value)
+        if self.timing_keys is not None:
+            metadata['timings'] = dict(zip(self.timing_keys, self.timing_values))
+        if self.metadata_extra is not None:
+            metadata.update(self.metadata_extra)
+            post['metadata'] = metadata
+        if self.extra:
+            post.update(self.extra)
+        return post
+
+    @property
+    def created_at(self) -> Optional[datetime]:
+        """The timestamp as a datetime."""
+        if isinstance(self.timestamp, int):
+            return _EPOCH + timedelta(microseconds=self.timestamp)
+        return datetime.fromisoformat(self.timestamp) if self.timestamp else None
+
+
+class PostColumns:
+    """Column-oriented metadata of many posts, for scans over a large history.
+
+    Each column is a compact array: ids and epoch-microsecond timestamps as
+    64-bit integers, and platform, tone, length and language as one byte per
+    post indexing into that column's list of distinct values. Topics are
+    interned strings. Post content is left out; look posts up by id.
+    While timestamps arrive in order, time filters are a binary search.
+    """
+
+    CODED = ('platform', 'tone', 'length', 'language')
+
+    def __init__(self):
+        self.ids = array('q')
+        self.timestamps = array('q')
+        self.topics: List[str] = []
+        self._codes = {column: array('B') for column in self.CODED}
+        self._values: Dict[str, List[str]] = {column: [] for column in self.CODED}
+        self._lookup: Dict[str, Dict[str, int]] = {column: {} for column in self.CODED}
+        self._in_order = True
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def append(self, post_id: int, timestamp: str, topic: Optional[str], length: Optional[str],
+               platform: Optional[str], tone: Optional[str], language: Optional[str]):
+        """Add one post's metadata. Timestamps that aren't naive ISO times are stored as -1."""
+        self.ids.append(post_id)
+        epoch = to_epoch(timestamp) if isinstance(timestamp, str) else timestamp
+        epoch = epoch if isinstance(epoch, int) else -1
+        if self.timestamps and epoch < self.timestamps[-1]:
+            self._in_order = False
+        self.timestamps.append(epoch)
+        self.topics.append(sys.intern(topic or ""))
+        for column, value in (('platform', platform), ('tone', tone), ('length', length), ('language', language)):
+            lookup = self._lookup[column]
+            code = lookup.get(value)
+            if code is None:
+                if len(lookup) == 256:
+                    raise ValueError(f"More than 256 distinct values of {column}")
+                code = lookup[value] = len(lookup)
+                self._values[column].append(value)
+            self._codes[column].append(code)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple]) -> 'PostColumns':
+        """Build from (id, timestamp, topic, length, platform, tone, language) rows."""
+        columns = cls()
+        for row in rows:
+            columns.append(*row)
+        return columns
+
+    def values(self, column: str) -> List[Optional[str]]:
+        """Every post's value of a coded column, in order."""
+        values = self._values[column]
+        return [values[code] for code in self._codes[column]]
+
+    def _positions(self, since: Optional[datetime], until: Optional[datetime],
+                   equals: Dict) -> Union[List[int], range, None]:
+        """Positions of the posts matching the filters, or None if there are no filters."""
+        positions = None
+        if (since is not None or until is not None) and self._in_order:
+            timestamps = self.timestamps
+            positions = range(bisect_left(timestamps, epoch_micros(since)) if since is not None else 0,
+                              bisect_right(timestamps, epoch_micros(until)) if until is not None else len(timestamps))
+            since = until = None
+        for column, value in equals.items():
+            code = self._lookup[column].get(decode(value))
+            if code is None:
+                return []
+            codes = self._codes[column]
+            positions = [i for i in (positions if positions is not None else range(len(codes))) if codes[i] == code]
+        if since is not None or until is not None:
+            low = epoch_micros(since) if since is not None else -1
+            high = epoch_micros(until) if until is not None else sys.maxsize
+            timestamps = self.timestamps
+            positions = [i for i in (positions if positions is not None else range(len(timestamps)))
+                         if low <= timestamps[i] <= high]
+        return positions
+
+    def counts(self, column: str, since: Optional[datetime] = None, until: Optional[datetime] = None,
+               **equals) -> Counter:
+        """Number of posts per value of a coded column, among posts matching the filters (see select)."""
+        values = self._values[column]
+        positions = self._positions(since, until, equals)
+        if positions is not None and not isinstance(positions, range):
+            codes = self._codes[column]
+            return Counter({values[code]: count for code, count in Counter(codes[i] for i in positions).items()})
+        codes = self._codes[column].tobytes()
+        if positions is not None:
+            codes = codes[positions.start:positions.stop]
+        counts = Counter()
+        for code, value in enumerate(values):
+            count = codes.count(code)
+            if count:
+                counts[value] = count
+        return counts
+
+    def select(self, since: Optional[datetime] = None, until: Optional[datetime] = None, **equals) -> List[int]:
+        """Ids of posts whose coded columns equal the given values and whose timestamp is in [since, until]."""
+        positions = self._positions(since, until, equals)
+        return list(self.ids) if positions is None else [self.ids[i] for i in positions]
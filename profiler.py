@@ -0,0 +1,212 @@
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc as _tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from metrics import Histogram
+
+PROFILE_OPTIONS = ('cprofile', 'tracemalloc')
+
+
+class StageStats:
+    """Wall and CPU time, and optionally allocations, of every run of one stage."""
+
+    __slots__ = ('wall', 'cpu', 'cpu_count', 'allocated', 'allocated_count')
+
+    def __init__(self, window: int):
+        self.wall = Histogram(window)
+        self.cpu = 0.0
+        self.cpu_count = 0
+        self.allocated = 0
+        self.allocated_count = 0
+
+
+class StageProfiler:
+    """Aggregates per-stage timings of generated posts for a performance report.
+
+    Stages are the RequestTrace phases (prompt build, network, JSON decode,
+    formatting, history persist) plus profiler-only stages such as CTA
+    selection and platform fitting, keyed as "call.stage", and "total.outcome"
+    for whole requests. Each run records wall time and the CPU time of the
+    thread it ran on.
+
+    With cprofile=True every cprofile_every-th run of each stage is run under
+    cProfile, one stage at a time across threads, and the report lists the
+    functions with the most cumulative time per stage. With tracemalloc=True
+    allocation tracing is started and each stage records the change in traced
+    memory; other threads allocate meanwhile, so under concurrency treat it as
+    a rough guide, alongside the top allocation sites in the report.
+    """
+
+    def __init__(self, cprofile: bool = False, tracemalloc: bool = False, cprofile_every: int = 10,
+                 window: int = 4096):
+        self.cprofile = cprofile
+        self.tracemalloc = tracemalloc
+        self.cprofile_every = cprofile_every
+        self.window = window
+        self._stages: Dict[Tuple[str, str], StageStats] = {}
+        self._runs: Dict[Tuple[str, str], int] = defaultdict(int)
+        # Merged cProfile stats and the number of sampled runs per stage
+        self._profiles: Dict[Tuple[str, str], List] = {}
+        self._profiling = threading.Lock()
+        self._lock = threading.Lock()
+        if tracemalloc and not _tracemalloc.is_tracing():
+            _tracemalloc.start()
+
+    @classmethod
+    def from_spec(cls, spec: Union[bool, str, 'StageProfiler', None]) -> Optional['StageProfiler']:
+        """The profiler a profile setting asks for, or None if profiling is off.
+
+        True, "1" or "timers" turn on the stage timers; a comma-separated list
+        of "cprofile" and "tracemalloc" turns on those as well, and a
+        StageProfiler is used as it is. None, False, an empty string, "0" and
+        "off" leave profiling off.
+        """
+        if spec is None or spec is False:
+            return None
+        if isinstance(spec, cls):
+            return spec
+        if spec is True:
+            return cls()
+        options = {option.strip().lower() for option in spec.split(',') if option.strip()}
+        if not options or options & {'0', 'off', 'false', 'no'}:
+            return None
+        unknown = options - set(PROFILE_OPTIONS) - {'1', 'on', 'true', 'yes', 'timers'}
+        if unknown:
+            raise ValueError(f"Unknown profile option {unknown.pop()!r}; use timers, {', '.join(PROFILE_OPTIONS)}")
+        return cls(cprofile='cprofile' in options, tracemalloc='tracemalloc' in options)
+
+    @contextmanager
+    def stage(self, name: str, call: str = 'post') -> Iterator[None]:
+        """Time a block as one run of a stage."""
+        key = (call, name)
+        profile = None
+        if self.cprofile:
+            with self._lock:
+                self._runs[key] += 1
+                sampled = (self._runs[key] - 1) % self.cprofile_every == 0
+            # cProfile follows one thread at a time, so stages running alongside a sampled one aren't sampled
+            if sampled and self._profiling.acquire(blocking=False):
+                profile = cProfile.Profile()
+        allocated = _tracemalloc.get_traced_memory()[0] if self.tracemalloc else None
+        cpu_start = time.thread_time()
+        start = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            wall = time.perf_counter() - start
+            cpu = time.thread_time() - cpu_start
+            if allocated is not None:
+                allocated = _tracemalloc.get_traced_memory()[0] - allocated
+            if profile is not None:
+                self._profiling.release()
+                self._add_profile(key, profile)
+            self.record(name, wall, cpu, allocated, call)
+
+    def record(self, name: str, wall: float, cpu: Optional[float] = None, allocated: Optional[int] = None,
+               call: str = 'post'):
+        """Record one run of a stage measured elsewhere; cpu and allocated are None if unknown."""
+        key = (call, name)
+        with self._lock:
+            stats = self._stages.get(key)
+            if stats is None:
+                stats = self._stages[key] = StageStats(self.window)
+            stats.wall.observe(wall)
+            if cpu is not None:
+                stats.cpu += cpu
+                stats.cpu_count += 1
+            if allocated is not None:
+                stats.allocated += allocated
+                stats.allocated_count += 1
+
+    def _add_profile(self, key: Tuple[str, str], profile: cProfile.Profile):
+        with self._lock:
+            sampled = self._profiles.get(key)
+            if sampled is None:
+                self._profiles[key] = [pstats.Stats(profile, stream=io.StringIO()), 1]
+            else:
+                sampled[0].add(profile)
+                sampled[1] += 1
+
+    def report(self, top: int = 10) -> Dict:
+        """Per-stage totals, means and percentiles, plus cProfile and allocation summaries if enabled."""
+        with self._lock:
+            stages = []
+            for (call, name), stats in self._stages.items():
+                quantiles = stats.wall.quantiles()
+                stages.append({
+                    'stage': f"{call}.{name}",
+                    'count': stats.wall.count,
+                    'wall_seconds': round(stats.wall.sum, 6),
+                    'wall_mean_ms': round(stats.wall.sum / stats.wall.count * 1000, 3),
+                    'wall_p50_ms': round(quantiles[0.5] * 1000, 3),
+                    'wall_p95_ms': round(quantiles[0.95] * 1000, 3),
+                    'cpu_seconds': round(stats.cpu, 6) if stats.cpu_count else None,
+                    'cpu_mean_ms': round(stats.cpu / stats.cpu_count * 1000, 3) if stats.cpu_count else None,
+                    'allocated_mean_bytes': (round(stats.allocated / stats.allocated_count)
+                                             if stats.allocated_count else None)
+                })
+            profiles = {f"{call}.{name}": {'sampled_runs': runs, 'functions': _top_functions(stats, top)}
+                        for (call, name), (stats, runs) in sorted(self._profiles.items())}
+        stages.sort(key=lambda stage: stage['wall_seconds'], reverse=True)
+        report = {'stages': stages}
+        if profiles:
+            report['cprofile'] = profiles
+        if self.tracemalloc and _tracemalloc.is_tracing():
+            statistics = _tracemalloc.take_snapshot().statistics('lineno')[:top]
+            report['allocations'] = [{'site': str(stat.traceback), 'bytes': stat.size, 'blocks': stat.count}
+                                     for stat in statistics]
+        return report
+
+    def to_json(self, top: int = 10) -> str:
+        """The report as a JSON document."""
+        return json.dumps(self.report(top), indent=2)
+
+    def format_table(self, top: int = 5) -> str:
+        """The report as a plain-text table for the terminal."""
+        report = self.report(top)
+        lines = [f"{'stage':<32} {'runs':>7} {'wall s':>9} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} "
+                 f"{'cpu ms':>9} {'alloc KiB':>10}"]
+        for stage in report['stages']:
+            cpu = f"{stage['cpu_mean_ms']:9.3f}" if stage['cpu_mean_ms'] is not None else f"{'-':>9}"
+            allocated = (f"{stage['allocated_mean_bytes'] / 1024:10.1f}"
+                         if stage['allocated_mean_bytes'] is not None else f"{'-':>10}")
+            lines.append(f"{stage['stage']:<32} {stage['count']:7d} {stage['wall_seconds']:9.3f} "
+                         f"{stage['wall_mean_ms']:9.3f} {stage['wall_p50_ms']:9.3f} {stage['wall_p95_ms']:9.3f} "
+                         f"{cpu} {allocated}")
+        for stage, functions in report.get('cprofile', {}).items():
+            lines.append(f"\ncProfile {stage}, cumulative seconds over {functions['sampled_runs']} sampled runs:")
+            for function in functions['functions']:
+                lines.append(f"  {function['cumulative']:9.4f} {function['calls']:8d}  {function['function']}")
+        if report.get('allocations'):
+            lines.append("\nTop allocation sites:")
+            for site in report['allocations']:
+                lines.append(f"  {site['bytes'] / 1024:10.1f} KiB {site['blocks']:8d} blocks  {site['site']}")
+        return "\n".join(lines)
+
+    def reset(self):
+        """Drop everything recorded so far."""
+        with self._lock:
+            self._stages.clear()
+            self._runs.clear()
+            self._profiles.clear()
+
+
+def _top_functions(stats: pstats.Stats, top: int) -> List[Dict]:
+    """The functions with the most cumulative time in merged cProfile stats."""
+    rows = []
+    for (filename, line, function), (_, calls, _, cumulative, _) in stats.stats.items():
+        rows.append({'function': f"{filename}:{line}({function})", 'calls': calls, 'cumulative': round(cumulative, 6)})
+    rows.sort(key=lambda row: row['cumulative'], reverse=True)
+    return rows[:top]
+
@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompt_templates.json")
+
+
+class CompiledPrompt:
+    """A prompt with everything but the topic rendered, plus the static part of the request body."""
+
+    __slots__ = ('system_message', 'user_parts', 'parameters', 'extra_tokens')
+
+    def __init__(self, system_message: Dict[str, str], user_parts: List[str], parameters: Dict,
+                 extra_tokens: int = 0):
+        self.system_message = system_message
+        self.user_parts = user_parts
+        self.parameters = parameters
+        self.extra_tokens = extra_tokens
+
+    def build(self, topic: str, model: str, max_tokens: Optional[int] = None) -> Dict:
+        """Build the chat completion request body for one topic."""
+        data = {
+            "model": model,
+            "messages": [self.system_message, {"role": "user", "content": topic.join(self.user_parts)}]
+        }
+        if max_tokens is not None:
+            data["max_tokens"] = max_tokens + self.extra_tokens
+        data.update(self.parameters)
+        return data
+
+
+class PromptTemplates:
+    """Prompt templates loaded from a JSON config file and compiled once per combination.
+
+    Templates use {placeholders} for the post settings. Everything except the
+    topic is rendered the first time a (platform, tone, language, length)
+    combination is used, so building a request only has to splice in the topic.
+
+    A template can name another in "extends" to reuse its system, user and
+    parameters and only replace the "format" lines appended to the user prompt.
+    """
+
+    def __init__(self, config: Dict):
+        self.version = config.get('version', 'unversioned')
+        self.word_counts = config['word_counts']
+        # The word counts as numbers, for sizing max_tokens
+        self.word_targets = config.get('word_targets', {})
+        # Optional, so template files written before platform length limits still load
+        self.character_limit = config.get('character_limit', "Keep the whole post under {max_chars} characters")
+        self.language_instructions = config['language_instructions']
+        self.templates = {name: config[name] for name in ('post', 'image_suggestions')}
+        # Optional, so template files written before single-call generation still load
+        if 'structured_post' in config:
+            self.templates['structured_post'] = config['structured_post']
+        self._compiled: Dict[Tuple, CompiledPrompt] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_TEMPLATES_PATH) -> 'PromptTemplates':
+        """Load templates from a JSON config file."""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def _compile(self, name: str, fields: Dict[str, str]) -> CompiledPrompt:
+        template = self.templates[name]
+        if 'extends' in template:
+            template = {**self.templates[template['extends']], **template}
+        # Keep {topic} as a placeholder so it can be spliced in per request
+        fields = {**fields, 'topic': '{topic}'}
+        system = "\n".join(template['system']).format_map(fields)
+        user = "\n".join(template['user'] + template.get('format', [])).format_map(fields)
+        return CompiledPrompt({"role": "system", "content": system}, user.split('{topic}'),
+                              dict(template.get('parameters', {})), template.get('extra_tokens', 0))
+
+    def _get(self, key: Tuple, name: str, fields: Dict[str, str]) -> CompiledPrompt:
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            with self._lock:
+                compiled = self._compiled.get(key)
+                if compiled is None:
+                    compiled = self._compiled[key] = self._compile(name, fields)
+        return compiled
+
+    def post(self, platform: str, tone: str, language: str, length: str,
+             max_chars: Optional[int] = None) -> CompiledPrompt:
+        """Compiled post prompt for a platform, tone, language and length.
+
+        With max_chars the prompt asks for a post under that many characters
+        instead of the length's word count.
+        """
+        return self._post('post', platform, tone, language, length, max_chars)
+
+    def structured_post(self, platform: str, tone: str, language: str, length: str,
+                        max_chars: Optional[int] = None) -> Optional[CompiledPrompt]:
+        """Compiled prompt asking for the post, hashtags and image suggestions as one JSON object.
+
+        None if the template file has no structured_post template.
+        """
+        if 'structured_post' not in self.templates:
+            return None
+        return self._post('structured_post', platform, tone, language, length, max_chars)
+
+    def _post(self, name: str, platform: str, tone: str, language: str, length: str,
+              max_chars: Optional[int] = None) -> CompiledPrompt:
+        key = (name, platform, tone, language, length.lower(), max_chars)
+        compiled = self._compiled.get(key)
+        if compiled is not None:
+            return compiled
+        if max_chars is not None:
+            word_count_instruction = self.character_limit.format(max_chars=max_chars)
+        else:
+            word_count_instruction = self.word_counts.get(length.lower(), self.word_counts['default'])
+        return self._get(key, name, {
+            'platform': platform,
+            'tone': tone,
+            'tone_lower': tone.lower(),
+            'language': language,
+            'language_instruction': self.language_instructions.get(language, self.language_instructions['BM']),
+            'word_count_instruction': word_count_instruction
+        })
+
+    def word_target(self, length: str) -> Optional[int]:
+        """Words the post prompt asks for at a length, or None if it names no number."""
+        return self.word_targets.get(length.lower())
+
+    def image_suggestions(self, tone: str) -> CompiledPrompt:
+        """Compiled image suggestion prompt for a tone."""
+        key = ('image_suggestions', tone)
+        compiled = self._compiled.get(key)
+        if compiled is not None:
+            return compiled
+        return self._get(key, 'image_suggestions', {'tone': tone, 'tone_lower': tone.lower()})
+
+
+@lru_cache(maxsize=None)
+def load_prompt_templates(path: str = DEFAULT_TEMPLATES_PATH) -> PromptTemplates:
+    """Load and cache the templates for a config file, shared by every generator in the process."""
+    return PromptTemplates.load(path)
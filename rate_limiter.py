@@ -0,0 +1,173 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, Mapping, Optional
+
+import requests
+
+# Lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class QueueTimeout(requests.Timeout):
+    """Raised when a request's deadline passes while it is still queued for a slot, before anything is sent."""
+
+
+class RequestScheduler:
+    """Token-bucket rate limiter and priority queue in front of the OpenRouter API.
+
+    Callers wait in a queue ordered by priority (interactive requests ahead of
+    batch jobs), then need both a token from the bucket and one of the
+    concurrency slots. The concurrency limit adapts to the API: every 429
+    halves it and sustained success grows it back by one (AIMD). Retry-After
+    and X-RateLimit-* headers pause dispatch until the quota resets; a 429
+    pauses it for at least min_pause seconds, even with "Retry-After: 0".
+    """
+
+    def __init__(self, rate: Optional[float] = None, burst: int = 1, max_concurrency: int = 8,
+                 min_concurrency: int = 1, min_pause: float = 0.5):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.min_pause = min_pause
+        self.concurrency = max_concurrency
+
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._active = 0
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._queue = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._stats = {'dispatched': 0, 'rate_limited': 0, 'queue_timeouts': 0, 'concurrency_decreases': 0}
+
+    def _refill(self, now: float):
+        if self.rate is None:
+            return
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _wait_time(self, now: float) -> float:
+        """Seconds until the caller at the head of the queue may go, 0 if it can go now."""
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._active >= self.concurrency:
+            return float('inf')
+        if self.rate is not None and self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+        return 0.0
+
+    def acquire(self, priority: int = PRIORITY_INTERACTIVE, deadline: Optional[float] = None):
+        """Block until this caller may send a request.
+
+        Raises QueueTimeout if the monotonic deadline passes while queued.
+        """
+        with self._condition:
+            entry = (priority, next(self._order))
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait = self._wait_time(now) if self._queue[0] == entry else float('inf')
+                    if wait == 0:
+                        break
+                    if deadline is not None:
+                        if now >= deadline:
+                            self._stats['queue_timeouts'] += 1
+                            raise QueueTimeout("Timed out waiting for a rate limit slot")
+                        wait = min(wait, deadline - now)
+                    self._condition.wait(None if wait == float('inf') else wait)
+            finally:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._condition.notify_all()
+            if self.rate is not None:
+                self._tokens -= 1
+            self._active += 1
+            self._stats['dispatched'] += 1
+
+    def release(self):
+        """Give back a concurrency slot."""
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_INTERACTIVE, deadline: Optional[float] = None) -> Iterator[None]:
+        """Hold a request slot for the duration of the block."""
+        self.acquire(priority, deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def observe(self, status_code: int, headers: Mapping[str, str]):
+        """Adapt to a response: back off on 429 and honor rate limit headers."""
+        now = time.monotonic()
+        with self._condition:
+            pause = None
+            if status_code == 429:
+                self._stats['rate_limited'] += 1
+                self._successes = 0
+                pause = parse_retry_after(headers.get('Retry-After'))
+                # Without a pause, requeued requests would be sent again straight away, over and over
+                pause = 1.0 if pause is None else max(self.min_pause, pause)
+                # Only back off once per pause window, not once per in-flight request
+                if now - self._last_decrease > pause and self.concurrency > self.min_concurrency:
+                    self.concurrency = max(self.min_concurrency, self.concurrency // 2)
+                    self._last_decrease = now
+                    self._stats['concurrency_decreases'] += 1
+            elif status_code < 500:
+                self._successes += 1
+                if self._successes >= self.concurrency and self.concurrency < self.max_concurrency:
+                    self.concurrency += 1
+                    self._successes = 0
+
+            # OpenRouter reports remaining quota and its reset time (epoch milliseconds)
+            if headers.get('X-RateLimit-Remaining') == '0' and headers.get('X-RateLimit-Reset'):
+                try:
+                    reset_in = float(headers['X-RateLimit-Reset']) / 1000 - time.time()
+                    pause = max(pause or 0.0, reset_in)
+                except ValueError:
+                    pass
+
+            if pause:
+                self._paused_until = max(self._paused_until, now + pause)
+            self._condition.notify_all()
+
+    def resume_at(self) -> float:
+        """Monotonic time at which a rate limit pause ends (in the past if not paused)."""
+        with self._condition:
+            return self._paused_until
+
+    def stats(self) -> Dict[str, float]:
+        """Dispatch and back-off counters plus the current adaptive limits."""
+        with self._condition:
+            stats = dict(self._stats)
+            stats['concurrency'] = self.concurrency
+            stats['active'] = self._active
+            stats['queued'] = len(self._queue)
+            stats['paused_for'] = round(max(0.0, self._paused_until - time.monotonic()), 3)
+            return stats
@@ -0,0 +1,170 @@
+import hashlib
+import re
+import sys
+import threading
+from array import array
+from functools import lru_cache
+from operator import xor
+from typing import Dict, List, Optional, Tuple
+
+FINGERPRINT_BITS = 64
+# Consecutive words per shingle; shorter texts are fingerprinted as one shingle
+SHINGLE_WORDS = 3
+# Posts this many bits apart or closer are treated as near-duplicates
+NEAR_DUPLICATE_DISTANCE = 4
+
+_WORD = re.compile(r"\w+")
+# _BIT_TABLES[bit] maps each byte to 1 if that bit is set, so a column of digest bytes can be counted with translate()
+_BIT_TABLES = [bytes((value >> bit) & 1 for value in range(256)) for bit in range(8)]
+
+# Words dropped from topic keys, so "tips for beginners" and "beginner tips" match
+TOPIC_STOPWORDS = frozenset({
+    'a', 'an', 'and', 'the', 'of', 'for', 'to', 'in', 'on', 'with', 'about', 'your', 'you', 'how', 'why', 'what',
+    'dan', 'yang', 'untuk', 'di', 'ke', 'dengan', 'tentang', 'kau', 'aku'
+})
+
+
+MASK = (1 << FINGERPRINT_BITS) - 1
+
+
+@lru_cache(maxsize=1 << 17)
+def _word_hashes(word: str) -> Tuple[int, int, int]:
+    """A word's 64-bit hash, rotated left by 0, 1 and 2 bits for its position in a shingle."""
+    h = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), 'little')
+    return h, (h << 1 | h >> 63) & MASK, (h << 2 | h >> 62) & MASK
+
+
+def shingle_hashes(text: str) -> set:
+    """64-bit hashes of the distinct runs of SHINGLE_WORDS consecutive words in text.
+
+    Words are lowercased with punctuation and emojis dropped. Each word is
+    hashed once and a run's hash XORs its words' hashes rotated by position.
+    """
+    words = _WORD.findall(text.lower())
+    if not words:
+        return set()
+    first, second, third = zip(*map(_word_hashes, words))
+    if len(words) < SHINGLE_WORDS:
+        return {third[0] ^ second[1] if len(words) == 2 else first[0]}
+    return set(map(xor, map(xor, third, second[1:]), first[2:]))
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of text's word shingles. Similar texts get fingerprints a few bits apart."""
+    hashes = shingle_hashes(text)
+    if not hashes:
+        return 0
+    digests = array('Q', hashes).tobytes()
+    if sys.byteorder == 'big':
+        digests = b"".join(digests[i:i + 8][::-1] for i in range(0, len(digests), 8))
+    # A fingerprint bit is set when it is set in more than half the shingle hashes.
+    # Counting bit by bit over each byte column keeps the loop out of Python.
+    majority = len(hashes) / 2
+    fingerprint = 0
+    for byte in range(8):
+        column = digests[byte::8]
+        for bit in range(8):
+            if column.translate(_BIT_TABLES[bit]).count(1) > majority:
+                fingerprint |= 1 << (byte * 8 + bit)
+    return fingerprint
+
+
+def post_simhash(post: Dict) -> int:
+    """SimHash of a generated post's content without its call to action.
+
+    The CTA is the last paragraph and is picked at random, so on short
+    posts it would otherwise outweigh the text.
+    """
+    content = post.get('content', '')
+    return simhash(content.rsplit("\n\n", 1)[0] if "\n\n" in content else content)
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of bits two fingerprints differ in."""
+    return (a ^ b).bit_count()
+
+
+def to_signed(fingerprint: int) -> int:
+    """Store a fingerprint in a signed 64-bit SQLite INTEGER."""
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+
+def from_signed(value: int) -> int:
+    """Read back a fingerprint stored with to_signed."""
+    return value + (1 << 64) if value < 0 else value
+
+
+def topic_key(topic: Optional[str]) -> str:
+    """Topic normalized for matching repeat requests: lowercased, stopwords and plural s dropped, words sorted."""
+    words = set()
+    for word in _WORD.findall((topic or "").lower()):
+        if word in TOPIC_STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        words.add(word)
+    return " ".join(sorted(words))
+
+
+class SimilarityIndex:
+    """In-memory LSH index of SimHash fingerprints for finding near-duplicate posts.
+
+    Each fingerprint is split into bands, and posts sharing the value of any
+    band are candidates, checked by Hamming distance. Two fingerprints up to
+    bands - 1 bits apart always share a band, so lookups within that distance
+    find every match while only checking a few hundred candidates at a
+    million posts.
+    """
+
+    def __init__(self, bands: int = NEAR_DUPLICATE_DISTANCE + 1):
+        self.bands = bands
+        # Spread the 64 bits as evenly as possible over the bands
+        self._masks = []
+        shift = 0
+        for band in range(bands):
+            width = FINGERPRINT_BITS // bands + (1 if band < FINGERPRINT_BITS % bands else 0)
+            self._masks.append((shift, (1 << width) - 1))
+            shift += width
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(bands)]
+        self._ids = array('q')
+        self._fingerprints = array('Q')
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, post_id: int, fingerprint: int):
+        """Index a post's fingerprint."""
+        with self._lock:
+            slot = len(self._ids)
+            self._ids.append(post_id)
+            self._fingerprints.append(fingerprint)
+            for table, (shift, mask) in zip(self._tables, self._masks):
+                table.setdefault((fingerprint >> shift) & mask, []).append(slot)
+
+    def find(self, fingerprint: int, max_distance: int = NEAR_DUPLICATE_DISTANCE,
+             limit: int = 10) -> List[Tuple[int, int]]:
+        """Up to limit (post_id, distance) pairs within max_distance bits, closest and then newest first.
+
+        Matches further apart than bands - 1 bits are only found if they happen to share a band.
+        """
+        candidates = set()
+        for table, (shift, mask) in zip(self._tables, self._masks):
+            bucket = table.get((fingerprint >> shift) & mask)
+            if bucket:
+                candidates.update(bucket)
+        fingerprints = self._fingerprints
+        matches = []
+        for slot in candidates:
+            distance = (fingerprints[slot] ^ fingerprint).bit_count()
+            if distance <= max_distance:
+                matches.append((distance, -slot))
+        matches.sort()
+        return [(self._ids[-slot], distance) for distance, slot in matches[:limit]]
+
+    def clear(self):
+        """Remove every fingerprint."""
+        with self._lock:
+            self._tables = [{} for _ in range(self.bands)]
+            self._ids = array('q')
+            self._fingerprints = array('Q')
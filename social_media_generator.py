@@ -2,456 +2,1195 @@ import random
 import os
 import requests
 import json
-from typing import Dict, List, Optional
+import time
+import asyncio
+import argparse
+import csv
+import multiprocessing
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import nullcontext
+from functools import lru_cache, partial
+from types import MappingProxyType
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
 from dotenv import load_dotenv
 from datetime import datetime
+from circuit_breaker import CircuitOpenError
+from openrouter_client import OpenRouterClient
+from response_cache import ResponseCache
+from structured_response import parse_structured_post
+from text_formatter import PostFormatter, extract_hashtags
+from history_store import HistoryStore
+from similarity_index import FINGERPRINT_BITS, NEAR_DUPLICATE_DISTANCE, SimilarityIndex, post_simhash, simhash
+from job_queue import JobQueue, JobWorker
+from prompt_templates import DEFAULT_TEMPLATES_PATH, load_prompt_templates
+from fallback_grammar import DEFAULT_GRAMMAR_PATH, load_fallback_grammar
+from platform_rules import DEFAULT_RULES_PATH, load_platform_rules
+from metrics import MetricsRegistry, RequestTrace, default_registry
+from model_router import ModelRouter, rate_limited
+from profiler import StageProfiler
+from rate_limiter import PRIORITY_BATCH, PRIORITY_INTERACTIVE, RequestScheduler
+from token_budget import TokenBudget, estimate_tokens
 
-# Add debugging information
-print("Current working directory:", os.getcwd())
-print("Files in directory:", os.listdir())
-load_dotenv()
-print("Environment variables after load_dotenv:", os.environ.get('OPENROUTER_API_KEY'))
+LEGACY_HISTORY_FILE = "post_history.json"
+
+def _freeze(value):
+    """Recursively turn dicts into read-only mappings and lists into tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+EMOJIS = _freeze({
+    'inspirational': ['✨', '🌟', '💫', '💪', '🔥'],
+    'urgent': ['⚡', '⏰', '🚨', '💥', '❗'],
+    'emotional': ['❤️', '😊', '🥺', '😌', '🙏'],
+    'empathetic': ['🤗', '💝', '💕', '🤝', '💫'],
+    'professional': ['💼', '📊', '📈', '🎯', '💡'],
+    'friendly': ['😊', '👋', '💫', '✨', '💕'],
+    'casual': ['😎', '👍', '💯', '🔥', '✨']
+})
+
+# Language-specific CTAs
+CTA_TEMPLATES = _freeze({
+    'EN': {
+        'Facebook': [
+            "💬 What's your take on this?",
+            "Share this if you agree!",
+            "Tag someone who needs to see this!",
+            "Drop a ❤️ if this resonates with you!"
+        ],
+        'Instagram': [
+            "Double tap if you agree!",
+            "Tag a friend who needs this!",
+            "Save this for later!",
+            "Follow for more content like this!"
+        ],
+        'LinkedIn': [
+            "What are your thoughts on this?",
+            "Share your experience in the comments!",
+            "Connect if this resonates with you!",
+            "Follow for more professional insights!"
+        ],
+        'Twitter': [
+            "RT if you agree!",
+            "Like & follow for more!",
+            "What's your take?",
+            "Share your thoughts below!"
+        ],
+        'TikTok': [
+            "Follow for more! 🎵",
+            "Drop a ❤️ if you agree!",
+            "Save this for later! 📱",
+            "Comment your thoughts below! 💭",
+            "Share with someone who needs this! 🔄",
+            "Double tap if you relate! 👆"
+        ]
+    },
+    'BM': {
+        'Facebook': [
+            "💬 Apa pendapat kau?",
+            "Kongsi kalau kau setuju!",
+            "Tag kawan yang perlu tengok ni!",
+            "Tekan ❤️ kalau kau rasa sama!"
+        ],
+        'Instagram': [
+            "Double tap kalau kau setuju!",
+            "Tag kawan yang perlukan ni!",
+            "Simpan untuk tengok balik!",
+            "Follow untuk lebih banyak content!"
+        ],
+        'LinkedIn': [
+            "Apa pendapat kau?",
+            "Kongsi pengalaman kau dalam komen!",
+            "Connect kalau kau rasa sama!",
+            "Follow untuk lebih banyak insight!"
+        ],
+        'Twitter': [
+            "RT kalau kau setuju!",
+            "Like & follow untuk lebih banyak!",
+            "Apa pendapat kau?",
+            "Kongsi pendapat kau kat bawah!"
+        ],
+        'TikTok': [
+            "Follow untuk lebih banyak! 🎵",
+            "Tekan ❤️ kalau kau setuju!",
+            "Simpan untuk tengok balik! 📱",
+            "Komen pendapat kau kat bawah! 💭",
+            "Kongsi dengan kawan yang perlukan! 🔄",
+            "Double tap kalau kau rasa sama! 👆"
+        ]
+    }
+})
+
+@lru_cache(maxsize=None)
+def get_config() -> Mapping[str, Optional[str]]:
+    """Load .env once and return the OpenRouter settings shared by every generator."""
+    load_dotenv()
+    return MappingProxyType({
+        'api_key': os.getenv('OPENROUTER_API_KEY'),
+        'api_base': os.getenv('OPENROUTER_API_BASE', "https://openrouter.ai/api/v1"),
+        'prompt_templates_path': os.getenv('PROMPT_TEMPLATES_PATH', DEFAULT_TEMPLATES_PATH),
+        'platform_rules_path': os.getenv('PLATFORM_RULES_PATH', DEFAULT_RULES_PATH),
+        'fallback_grammar_path': os.getenv('FALLBACK_GRAMMAR_PATH', DEFAULT_GRAMMAR_PATH),
+        'profile': os.getenv('PROFILE_STAGES')
+    })
+
+# Defaults for batch spec fields that aren't given in the input file
+BATCH_SPEC_DEFAULTS = {
+    'length': 'medium',
+    'platform': 'TikTok',
+    'tone': 'Inspirational',
+    'language': 'EN'
+}
+BATCH_SPEC_FIELDS = ('topic', 'length', 'platform', 'tone', 'language')
+
+# Words asked for when a length has no word target, and tokens expected for image suggestions
+DEFAULT_POST_WORDS = 300
+IMAGE_SUGGESTION_TOKENS = 200
+
+# Sentences per paragraph in long posts
+LONG_PARAGRAPH_SENTENCES = 3
+
+# generate_campaign writes one platform-neutral draft and adapts it to each of these
+CAMPAIGN_PLATFORMS = ('TikTok', 'Facebook', 'Instagram', 'LinkedIn', 'Twitter')
+BASE_DRAFT_PLATFORM = "any social media platform"
+
+# How generate_post treats near-duplicates of earlier posts: ignore them, note them
+# in the metadata, or return the earlier post for a repeated request
+DUPLICATE_CHECKS = ('off', 'flag', 'reuse')
 
 class SocialMediaPostGenerator:
-    def __init__(self):
-        # Load environment variables
-        load_dotenv()
-        
-        # OpenRouter configuration
-        self.api_key = os.getenv('OPENROUTER_API_KEY')
-        print("API Key found:", bool(self.api_key))  # Debug print
-        self.api_base = "https://openrouter.ai/api/v1"
-        self.default_model = "deepseek/deepseek-chat-v3-0324:free"  # You can change this to any model supported by OpenRouter
-        
-        # Timeout settings (in seconds) - increased for better handling of longer content
-        self.timeouts = {
-            'short': 30,    # Increased for more content
-            'medium': 60,   # Increased for longer content
-            'long': 90      # Increased for longest content
-        }
+    def __init__(self, pool_size: int = 16, max_retries: int = 2, cache_size: int = 256,
+                 cache_ttl: Optional[float] = 24 * 3600, cache_path: Optional[str] = None,
+                 history_path: str = "post_history.db", prompt_templates_path: Optional[str] = None,
+                 metrics: Optional[MetricsRegistry] = None, rate_limit: Optional[float] = None,
+                 rate_limit_burst: int = 1, models: Optional[List[str]] = None, hedge: bool = False,
+                 single_call: bool = False, platform_rules_path: Optional[str] = None,
+                 token_stats_path: Optional[str] = "token_stats.json", duplicate_check: str = 'off',
+                 fallback_grammar_path: Optional[str] = None, fallback_seed: Optional[int] = None,
+                 profile: Union[bool, str, StageProfiler, None] = None):
+        # OpenRouter configuration, resolved once per process
+        config = get_config()
+        self.api_key = config['api_key']
+        self.api_base = config['api_base']
+        # Models to route between, fastest healthy one first; pass models=[...] to use others
+        self.models = models or ["deepseek/deepseek-chat-v3-0324:free"]
+        self.default_model = self.models[0]
         
-        # Token limits for different lengths
-        self.token_limits = {
-            'short': 400,   # Approximately 300 words
-            'medium': 1200, # Approximately 900 words
-            'long': 2000    # Approximately 1500 words
-        }
+        # Prompt templates are compiled once per (platform, tone, language, length) and shared
+        self.prompts = load_prompt_templates(prompt_templates_path or config['prompt_templates_path'])
         
-        # History file path
-        self.history_file = "post_history.json"
-        self.history = self._load_history()
-        
-        self.emojis = {
-            'inspirational': ['✨', '🌟', '💫', '💪', '🔥'],
-            'urgent': ['⚡', '⏰', '🚨', '💥', '❗'],
-            'emotional': ['❤️', '😊', '🥺', '😌', '🙏'],
-            'empathetic': ['🤗', '💝', '💕', '🤝', '💫'],
-            'professional': ['💼', '📊', '📈', '🎯', '💡'],
-            'friendly': ['😊', '👋', '💫', '✨', '💕'],
-            'casual': ['😎', '👍', '💯', '🔥', '✨']
-        }
+        # Length, hashtag, emoji, line break and thread rules per platform, compiled once and shared
+        self.platform_rules = load_platform_rules(platform_rules_path or config['platform_rules_path'])
         
-        # Language-specific CTAs
-        self.cta_templates = {
-            'EN': {
-                'Facebook': [
-                    "💬 What's your take on this?",
-                    "Share this if you agree!",
-                    "Tag someone who needs to see this!",
-                    "Drop a ❤️ if this resonates with you!"
-                ],
-                'Instagram': [
-                    "Double tap if you agree!",
-                    "Tag a friend who needs this!",
-                    "Save this for later!",
-                    "Follow for more content like this!"
-                ],
-                'LinkedIn': [
-                    "What are your thoughts on this?",
-                    "Share your experience in the comments!",
-                    "Connect if this resonates with you!",
-                    "Follow for more professional insights!"
-                ],
-                'Twitter': [
-                    "RT if you agree!",
-                    "Like & follow for more!",
-                    "What's your take?",
-                    "Share your thoughts below!"
-                ],
-                'TikTok': [
-                    "Follow for more! 🎵",
-                    "Drop a ❤️ if you agree!",
-                    "Save this for later! 📱",
-                    "Comment your thoughts below! 💭",
-                    "Share with someone who needs this! 🔄",
-                    "Double tap if you relate! 👆"
-                ]
-            },
-            'BM': {
-                'Facebook': [
-                    "💬 Apa pendapat kau?",
-                    "Kongsi kalau kau setuju!",
-                    "Tag kawan yang perlu tengok ni!",
-                    "Tekan ❤️ kalau kau rasa sama!"
-                ],
-                'Instagram': [
-                    "Double tap kalau kau setuju!",
-                    "Tag kawan yang perlukan ni!",
-                    "Simpan untuk tengok balik!",
-                    "Follow untuk lebih banyak content!"
-                ],
-                'LinkedIn': [
-                    "Apa pendapat kau?",
-                    "Kongsi pengalaman kau dalam komen!",
-                    "Connect kalau kau rasa sama!",
-                    "Follow untuk lebih banyak insight!"
-                ],
-                'Twitter': [
-                    "RT kalau kau setuju!",
-                    "Like & follow untuk lebih banyak!",
-                    "Apa pendapat kau?",
-                    "Kongsi pendapat kau kat bawah!"
-                ],
-                'TikTok': [
-                    "Follow untuk lebih banyak! 🎵",
-                    "Tekan ❤️ kalau kau setuju!",
-                    "Simpan untuk tengok balik! 📱",
-                    "Komen pendapat kau kat bawah! 💭",
-                    "Kongsi dengan kawan yang perlukan! 🔄",
-                    "Double tap kalau kau rasa sama! 👆"
-                ]
-            }
-        }
+        # Sizes max_tokens from the word count, platform limit and language, and timeouts
+        # from each model's learned tokens per second, kept in token_stats_path across restarts
+        self.token_budget = TokenBudget(token_stats_path)
+        
+        # With single_call the post body, hashtags and image suggestions come back as
+        # one JSON completion, halving the requests made against the rate limit
+        self.single_call = single_call
+        
+        # Image suggestions run alongside the post body; once the body is ready
+        # we only wait this much longer for them before using the fallback ideas
+        self.image_suggestion_grace = 5
+        # Shared by generate_post and batch runs, two requests per post
+        self.max_concurrent_requests = 16
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrent_requests, thread_name_prefix="openrouter")
+        
+        # Pooled keep-alive session shared by every OpenRouter call. The scheduler
+        # queues requests by priority, optionally caps them at rate_limit per second
+        # and backs off when the API answers 429
+        self.scheduler = RequestScheduler(rate=rate_limit, burst=rate_limit_burst, max_concurrency=pool_size)
+        self.client = OpenRouterClient(self.api_base, self.api_key, pool_size=pool_size, max_retries=max_retries,
+                                       scheduler=self.scheduler)
+        
+        # Identical requests are answered from the cache; pass cache_path to keep it on disk
+        self.cache = ResponseCache(max_entries=cache_size, ttl=cache_ttl, path=cache_path)
+        
+        # Per-phase latency, token and fallback metrics; shared process-wide unless a registry is passed in
+        self.metrics = metrics or default_registry
+        
+        # Opt-in per-stage wall/CPU timers (and cProfile or tracemalloc sampling) for a
+        # performance report; see StageProfiler.from_spec. Off unless profile or PROFILE_STAGES is set
+        self.profiler = StageProfiler.from_spec(profile if profile is not None else config['profile'])
+        
+        # Picks a model per request by health and latency; with hedge=True a slow
+        # request is raced against the next best model. While every model's circuit
+        # breaker is open, calls go straight to the fallback content
+        self.router = ModelRouter(self.models, hedge=hedge, metrics=self.metrics)
+        
+        # Post history is opened on first use; posts from an old post_history.json are imported once
+        self.history_file = history_path
+        self._history_store: Optional[HistoryStore] = None
+        self._history_store_lock = threading.Lock()
+        self._job_queue: Optional[JobQueue] = None
+        
+        # Near-duplicate checks against the history; see DUPLICATE_CHECKS. The
+        # fingerprint index is built from the history the first time it is needed
+        if duplicate_check not in DUPLICATE_CHECKS:
+            raise ValueError(f"duplicate_check must be one of {', '.join(DUPLICATE_CHECKS)}")
+        self.duplicate_check = duplicate_check
+        self._similarity_index: Optional[SimilarityIndex] = None
+        self._similarity_synced = 0
+        self._similarity_lock = threading.Lock()
+        
+        # Static tables are shared, read-only module constants
+        self.emojis = EMOJIS
+        self.cta_templates = CTA_TEMPLATES
+        
+        # Posts are composed offline from this grammar when the API can't write them. With
+        # fallback_seed set, the same request always gets the same fallback post
+        self.fallback_grammar = load_fallback_grammar(fallback_grammar_path or config['fallback_grammar_path'])
+        self.fallback_seed = fallback_seed
 
-        # Platform-specific formatting
-        self.platform_formats = {
-            'TikTok': {
-                'max_length': 150,  # TikTok caption character limit
-                'hashtag_style': True,
-                'emojis_per_line': 2,
-                'line_breaks': True
-            }
-        }
+    @property
+    def history_store(self) -> HistoryStore:
+        """The history database, opened the first time it is needed."""
+        if self._history_store is None:
+            with self._history_store_lock:
+                if self._history_store is None:
+                    self._history_store = HistoryStore(self.history_file, legacy_path=LEGACY_HISTORY_FILE)
+        return self._history_store
 
-    def _load_history(self) -> List[Dict]:
-        """Load post history from file."""
-        try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return []
-        except Exception as e:
-            print(f"Error loading history: {e}")
-            return []
+    @property
+    def job_queue(self) -> JobQueue:
+        """The generation job queue, kept in the history database and opened the first time it is needed."""
+        if self._job_queue is None:
+            with self._history_store_lock:
+                if self._job_queue is None:
+                    self._job_queue = JobQueue(self.history_file)
+        return self._job_queue
 
-    def _save_history(self):
-        """Save post history to file."""
-        try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.history, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Error saving history: {e}")
+    @property
+    def history(self) -> List[Dict]:
+        """Every post in the history, oldest first."""
+        return self.history_store.all()
+
+    @property
+    def similarity_index(self) -> SimilarityIndex:
+        """Fingerprint index of the history's content, built on first use and caught up with new posts on each use."""
+        with self._similarity_lock:
+            if self._similarity_index is None:
+                self._similarity_index = SimilarityIndex()
+            self._sync_similarity()
+        return self._similarity_index
+
+    def _sync_similarity(self):
+        """Index posts saved since the last sync, including by other processes. Call with the lock held."""
+        for post_id, fingerprint in self.history_store.fingerprints(after=self._similarity_synced):
+            self._similarity_index.add(post_id, fingerprint)
+            self._similarity_synced = post_id
+
+    def _save_history(self, result: Dict, trace: Optional[RequestTrace] = None,
+                      fingerprint: Optional[int] = None) -> Optional[int]:
+        """Append a post to the history store and the similarity index, if it is in use.
+
+        Returns the post's history id, or None if it couldn't be saved.
+        """
+        with trace.phase('history_persist') if trace is not None else nullcontext():
+            try:
+                post_id = self.history_store.append(result, fingerprint)
+                if self._similarity_index is not None:
+                    with self._similarity_lock:
+                        self._sync_similarity()
+                return post_id
+            except Exception as e:
+                print(f"Error saving history: {e}")
+                return None
+
+    def _trace(self, **labels) -> RequestTrace:
+        """Start tracing a request, feeding the profiler too if profiling is on."""
+        return self.metrics.trace(self.profiler, **labels)
+
+    def _post_formatter(self, length: Optional[str], platform: Optional[str], hashtags: Optional[List[str]] = None,
+                        reserve: Optional[int] = None, truncation: str = 'word') -> PostFormatter:
+        """A single-pass formatter for a platform's rules, with long posts grouped into paragraphs.
 
-    def _format_for_platform(self, content: str, platform: str) -> str:
+        reserve defaults to room for the longest CTA the platform can get.
+        """
+        if reserve is None:
+            reserve = self._cta_reserve(platform)
+        paragraph_sentences = LONG_PARAGRAPH_SENTENCES if length and length.lower() == 'long' else None
+        return self.platform_rules.formatter(platform, paragraph_sentences, hashtags, reserve, truncation)
+
+    def _cta_reserve(self, platform: Optional[str]) -> int:
+        """Characters to keep free for the CTA _complete_post appends."""
+        return 2 + max(
+            len(cta)
+            for ctas in self.cta_templates.values()
+            for cta in ctas.get(platform, ctas['Facebook'])
+        )
+
+    def _format_for_platform(self, content: str, platform: str, hashtags: Optional[List[str]] = None) -> str:
         """Format content according to platform-specific rules."""
-        if platform not in self.platform_formats:
-            return content
+        return self._format_content(content, None, platform, hashtags)
+
+    def _chat_completion(self, data: Dict, timeout: float, use_cache: bool = True,
+                         trace: Optional[RequestTrace] = None, call: str = 'post',
+                         priority: int = PRIORITY_INTERACTIVE, language: str = 'EN',
+                         deadline: Optional[float] = None, cache_result: bool = True) -> Optional[str]:
+        """Return the completion text for a request, or None if the API returned an error.
+
+        timeout is cut to what is left before deadline, a time.perf_counter() value.
+        With cache_result=False the caller caches the text once it has checked it.
+        """
+        trace = trace or self._trace()
+        key = self.cache.key(data)
+        if use_cache:
+            content = self.cache.get(key)
+            if content is not None:
+                self.metrics.inc('response_cache_hits_total', call=call)
+                trace.record(f'{call}_cached', True)
+                return content
+        
+        send_timeout = self._within(timeout, deadline)
 
-        format_rules = self.platform_formats[platform]
+        def send(payload: Dict, remaining: float) -> requests.Response:
+            try:
+                return self.client.chat_completion(payload, timeout=remaining, priority=priority)
+            except (requests.ConnectTimeout, requests.ReadTimeout):
+                # Only a model that ran out of its full budgeted time is slower than thought;
+                # not one cut short by the post's deadline, nor a request held in the rate limiter's queue
+                if send_timeout == timeout:
+                    self.token_budget.observe_timeout([payload['model']])
+                raise
+
+        try:
+            with trace.phase('network', call):
+                response, model = self.router.complete(send, data, send_timeout)
+        except CircuitOpenError:
+            self.metrics.inc('circuit_short_circuits_total', call=call)
+            trace.record(f'{call}_short_circuited', True)
+            raise
+        except requests.Timeout:
+            self.metrics.inc('openrouter_timeouts_total', call=call)
+            raise
+        
+        self.metrics.inc('openrouter_requests_total', call=call, status=str(response.status_code))
+        trace.record(f'{call}_model', model)
+        retries = getattr(response.raw, 'retries', None)
+        if retries is not None and retries.history:
+            self.metrics.inc('openrouter_retries_total', len(retries.history), call=call)
+            trace.record(f'{call}_retries', len(retries.history))
+        if response.status_code != 200:
+            print(f"Error from OpenRouter API: {response.status_code} - {response.text}")
+            return None
         
-        # Add line breaks for TikTok
-        if format_rules.get('line_breaks'):
-            # Split into sentences and add line breaks
-            sentences = content.split('. ')
-            content = '.\n\n'.join(sentences)
+        with trace.phase('json_decode', call):
+            body = response.json()
+            content = body['choices'][0]['message']['content'].strip()
+        if body['choices'][0].get('finish_reason') == 'length':
+            self.metrics.inc('openrouter_truncations_total', call=call)
+            trace.record(f'{call}_truncated', True)
         
-        # Add hashtags for TikTok
-        if format_rules.get('hashtag_style'):
-            # Extract key words and add hashtags
-            words = content.split()
-            hashtags = [f"#{word.lower()}" for word in words if len(word) > 3][:5]
-            if hashtags:
-                content += "\n\n" + " ".join(hashtags)
+        usage = body.get('usage') or {}
+        for token_type in ('prompt_tokens', 'completion_tokens'):
+            if usage.get(token_type):
+                self.metrics.inc('openrouter_tokens_total', usage[token_type], call=call, type=token_type.split('_')[0])
+                trace.record(f'{call}_{token_type}', usage[token_type])
+        # Headers only arrive once the completion is done, so elapsed is the generation time
+        completion_tokens = usage.get('completion_tokens') or estimate_tokens(content, language)
+        self.token_budget.observe(model, completion_tokens, response.elapsed.total_seconds())
         
+        if cache_result:
+            self.cache.set(key, content)
         return content
 
-    def _generate_ai_content(self, topic: str, length: str, platform: str, tone: str, language: str = 'EN') -> str:
-        """Generate content using OpenRouter API with timeout."""
-        language_instruction = "Write in English" if language == 'EN' else "Write in Bahasa Malaysia"
-        
-        # Add word count instructions based on length
-        word_count_instruction = {
-            'short': "Write approximately 300 words",
-            'medium': "Write approximately 900 words",
-            'long': "Write approximately 1500 words"
-        }.get(length.lower(), "Write appropriate length")
-        
-        prompt = f"""Create a {tone.lower()} social media post about {topic} for {platform}.
-        {language_instruction}.
-        {word_count_instruction}.
-        Write in second-person perspective (using 'you' and 'your').
-        
-        IMPORTANT GUIDELINES:
-        1. Only include verified, factual information
-        2. Avoid making unsubstantiated claims
-        3. If citing statistics or facts, ensure they are from reliable sources
-        4. Do not generate content that could be misleading or false
-        5. Focus on well-established, widely accepted information
-        6. If uncertain about a fact, either omit it or clearly indicate it's an opinion
-        
-        Make it engaging, emotional, and authentic while maintaining accuracy.
-        Include relevant emojis naturally in the text.
-        Focus on storytelling and relatability.
-        For long posts, ensure the content is well-structured with clear paragraphs.
-        Format: Return only the post content, no additional text."""
+    def _build_content_request(self, topic: str, length: str, platform: str, tone: str, language: str = 'EN') -> Dict:
+        """Build the chat completion request body for a post."""
+        max_tokens, max_chars = self._post_limits(length, platform, language)
+        prompt = self.prompts.post(platform, tone, language, length, max_chars)
+        return prompt.build(topic, self.default_model, max_tokens)
 
+    def _post_limits(self, length: str, platform: str, language: str = 'EN') -> Tuple[int, Optional[int]]:
+        """max_tokens for a post and, if the platform's limit is below the length's, the characters to ask for."""
+        words = self.prompts.word_target(length) or DEFAULT_POST_WORDS
+        max_tokens = self.token_budget.for_words(words, language)
+        rules = self.platform_rules.get(platform)
+        if rules is None or rules.limit is None:
+            return max_tokens, None
+        limit_tokens = self.token_budget.for_chars(rules.limit, language)
+        if limit_tokens >= max_tokens:
+            return max_tokens, None
+        return limit_tokens, rules.formatter(reserve=self._cta_reserve(platform)).budget
+
+    def _timeout(self, max_tokens: int) -> float:
+        """Seconds to allow a request for up to max_tokens, from the routed models' throughput."""
+        return self.token_budget.timeout(max_tokens, self.models)
+
+    def _post_timeout(self, length: str, platform: str, language: str = 'EN') -> float:
+        """Seconds to allow the post request for a length, platform and language."""
+        return self._timeout(self._post_limits(length, platform, language)[0])
+
+    def _within(self, timeout: float, deadline: Optional[float]) -> float:
+        """timeout, cut to the time left before a perf_counter() deadline; raises requests.Timeout once it has passed."""
+        if deadline is None:
+            return timeout
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            raise requests.Timeout("Deadline passed before the request was sent")
+        return min(timeout, remaining)
+
+    def _format_content(self, content: str, length: Optional[str], platform: Optional[str],
+                        hashtags: Optional[List[str]] = None) -> str:
+        """Apply paragraph and platform formatting to raw model output in one pass."""
+        formatter = self._post_formatter(length, platform, hashtags)
+        formatter.feed(content)
+        formatter.finish()
+        return formatter.text
+
+    def _generate_ai_content(self, topic: str, length: str, platform: str, tone: str, language: str = 'EN',
+                             use_cache: bool = True, trace: Optional[RequestTrace] = None,
+                             priority: int = PRIORITY_INTERACTIVE, platform_formatting: bool = True,
+                             deadline: Optional[float] = None) -> str:
+        """Generate content using OpenRouter API with timeout.
+
+        With platform_formatting=False the prompt still targets the platform but
+        the caller applies the platform formatting itself.
+        """
+        trace = trace or self._trace()
+        timeout = self._post_timeout(length, platform, language)
+        
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "HTTP-Referer": "https://github.com/yourusername/social-media-generator",
-                "X-Title": "Social Media Post Generator"
-            }
+            with trace.phase('prompt_build'):
+                data = self._build_content_request(topic, length, platform, tone, language)
+            
+            print(f"Generating {length} post in {language} with {data['max_tokens']} tokens and {timeout}s timeout")
+            
+            content = self._chat_completion(data, timeout, use_cache, trace, priority=priority, language=language,
+                                            deadline=deadline)
+            
+            if content is not None:
+                with trace.phase('formatting'):
+                    return self._format_content(content, length, platform if platform_formatting else None)
+                
+        except CircuitOpenError as e:
+            print(f"Skipping OpenRouter: {e}")
+        except requests.Timeout:
+            print(f"Request timed out after {timeout} seconds")
+        except Exception as e:
+            print(f"Error generating AI content: {e}")
+        
+        self.metrics.inc('generation_fallbacks_total', call='post')
+        trace.record('post_fallback', True)
+        with trace.stage('fallback'):
+            content = self._generate_fallback_content(topic, length, tone, language)
+            return self._format_content(content, None, platform if platform_formatting else None)
 
-            # Get token limit based on length
-            max_tokens = self.token_limits.get(length.lower(), 400)
-
-            data = {
-                "model": self.default_model,
-                "messages": [
-                    {"role": "system", "content": f"""You are a creative social media copywriter who specializes in writing engaging, emotionally resonant posts in {language}. 
-                    Your primary responsibility is to ensure all information is factual and verified.
-                    For Bahasa Malaysia posts, use casual language with 'aku' and 'kau' instead of formal 'saya' and 'kamu'.
-                    Use 'you' and 'your' to create a personal connection with the reader.
-                    For long posts, ensure proper paragraph breaks and structure.
-                    Never generate content that could be misleading or false.
-                    If you're unsure about a fact, either omit it or clearly mark it as an opinion.
-                    Always prioritize accuracy over engagement."""},
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": max_tokens,
-                "temperature": 0.5,  # Reduced temperature for more factual output
-                "presence_penalty": 0.6,
-                "frequency_penalty": 0.3
-            }
+    def _generate_structured_content(self, topic: str, length: str, platform: str, tone: str, language: str = 'EN',
+                                     use_cache: bool = True, trace: Optional[RequestTrace] = None,
+                                     priority: int = PRIORITY_INTERACTIVE,
+                                     deadline: Optional[float] = None) -> Optional[Dict]:
+        """Generate the post body, hashtags and image suggestions in a single completion.
 
-            # Set timeout based on length
-            timeout = self.timeouts.get(length.lower(), 30)
+        Returns None if the response can't be parsed, so the caller can fall
+        back to separate requests.
+        """
+        trace = trace or self._trace()
+        max_tokens, max_chars = self._post_limits(length, platform, language)
+        prompt = self.prompts.structured_post(platform, tone, language, length, max_chars)
+        if prompt is None:
+            return None
+        timeout = self._timeout(max_tokens + prompt.extra_tokens)
+        
+        try:
+            with trace.phase('prompt_build'):
+                data = prompt.build(topic, self.default_model, max_tokens)
             
-            print(f"Generating {length} post in {language} with {max_tokens} tokens and {timeout}s timeout")
+            print(f"Generating {length} post with image suggestions in {language} with {data['max_tokens']} tokens and {timeout}s timeout")
             
-            response = requests.post(
-                f"{self.api_base}/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=timeout
-            )
+            # Only a response that parses is cached, or every retry would get the same broken JSON back
+            content = self._chat_completion(data, timeout, use_cache, trace, 'structured_post', priority, language,
+                                            deadline, cache_result=False)
             
-            if response.status_code == 200:
-                content = response.json()['choices'][0]['message']['content'].strip()
-                # Ensure proper paragraph breaks for long content
-                if length.lower() == 'long':
-                    content = self._format_long_content(content)
-                return self._format_for_platform(content, platform)
-            else:
-                print(f"Error from OpenRouter API: {response.status_code} - {response.text}")
-                return self._generate_fallback_content(topic, length, tone, language)
+            if content is not None:
+                with trace.phase('json_decode', 'structured_post'):
+                    parsed = parse_structured_post(content)
+                if parsed is None:
+                    print("Could not parse the structured response, falling back to separate requests")
+                    self.metrics.inc('structured_parse_failures_total')
+                    trace.record('structured_parse_failed', True)
+                    return None
+                self.cache.set(self.cache.key(data), content)
+                with trace.phase('formatting'):
+                    parsed['content'] = self._format_content(parsed.pop('post'), length, platform, parsed['hashtags'])
+                return parsed
                 
+        except CircuitOpenError as e:
+            print(f"Skipping OpenRouter: {e}")
         except requests.Timeout:
             print(f"Request timed out after {timeout} seconds")
-            return self._generate_fallback_content(topic, length, tone, language)
         except Exception as e:
             print(f"Error generating AI content: {e}")
-            return self._generate_fallback_content(topic, length, tone, language)
+        
+        self.metrics.inc('generation_fallbacks_total', call='post')
+        trace.record('post_fallback', True)
+        with trace.stage('fallback'):
+            content = self._format_content(self._generate_fallback_content(topic, length, tone, language), None,
+                                           platform)
+        return {
+            'content': content,
+            'hashtags': [],
+            'image_suggestions': self._fallback_image_suggestions(topic)
+        }
+
+    def _generate_fallback_content(self, topic: str, length: str, tone: str, language: str = 'EN') -> str:
+        """Compose a post offline from the fallback grammar when the API can't write one."""
+        seed = None
+        if self.fallback_seed is not None:
+            seed = f"{self.fallback_seed}|{topic}|{length}|{tone}|{language}"
+        return self.fallback_grammar.compose(topic, length, tone, language, self.emojis.get(tone.lower(), ()), seed)
+
+    def _timed(self, func, *args, **kwargs):
+        """Run func and return its result together with the elapsed seconds."""
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        return result, time.perf_counter() - start
 
-    def _format_long_content(self, content: str) -> str:
-        """Format long content with proper paragraph breaks and structure."""
-        # Split into sentences
-        sentences = content.split('. ')
+    def generate_post(self, topic: str, length: str, platform: str, tone: str, language: str = 'EN',
+                      fresh: bool = False, priority: int = PRIORITY_INTERACTIVE, save: bool = True,
+                      duplicate_check: Optional[str] = None, deadline: Optional[float] = None) -> Dict[str, str]:
+        """Generate a social media post and save to history.
+
+        Identical requests are served from the response cache; pass fresh=True
+        to skip it and get a new variant from the API. Requests with a lower
+        priority value are sent to the API first when it is rate limited.
+        With save=False the post is returned without being saved.
+
+        duplicate_check overrides the generator's setting for this post. With
+        'flag', metadata['repeat_of'] names an earlier post for the same
+        settings and topic, and metadata['near_duplicates'] lists earlier posts
+        with near-identical content. With 'reuse', a repeated request returns
+        the earlier post (marked with metadata['reused_from']) without calling
+        the API, unless fresh is set.
+
+        deadline is a time.perf_counter() value the post has to be done by: API
+        requests get no longer than the time left, and the post falls back once
+        it has passed.
+        """
+        start = time.perf_counter()
+        trace = self._trace(platform=platform, length=length, language=language)
+        duplicate_check = duplicate_check or self.duplicate_check
+        if duplicate_check not in DUPLICATE_CHECKS:
+            raise ValueError(f"duplicate_check must be one of {', '.join(DUPLICATE_CHECKS)}")
+        repeat = None
+        if duplicate_check != 'off':
+            with trace.stage('duplicate_check'):
+                repeat = self.history_store.find_repeat(topic, length, platform, tone, language)
+            if repeat is not None and duplicate_check == 'reuse' and not fresh:
+                post_id, post = repeat
+                post['metadata']['reused_from'] = post_id
+                self.metrics.inc('near_duplicates_total', action='reused')
+                trace.finish('reused')
+                return post
+        draft = self._generate_draft(topic, length, platform, tone, language, fresh, trace, priority, deadline)
+        return self._complete_post(draft['content'], draft['image_future'], start, draft['timings'], trace,
+                                   topic, length, platform, tone, language, draft['hashtags'], save=save,
+                                   duplicate_check=duplicate_check, repeat_of=repeat[0] if repeat else None,
+                                   deadline=deadline)
+
+    def _generate_draft(self, topic: str, length: str, platform: str, tone: str, language: str, fresh: bool,
+                        trace: RequestTrace, priority: int, deadline: Optional[float] = None) -> Dict:
+        """Generate a post body and start on its image suggestions.
+
+        Returns the formatted content, the hashtags the model suggested (single
+        call only), a future for the image suggestions, the content timing and
+        how many model requests were made.
+        """
+        if self.single_call:
+            structured, content_time = self._timed(self._generate_structured_content, topic, length, platform, tone,
+                                                   language, not fresh, trace, priority=priority, deadline=deadline)
+            if structured is not None:
+                requests_made = 1
+                if structured['image_suggestions']:
+                    image_future = Future()
+                    image_future.set_result((structured['image_suggestions'], content_time))
+                else:
+                    # The post parsed but the image ideas were lost, so ask for just those
+                    image_future = self.executor.submit(self._timed, self._generate_image_suggestions, topic, tone,
+                                                        not fresh, trace, priority=priority, deadline=deadline)
+                    requests_made += 1
+                return {'content': structured['content'], 'hashtags': structured['hashtags'], 'image_future': image_future,
+                        'timings': {'content': content_time}, 'requests': requests_made}
         
-        # Group sentences into paragraphs (3-4 sentences per paragraph)
-        paragraphs = []
-        current_paragraph = []
+        # The post body and the image suggestions are independent requests, so
+        # dispatch both at once and only pay for the slower of the two
+        content_future = self.executor.submit(self._timed, self._generate_ai_content, topic, length, platform, tone, language,
+                                              not fresh, trace, priority=priority, deadline=deadline)
+        image_future = self.executor.submit(self._timed, self._generate_image_suggestions, topic, tone, not fresh, trace,
+                                            priority=priority, deadline=deadline)
         
-        for sentence in sentences:
-            current_paragraph.append(sentence)
-            if len(current_paragraph) >= 3:
-                paragraphs.append('. '.join(current_paragraph) + '.')
-                current_paragraph = []
+        content, content_time = content_future.result()
+        # A structured request was only sent if there is a template for it
+        requests_made = 3 if self.single_call and self._has_structured_prompt() else 2
+        return {'content': content, 'hashtags': [], 'image_future': image_future, 'timings': {'content': content_time},
+                'requests': requests_made}
+
+    def _has_structured_prompt(self) -> bool:
+        """Whether the prompt templates can ask for a post in a single structured call."""
+        return 'structured_post' in self.prompts.templates
+
+    def generate_campaign(self, topic: str, length: str, tone: str, language: str = 'EN',
+                          platforms: Optional[Iterable[str]] = None, fresh: bool = False,
+                          priority: int = PRIORITY_INTERACTIVE) -> Dict:
+        """Generate posts on one topic for several platforms from a single base draft.
+
+        The draft and its image suggestions are generated once, then each
+        platform variant is derived locally: platform formatting, hashtags, a
+        platform CTA and trimming at a sentence boundary to the platform's
+        max_length. The model is only asked again, for a short post, on
+        platforms where not even the draft's first sentence fits.
+
+        Returns {'posts': {platform: post}, 'requests': {...}} where requests
+        compares the model requests made with independent generate_post calls.
+        """
+        platforms = list(platforms or CAMPAIGN_PLATFORMS)
+        start = time.perf_counter()
+        trace = self._trace(platform='campaign', length=length, language=language)
+        draft = self._generate_draft(topic, length, BASE_DRAFT_PLATFORM, tone, language, fresh, trace, priority)
+        trace.finish('draft')
+        hashtags = draft['hashtags'] or extract_hashtags(draft['content'])
         
-        # Add any remaining sentences
-        if current_paragraph:
-            paragraphs.append('. '.join(current_paragraph) + '.')
+        variants, regenerate = {}, []
+        for platform in platforms:
+            with trace.stage('cta'):
+                cta = self._choose_cta(platform, language)
+            with trace.stage('platform_fit'):
+                content = self._fit_to_platform(draft['content'], platform, cta, hashtags)
+            if content is None:
+                regenerate.append(platform)
+            else:
+                variants[platform] = (content, cta, draft['timings'])
         
-        # Join paragraphs with double line breaks
-        return '\n\n'.join(paragraphs)
+        # Platforms the draft can't be cut down for get a short post of their own
+        regenerated = {
+            platform: self.executor.submit(self._timed, self._generate_ai_content, topic, 'short', platform, tone, language,
+                                           not fresh, None, priority=priority, platform_formatting=False)
+            for platform in regenerate
+        }
+        for platform, future in regenerated.items():
+            content, content_time = future.result()
+            with trace.stage('cta'):
+                cta = self._choose_cta(platform, language)
+            with trace.stage('platform_fit'):
+                fitted = (self._fit_to_platform(content, platform, cta, hashtags)
+                          or self._fit_to_platform(content, platform, cta, hashtags, cut_words=True)
+                          or self._format_for_platform(content, platform, hashtags))
+            variants[platform] = (fitted, cta, {'content': content_time})
+        
+        posts = {}
+        for platform in platforms:
+            content, cta, timings = variants[platform]
+            variant_trace = self._trace(platform=platform, length=length, language=language, campaign=True)
+            posts[platform] = self._complete_post(content, draft['image_future'], start, timings, variant_trace,
+                                                  topic, length, platform, tone, language, hashtags, cta)
+        
+        requests_made = draft['requests'] + len(regenerate)
+        independent = (1 if self.single_call and self._has_structured_prompt() else 2) * len(platforms)
+        report = {
+            'made': requests_made,
+            'independent': independent,
+            'saved': independent - requests_made,
+            'regenerated': regenerate
+        }
+        print(f"Campaign for '{topic}': {requests_made} model requests instead of {independent} "
+              f"({report['saved']} saved)")
+        return {'posts': posts, 'requests': report}
 
-    def _generate_fallback_content(self, topic: str, length: str, tone: str, language: str = 'EN') -> str:
-        """Generate fallback content if AI generation fails."""
-        if length.lower() == 'short':
-            return self._generate_short_post(topic, tone, language)
-        elif length.lower() == 'medium':
-            return self._generate_medium_post(topic, tone, language)
-        else:
-            # For long posts, combine multiple medium posts with proper formatting
-            content = self._generate_medium_post(topic, tone, language)
-            content += "\n\n" + self._generate_medium_post(topic, tone, language)
-            return self._format_long_content(content)
-
-    def generate_post(self, topic: str, length: str, platform: str, tone: str, language: str = 'EN') -> Dict[str, str]:
-        """Generate a social media post and save to history."""
-        # Generate AI content
-        content = self._generate_ai_content(topic, length, platform, tone, language)
+    def _choose_cta(self, platform: str, language: str) -> str:
+        """Pick a random call to action for a platform."""
+        return random.choice(self.cta_templates[language].get(platform, self.cta_templates[language]['Facebook']))
+
+    def _fit_to_platform(self, content: str, platform: str, cta: str, hashtags: List[str],
+                         cut_words: bool = False) -> Optional[str]:
+        """Format content for a platform so that it and the CTA fit the platform's max_length.
+
+        Whole sentences that don't fit are dropped. Returns None if not even the
+        first sentence fits, unless cut_words allows cutting it at a word.
+        """
+        formatter = self._post_formatter(None, platform, hashtags, reserve=len(cta) + 2,
+                                         truncation='word' if cut_words else 'sentence')
+        formatter.feed(content)
+        formatter.finish()
+        return formatter.text if formatter.sentences else None
+
+    def _complete_post(self, content: str, image_future, start: float, timings: Dict[str, float], trace: RequestTrace,
+                       topic: str, length: str, platform: str, tone: str, language: str,
+                       hashtags: Optional[List[str]] = None, cta: Optional[str] = None, save: bool = True,
+                       duplicate_check: str = 'off', repeat_of: Optional[int] = None,
+                       deadline: Optional[float] = None) -> Dict:
+        """Collect the image suggestions, add the CTA and save the finished post to history."""
+        # Don't let a slow image request hold back a finished post
+        deadline = min(start + self._post_timeout(length, platform, language), deadline or float('inf'))
+        remaining = max(0.0, deadline - time.perf_counter())
+        with trace.stage('image_wait'):
+            try:
+                image_suggestions, image_time = image_future.result(timeout=min(remaining, self.image_suggestion_grace))
+            except FutureTimeoutError:
+                print("Image suggestions not ready in time, using fallback suggestions")
+                self.metrics.inc('generation_fallbacks_total', call='image_suggestions')
+                trace.record('image_suggestions_fallback', True)
+                image_suggestions = self._fallback_image_suggestions(topic)
+                image_time = None
             
         # Add CTA
-        cta = random.choice(self.cta_templates[language].get(platform, self.cta_templates[language]['Facebook']))
-        content += f"\n\n{cta}"
+        with trace.stage('cta'):
+            cta = cta or self._choose_cta(platform, language)
+            content += f"\n\n{cta}"
+            rules = self.platform_rules.get(platform)
+            thread = rules.split_thread(content) if rules is not None and rules.threaded else None
         
-        # Generate image suggestions
-        image_suggestions = self._generate_image_suggestions(topic, tone)
+        timings = {name: round(value, 3) for name, value in timings.items()}
+        timings['image_suggestions'] = round(image_time, 3) if image_time is not None else None
+        timings['total'] = round(time.perf_counter() - start, 3)
         
         # Create result
         result = {
             'content': content,
             'image_suggestions': image_suggestions,
+            'hashtags': hashtags or [],
             'timestamp': datetime.now().isoformat(),
             'metadata': {
                 'topic': topic,
                 'length': length,
                 'platform': platform,
                 'tone': tone,
-                'language': language
+                'language': language,
+                'prompt_version': self.prompts.version,
+                'timings': timings
             }
         }
+        if thread is not None and len(thread) > 1:
+            result['thread'] = thread
+        fallback = trace.details.get('post_fallback')
+        if fallback:
+            result['metadata']['fallback'] = True
+        fingerprint = None
+        if duplicate_check != 'off':
+            with trace.stage('duplicate_check'):
+                fingerprint = post_simhash(result)
+                near_duplicates = [post_id for post_id, _ in self.similarity_index.find(fingerprint)]
+            if repeat_of is not None:
+                result['metadata']['repeat_of'] = repeat_of
+            if near_duplicates:
+                result['metadata']['near_duplicates'] = near_duplicates
+            if repeat_of is not None or near_duplicates:
+                self.metrics.inc('near_duplicates_total', action='flagged')
         
         # Save to history
-        self.history.append(result)
-        self._save_history()
+        if save:
+            self._save_history(result, trace, fingerprint)
+        trace.finish('fallback' if fallback else 'ok')
         
         return result
 
+    def generate_post_stream(self, topic: str, length: str, platform: str, tone: str, language: str = 'EN',
+                             fresh: bool = False, priority: int = PRIORITY_INTERACTIVE,
+                             save: bool = True) -> 'PostStream':
+        """Generate a post, yielding the model's text as it streams in.
+
+        Iterate over the returned PostStream to get the post as it is formatted,
+        a sentence or so at a time. Once it is exhausted, its result attribute
+        holds the same dict generate_post returns, with the CTA applied.
+        """
+        return PostStream(self, topic, length, platform, tone, language, fresh, priority, save)
+
+    def _stream_content(self, stream: 'PostStream') -> Iterator[str]:
+        """Stream the post body for a PostStream, then finish the post."""
+        topic, length, platform, tone, language = stream.topic, stream.length, stream.platform, stream.tone, stream.language
+        start = time.perf_counter()
+        trace = self._trace(platform=platform, length=length, language=language, streamed=True)
+        image_future = self.executor.submit(self._timed, self._generate_image_suggestions, topic, tone, not stream.fresh, trace,
+                                            priority=stream.priority)
+        timings = {}
+        
+        with trace.phase('prompt_build'):
+            data = self._build_content_request(topic, length, platform, tone, language)
+        timeout = self._timeout(data['max_tokens'])
+        key = self.cache.key(data)
+        content = None if stream.fresh else self.cache.get(key)
+        formatter = self._post_formatter(length, platform)
+        formatting = 0.0
+
+        def format_chunk(chunk: str, final: bool = False) -> str:
+            nonlocal formatting
+            format_start = time.perf_counter()
+            output = formatter.finish() if final else formatter.feed(chunk)
+            formatting += time.perf_counter() - format_start
+            return output
+        
+        if content is not None:
+            timings['first_token'] = time.perf_counter() - start
+            self.metrics.inc('response_cache_hits_total', call='post')
+            trace.record('post_cached', True)
+            yield format_chunk(content)
+        else:
+            chunks = []
+            network_start = time.perf_counter()
+            # Streams are routed but not hedged: the reader already has the first model's tokens
+            try:
+                model, generation = self.router.acquire()
+                self.metrics.inc('model_routed_total', model=model)
+                trace.record('post_model', model)
+                print(f"Streaming {length} post in {language} with {data['max_tokens']} tokens and {timeout}s timeout")
+                for chunk in self.client.stream_chat_completion({**data, 'model': model}, timeout=timeout,
+                                                                priority=stream.priority):
+                    if not chunks:
+                        timings['first_token'] = time.perf_counter() - start
+                        self.metrics.observe('time_to_first_token_seconds', timings['first_token'])
+                    chunks.append(chunk)
+                    output = format_chunk(chunk)
+                    if output:
+                        yield output
+                content = ''.join(chunks).strip()
+                self.cache.set(key, content)
+                self.metrics.inc('openrouter_requests_total', call='post', status='200')
+                self.router.record(model, None, True, generation)
+            except CircuitOpenError as e:
+                print(f"Skipping OpenRouter: {e}")
+                self.metrics.inc('circuit_short_circuits_total', call='post')
+                trace.record('post_short_circuited', True)
+            except requests.RequestException as e:
+                if isinstance(e, requests.Timeout):
+                    print(f"Request timed out after {timeout} seconds")
+                    self.metrics.inc('openrouter_timeouts_total', call='post')
+                else:
+                    print(f"Error streaming AI content: {e}")
+                if rate_limited(e):
+                    self.router.release(model, generation)
+                else:
+                    if isinstance(e, requests.Timeout):
+                        self.token_budget.observe_timeout([model])
+                    self.router.record(model, None, False, generation)
+            except Exception as e:
+                print(f"Error streaming AI content: {e}")
+                self.router.record(model, None, False, generation)
+            # Time spent waiting on the reader between chunks is included here
+            trace.add_phase('network', time.perf_counter() - network_start)
+            
+            if content is None:
+                # Keep whatever already reached the reader, otherwise fall back to a template post
+                content = ''.join(chunks).strip()
+                if not content:
+                    self.metrics.inc('generation_fallbacks_total', call='post')
+                    trace.record('post_fallback', True)
+                    with trace.stage('fallback'):
+                        content = self._generate_fallback_content(topic, length, tone, language)
+                    yield format_chunk(content)
+        
+        timings['content'] = time.perf_counter() - start
+        output = format_chunk('', final=True)
+        if output:
+            yield output
+        # Formatting ran chunk by chunk inside the stream, so record its total
+        trace.add_phase('formatting', formatting)
+        content = formatter.text
+        stream.result = self._complete_post(content, image_future, start, timings, trace, topic, length, platform, tone,
+                                            language, save=stream.save)
+
+    async def agenerate_batch(self, specs: Iterable[Dict[str, str]], concurrency: int = 4,
+                              request_timeout: Optional[float] = None,
+                              batch_timeout: Optional[float] = None) -> AsyncIterator[Dict]:
+        """Generate posts for many specs concurrently, yielding each one as it completes.
+
+        Every yielded item has the spec's 'index' and 'spec' plus either 'result'
+        or 'error'. Posts still running when batch_timeout expires are cancelled
+        and reported as errors. request_timeout counts from when a post starts
+        running and also bounds its API requests; a post that isn't done by then
+        is reported as an error. Only posts that are yielded are saved to history.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+        batch_executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch")
+
+        def generate(spec: Dict[str, str], timeout: float, started: asyncio.Future) -> Dict:
+            loop.call_soon_threadsafe(lambda: started.done() or started.set_result(None))
+            deadline = time.perf_counter() + timeout
+            result = self.generate_post(**spec, priority=PRIORITY_BATCH, save=False, deadline=deadline)
+            if time.perf_counter() > deadline:
+                # Fell back at the deadline and only just got back before wait_for noticed; still a timeout
+                raise asyncio.TimeoutError
+            return result
+
+        async def run(index: int, spec: Dict[str, str]) -> Dict:
+            async with semaphore:
+                timeout = request_timeout or (self._post_timeout(spec['length'], spec['platform'], spec.get('language', 'EN'))
+                                              + self.image_suggestion_grace)
+                started = loop.create_future()
+                try:
+                    future = loop.run_in_executor(batch_executor, partial(generate, spec, timeout, started))
+                    # A post still finishing after its timeout holds a worker, so the clock starts once one picks it up
+                    await asyncio.wait([started, future], return_when=asyncio.FIRST_COMPLETED)
+                    result = await asyncio.wait_for(future, timeout)
+                    return {'index': index, 'spec': spec, 'result': result}
+                except asyncio.TimeoutError:
+                    return {'index': index, 'spec': spec, 'error': f"Request timed out after {timeout} seconds"}
+                except Exception as e:
+                    return {'index': index, 'spec': spec, 'error': str(e)}
+
+        tasks = {}
+        for index, spec in enumerate(specs):
+            spec = {**BATCH_SPEC_DEFAULTS, **{k: v for k, v in spec.items() if k in BATCH_SPEC_FIELDS and v}}
+            tasks[asyncio.ensure_future(run(index, spec))] = (index, spec)
+
+        try:
+            for next_done in asyncio.as_completed(list(tasks), timeout=batch_timeout):
+                try:
+                    item = await next_done
+                    if 'result' in item:
+                        await loop.run_in_executor(None, self._save_history, item['result'])
+                    yield item
+                except asyncio.TimeoutError:
+                    print(f"Batch timed out after {batch_timeout} seconds")
+                    for task, (index, spec) in tasks.items():
+                        if not task.done():
+                            task.cancel()
+                            yield {'index': index, 'spec': spec, 'error': f"Batch timed out after {batch_timeout} seconds"}
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+            batch_executor.shutdown(wait=False, cancel_futures=True)
+
     def get_history(self, limit: int = 10) -> List[Dict]:
         """Get recent post history."""
-        return self.history[-limit:]
+        return self.history_store.recent(limit)
+
+    def query_history(self, limit: int = 20, offset: int = 0, cursor: Optional[int] = None, **filters) -> Dict:
+        """Get a page of history, newest first, filtered by platform, language, tone, topic, since or until.
+
+        Returns {'posts': [...], 'next_cursor': ...}; pass next_cursor back to get the next page.
+        """
+        return self.history_store.query(limit=limit, offset=offset, cursor=cursor, **filters)
 
     def clear_history(self):
         """Clear post history."""
-        self.history = []
-        self._save_history()
-
-    def _generate_short_post(self, topic: str, tone: str, language: str = 'EN') -> str:
-        """Generate a short post (suitable for Twitter)."""
-        templates = {
-            'EN': [
-                f"✨ Struggling with {topic}? Here's what you need to know...",
-                f"💡 Want to master {topic}? Start with this...",
-                f"🚀 Your journey to {topic} begins here:",
-                f"💪 Transform your {topic} with this simple tip:"
-            ],
-            'BM': [
-                f"✨ Bermasalah dengan {topic}? Ini yang kau perlu tahu...",
-                f"💡 Mahu kuasai {topic}? Mulakan dengan ni...",
-                f"🚀 Perjalanan kau ke arah {topic} bermula kat sini:",
-                f"💪 Ubah {topic} kau dengan tip mudah ni:"
-            ]
-        }
-        return random.choice(templates[language])
-    
-    def _generate_medium_post(self, topic: str, tone: str, language: str = 'EN') -> str:
-        """Generate a medium-length post (suitable for Facebook/Instagram)."""
-        templates = {
-            'EN': [
-                f"✨ Struggling with {topic}?\n\nYou're not alone. Here's what changed everything for me...",
-                f"💡 The truth about {topic} that nobody tells you:\n\n",
-                f"🚀 Want to transform your {topic}?\n\nHere's how I did it:",
-                f"💪 Your {topic} doesn't have to be complicated.\n\nHere's why:"
-            ],
-            'BM': [
-                f"✨ Bermasalah dengan {topic}?\n\nKau tak keseorangan. Ini yang mengubah segalanya untuk aku...",
-                f"💡 Kebenaran tentang {topic} yang tiada siapa beritahu kau:\n\n",
-                f"🚀 Mahu ubah {topic} kau?\n\nIni cara aku lakukannya:",
-                f"💪 {topic} kau tak perlu rumit.\n\nIni sebabnya:"
-            ]
-        }
-        return random.choice(templates[language])
-    
-    def _generate_long_post(self, topic: str, tone: str, language: str = 'EN') -> str:
-        """Generate a long post (suitable for LinkedIn/Facebook)."""
-        templates = {
-            'EN': [
-                f"✨ Your complete guide to {topic}:\n\nHere's everything you need to know...",
-                f"💡 Your journey with {topic} and what you'll learn:\n\n",
-                f"🚀 Transform your {topic} with these proven strategies:\n\n",
-                f"💪 Master your {topic} with these expert tips:\n\n"
-            ],
-            'BM': [
-                f"✨ Panduan lengkap kau untuk {topic}:\n\nIni semua yang kau perlu tahu...",
-                f"💡 Perjalanan kau dengan {topic} dan apa yang kau akan pelajari:\n\n",
-                f"🚀 Ubah {topic} kau dengan strategi yang terbukti ini:\n\n",
-                f"💪 Kuasai {topic} kau dengan tip pakar ini:\n\n"
-            ]
-        }
-        return random.choice(templates[language])
-    
-    def _generate_image_suggestions(self, topic: str, tone: str) -> List[str]:
+        self.history_store.clear()
+        if self._similarity_index is not None:
+            self._similarity_index.clear()
+
+    def find_similar(self, query: Union[str, Dict], limit: int = 5,
+                     max_distance: int = NEAR_DUPLICATE_DISTANCE) -> List[Dict]:
+        """Posts in the history whose content is near-identical to query, closest first.
+
+        query is draft text, or a generated post, which is fingerprinted like
+        the stored posts: without its call to action. Each match has the
+        post's history 'id', the fingerprint 'distance' in bits, a 0-1
+        'similarity' and the 'post' itself.
+        """
+        fingerprint = post_simhash(query) if isinstance(query, dict) else simhash(query)
+        matches = []
+        for post_id, distance in self.similarity_index.find(fingerprint, max_distance, limit):
+            post = self.history_store.get(post_id)
+            if post is not None:
+                matches.append({'id': post_id, 'distance': distance,
+                                'similarity': round(1 - distance / FINGERPRINT_BITS, 3), 'post': post})
+        return matches
+
+    def submit_post(self, topic: str, length: str, platform: str, tone: str, language: str = 'EN',
+                    idempotency_key: Optional[str] = None, priority: int = PRIORITY_INTERACTIVE) -> int:
+        """Queue a post for a job worker to generate and return the job id.
+
+        Submitting again with the same idempotency_key returns the existing job.
+        """
+        spec = {'topic': topic, 'length': length, 'platform': platform, 'tone': tone, 'language': language}
+        return self.job_queue.submit(spec, idempotency_key=idempotency_key, priority=priority)
+
+    def poll_post(self, job_id: int) -> Optional[Dict]:
+        """Get a queued post's job, with its history entry as 'result' once it is done."""
+        job = self.job_queue.poll(job_id)
+        if job is not None and job['post_id'] is not None:
+            job['result'] = self.history_store.get(job['post_id'])
+        return job
+
+    def cancel_post(self, job_id: int) -> bool:
+        """Cancel a queued post. Returns False if it had already finished."""
+        return self.job_queue.cancel(job_id)
+
+    def _generate_image_suggestions(self, topic: str, tone: str, use_cache: bool = True,
+                                    trace: Optional[RequestTrace] = None,
+                                    priority: int = PRIORITY_INTERACTIVE, deadline: Optional[float] = None) -> List[str]:
         """Generate relevant image suggestions based on topic and tone."""
+        trace = trace or self._trace()
         try:
-            headers = {
-                "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
-                "Content-Type": "application/json"
-            }
+            with trace.phase('prompt_build', 'image_suggestions'):
+                data = self.prompts.image_suggestions(tone).build(topic, self.default_model)
             
-            data = {
-                "model": "deepseek/deepseek-chat-v3-0324:free",
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are a creative social media expert. Generate 2 specific and relevant image suggestions that would perfectly complement a social media post about the given topic and tone. Make the suggestions detailed and specific to the content."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Generate 2 specific image suggestions for a social media post about {topic} with a {tone} tone. The suggestions should be detailed and directly relevant to the content."
-                    }
-                ]
-            }
-            
-            response = requests.post(
-                f"{self.api_base}/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=30
-            )
+            content = self._chat_completion(data, self._timeout(IMAGE_SUGGESTION_TOKENS), use_cache, trace,
+                                            'image_suggestions', priority, deadline=deadline)
             
-            if response.status_code == 200:
-                content = response.json()['choices'][0]['message']['content'].strip()
+            if content is not None:
                 # Split the response into individual suggestions
                 suggestions = [s.strip() for s in content.split('\n') if s.strip()]
                 # Take the first 2 suggestions
                 return suggestions[:2]
-            else:
-                # Fallback to generic suggestions if API call fails
-                return [
-                    f"A person looking determined while working on {topic}",
-                    f"A split image showing before/after of {topic}"
-                ]
                 
         except Exception as e:
             print(f"Error generating image suggestions: {e}")
-            # Fallback to generic suggestions
-            return [
-                f"A person looking determined while working on {topic}",
-                f"A split image showing before/after of {topic}"
-            ]
+        
+        # Fallback to generic suggestions if API call fails
+        self.metrics.inc('generation_fallbacks_total', call='image_suggestions')
+        trace.record('image_suggestions_fallback', True)
+        return self._fallback_image_suggestions(topic)
+
+    def _fallback_image_suggestions(self, topic: str) -> List[str]:
+        """Generic image suggestions used when the API can't provide any."""
+        return [
+            f"A person looking determined while working on {topic}",
+            f"A split image showing before/after of {topic}"
+        ]
+
+class PostStream:
+    """Iterator over the text chunks of a streamed post; result is set once it is exhausted."""
+
+    def __init__(self, generator: SocialMediaPostGenerator, topic: str, length: str, platform: str,
+                 tone: str, language: str = 'EN', fresh: bool = False, priority: int = PRIORITY_INTERACTIVE,
+                 save: bool = True):
+        self.topic = topic
+        self.length = length
+        self.platform = platform
+        self.tone = tone
+        self.language = language
+        self.fresh = fresh
+        self.priority = priority
+        self.save = save
+        self.result: Optional[Dict] = None
+        self._chunks = generator._stream_content(self)
+
+    def __iter__(self) -> Iterator[str]:
+        return self._chunks
+
+def load_batch_specs(path: str) -> List[Dict[str, str]]:
+    """Load batch generation specs from a CSV (with a header row) or JSONL file."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.csv'):
+            specs = list(csv.DictReader(f))
+        else:
+            specs = [json.loads(line) for line in f if line.strip()]
+    for line_no, spec in enumerate(specs, 1):
+        if not spec.get('topic'):
+            raise ValueError(f"Spec {line_no} in {path} has no topic")
+    return specs
+
+async def run_batch(generator: SocialMediaPostGenerator, specs: List[Dict[str, str]], output_path: str,
+                    concurrency: int, request_timeout: Optional[float], batch_timeout: Optional[float]):
+    """Run a batch and write each result to output_path as JSONL as soon as it completes."""
+    completed = failed = 0
+    with open(output_path, 'w', encoding='utf-8') as f:
+        async for item in generator.agenerate_batch(specs, concurrency, request_timeout, batch_timeout):
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+            f.flush()
+            if 'error' in item:
+                failed += 1
+            else:
+                completed += 1
+            print(f"[{completed + failed}/{len(specs)}] {item['spec']['topic']} ({item['spec']['platform']})"
+                  + (f" failed: {item['error']}" if 'error' in item else ""))
+    print(f"Batch finished: {completed} generated, {failed} failed. Results written to {output_path}")
+
+def submit_batch(generator: SocialMediaPostGenerator, specs: List[Dict[str, str]]):
+    """Queue batch specs for job workers, using a spec's 'key' field as its idempotency key."""
+    for spec in specs:
+        fields = {**BATCH_SPEC_DEFAULTS, **{k: v for k, v in spec.items() if k in BATCH_SPEC_FIELDS and v}}
+        generator.submit_post(**fields, idempotency_key=spec.get('key') or None, priority=PRIORITY_BATCH)
+    print(f"Queued {len(specs)} posts: {generator.job_queue.counts()}")
+
+def _run_worker(name: str, options: Dict, drain: bool):
+    """Run one job worker process with its own generator."""
+    generator = SocialMediaPostGenerator(**options)
+    try:
+        JobWorker(generator.job_queue, generator, name=name).run(drain=drain)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        generator.token_budget.save()
+
+def run_workers(count: int, options: Dict, drain: bool):
+    """Run count job worker processes until interrupted, or with drain until the queue is empty."""
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=_run_worker, args=(f"worker-{os.getpid()}-{i}", options, drain))
+               for i in range(count)]
+    for worker in workers:
+        worker.start()
+    print(f"Started {count} workers" + (", stopping when the queue is empty" if drain else ", Ctrl+C to stop"))
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        # The workers got the interrupt too and put their running jobs back in the queue
+        for worker in workers:
+            worker.join()
+
+def write_metrics(generator: SocialMediaPostGenerator, path: str):
+    """Export the generator's metrics registry to a file."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(generator.metrics.to_json() if path.lower().endswith('.json') else generator.metrics.to_prometheus())
+    print(f"Metrics written to {path}")
+
+def write_profile(generator: SocialMediaPostGenerator, path: Optional[str]):
+    """Print the generator's per-stage profile and, with a path, write it there as JSON."""
+    print("\nPer-stage profile:")
+    print(generator.profiler.format_table())
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(generator.profiler.to_json())
+        print(f"Profile written to {path}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate social media posts with OpenRouter AI.")
+    parser.add_argument('--batch', metavar='SPECS', help="CSV or JSONL file of post specs (topic, length, platform, tone, language)")
+    parser.add_argument('--output', default='batch_results.jsonl', help="JSONL file to write batch results to")
+    parser.add_argument('--concurrency', type=int, default=4, help="Maximum posts generated at once")
+    parser.add_argument('--request-timeout', type=float, help="Deadline in seconds for each post")
+    parser.add_argument('--batch-timeout', type=float, help="Deadline in seconds for the whole batch")
+    parser.add_argument('--rate-limit', type=float, help="Maximum OpenRouter requests per second (e.g. 0.33 for 20/min)")
+    parser.add_argument('--model', action='append', dest='models', metavar='MODEL',
+                        help="OpenRouter model to route between (repeat for a pool; defaults to the free DeepSeek model)")
+    parser.add_argument('--hedge', action='store_true', help="Race slow requests against the next fastest model")
+    parser.add_argument('--single-call', action='store_true',
+                        help="Request the post and image suggestions as one JSON completion")
+    parser.add_argument('--metrics', metavar='PATH', help="Write run metrics to PATH (.json for JSON, otherwise Prometheus text)")
+    parser.add_argument('--profile', nargs='?', const='timers', metavar='OPTIONS',
+                        help="Time each generation stage and print a report; add cprofile and/or tracemalloc "
+                             "(comma-separated) to sample those too")
+    parser.add_argument('--profile-output', metavar='PATH', help="Also write the profile report to PATH as JSON")
+    parser.add_argument('--submit', metavar='SPECS', help="Queue a CSV or JSONL file of post specs for job workers")
+    parser.add_argument('--workers', type=int, metavar='N', help="Run N job worker processes for queued posts")
+    parser.add_argument('--drain', action='store_true', help="Stop the workers once the queue is empty")
+    args = parser.parse_args()
+
     # Check for API key
-    if not os.getenv('OPENROUTER_API_KEY'):
+    if not get_config()['api_key']:
         print("Warning: OPENROUTER_API_KEY not found in environment variables.")
         print("Please create a .env file with your OpenRouter API key.")
         print("Example .env file content:")
         print("OPENROUTER_API_KEY=your-api-key-here")
         return
 
-    generator = SocialMediaPostGenerator()
+    options = {'rate_limit': args.rate_limit, 'models': args.models, 'hedge': args.hedge,
+               'single_call': args.single_call}
+    generator = SocialMediaPostGenerator(profile=args.profile, **options)
+    
+    if args.submit or args.workers:
+        if args.submit:
+            submit_batch(generator, load_batch_specs(args.submit))
+        if args.workers:
+            run_workers(args.workers, options, args.drain)
+            print(f"Workers stopped: {generator.job_queue.counts()}")
+        return
+    
+    if args.batch:
+        specs = load_batch_specs(args.batch)
+        asyncio.run(run_batch(generator, specs, args.output, args.concurrency, args.request_timeout, args.batch_timeout))
+        generator.token_budget.save()
+        if args.metrics:
+            write_metrics(generator, args.metrics)
+        if generator.profiler is not None:
+            write_profile(generator, args.profile_output)
+        return
     
     # Example usage
     topic = input("Enter your topic: ")
@@ -461,6 +1200,7 @@ def main():
     language = input("Enter language (EN/BM): ")
     
     result = generator.generate_post(topic, length, platform, tone, language)
+    generator.token_budget.save()
     
     print("\nGenerated Post:")
     print("=" * 50)
@@ -469,6 +1209,8 @@ def main():
     print("=" * 50)
     for i, suggestion in enumerate(result['image_suggestions'], 1):
         print(f"{i}. {suggestion}")
+    if generator.profiler is not None:
+        write_profile(generator, args.profile_output)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
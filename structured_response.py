@@ -0,0 +1,113 @@
+import json
+import re
+from typing import Dict, List, Optional
+
+_FENCE = re.compile(r"^```[a-zA-Z]*\s*|\s*```\s*$")
+_POST_FIELD = re.compile(r'"post"\s*:\s*"((?:[^"\\]|\\.)*)', re.DOTALL)
+_TRAILING_STRING = re.compile(r'"(?:[^"\\]|\\.)*"$')
+_TRAILING_KEY = re.compile(r'[{,]\s*"(?:[^"\\]|\\.)*"$')
+_CLOSERS = {'{': '}', '[': ']'}
+# Whitespace before a '#' separates tags; other whitespace is part of a multi-word tag
+_TAG_SEPARATOR = re.compile(r"\s+(?=#)")
+
+
+def _repair(text: str) -> str:
+    """Close the strings, arrays and objects left open by a truncated JSON document."""
+    stack = []
+    in_string = escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+        elif char in '}]' and stack:
+            stack.pop()
+
+    if in_string:
+        text = (text[:-1] if escaped else text) + '"'
+    # A dangling comma, colon or object key can't be completed, so cut back to the last full value
+    text = text.rstrip()
+    while True:
+        if text.endswith(','):
+            text = text[:-1].rstrip()
+        elif text.endswith(':'):
+            text = _TRAILING_STRING.sub('', text[:-1].rstrip()).rstrip()
+        elif stack and stack[-1] == '}' and _TRAILING_KEY.search(text):
+            text = _TRAILING_STRING.sub('', text).rstrip()
+        else:
+            return text + ''.join(reversed(stack))
+
+
+def _load_object(text: str) -> Optional[Dict]:
+    start = text.find('{')
+    if start == -1:
+        return None
+    text = text[start:]
+    # Models often put raw newlines inside strings, which strict JSON rejects
+    decoder = json.JSONDecoder(strict=False)
+    for candidate in (text, _repair(text)):
+        try:
+            value, _ = decoder.raw_decode(candidate)
+        except ValueError:
+            continue
+        if isinstance(value, dict):
+            return value
+    return None
+
+
+def _strings(value, limit: Optional[int]) -> List[str]:
+    if isinstance(value, str):
+        value = re.split(r"[\n,]", value)
+    if not isinstance(value, list):
+        return []
+    return [item.strip() for item in value if isinstance(item, str) and item.strip()][:limit]
+
+
+def _hashtag(tag: str) -> str:
+    return "#" + re.sub(r"[^\w]", "", tag.lstrip('#'))
+
+
+def _hashtags(value, limit: int) -> List[str]:
+    """Hashtags from a list or delimited string: "#a #b" is two tags, "Start Small" becomes "#StartSmall"."""
+    tags = [_hashtag(tag) for item in _strings(value, None) for tag in _TAG_SEPARATOR.split(item)]
+    return [tag for tag in tags if len(tag) > 1][:limit]
+
+
+def parse_structured_post(text: str, max_image_suggestions: int = 2, max_hashtags: int = 5) -> Optional[Dict]:
+    """Parse a combined post/hashtags/image suggestions completion.
+
+    Accepts the JSON object wrapped in code fences or chatter, with trailing
+    text, or cut off by the token limit. Returns a dict with 'post',
+    'hashtags' and 'image_suggestions' (the lists may be empty), or None if no
+    post body can be recovered.
+    """
+    text = _FENCE.sub("", text.strip())
+    data = _load_object(text)
+    if data is None:
+        # Last resort: pull the post string out of a document too broken to decode
+        match = _POST_FIELD.search(text)
+        if not match:
+            return None
+        # Drop a half-written escape sequence before decoding the string
+        body = re.sub(r'\\(u[0-9a-fA-F]{0,3})?$', '', match.group(1))
+        try:
+            post = json.loads(f'"{body}"', strict=False)
+        except ValueError:
+            return None
+        data = {'post': post}
+
+    post = data.get('post')
+    if not isinstance(post, str) or not post.strip():
+        return None
+    return {
+        'post': post.strip(),
+        'hashtags': _hashtags(data.get('hashtags'), max_hashtags),
+        'image_suggestions': _strings(data.get('image_suggestions'), max_image_suggestions)
+    }
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from stub_server import start_stub_server
+
+
+@pytest.fixture
+def stub():
+    """Start stub OpenRouter servers for a test: stub(**options) returns (server, api_base)."""
+    servers = []
+
+    def start(**options):
+        server, api_base = start_stub_server(**options)
+        servers.append(server)
+        return server, api_base
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
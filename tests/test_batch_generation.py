@@ -0,0 +1,40 @@
+import asyncio
+import contextlib
+import io
+import time
+
+from metrics import MetricsRegistry
+from openrouter_client import OpenRouterClient
+from social_media_generator import SocialMediaPostGenerator
+
+SPECS = [{'topic': f"Batch post {index}", 'length': 'short', 'platform': 'Twitter', 'tone': 'Friendly'}
+         for index in range(3)]
+
+
+def run_batch(generator, **options):
+    async def collect():
+        return [item async for item in generator.agenerate_batch(SPECS, **options)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        return asyncio.run(collect())
+
+
+def test_post_past_its_deadline_is_an_error_and_not_saved(stub, tmp_path):
+    server, api_base = stub(latency=2.0)
+    generator = SocialMediaPostGenerator(history_path=str(tmp_path / "history.db"), token_stats_path=None,
+                                         metrics=MetricsRegistry())
+    generator.client = OpenRouterClient(api_base, 'stub-key', scheduler=generator.client.scheduler)
+    try:
+        items = run_batch(generator, concurrency=3, request_timeout=0.5)
+        assert all('error' in item for item in items), items
+        # Let the abandoned posts finish in the background; they must not reach the history
+        time.sleep(0.5)
+        assert generator.get_history(10) == []
+
+        server.configure(latency=0.0)
+        items = run_batch(generator, concurrency=3, request_timeout=5.0)
+        saved = {post['metadata']['topic'] for post in generator.get_history(10)}
+        assert saved == {item['spec']['topic'] for item in items if 'result' in item}
+        assert len(saved) == len(SPECS)
+    finally:
+        generator.client.close()
+        generator.history_store.close()
@@ -0,0 +1,191 @@
+import time
+
+import pytest
+import requests
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from metrics import MetricsRegistry
+from model_router import ModelRouter
+from openrouter_client import OpenRouterClient
+from rate_limiter import QueueTimeout
+
+REQUEST = {'messages': [{'role': 'user', 'content': 'Write a post'}], 'max_tokens': 50}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def breaker(clock: Clock, **options) -> CircuitBreaker:
+    options = {'min_calls': 4, 'window': 10, 'open_seconds': 5.0, 'metrics': MetricsRegistry(), **options}
+    return CircuitBreaker('model', clock=clock, **options)
+
+
+def test_opens_half_opens_and_closes():
+    clock = Clock()
+    circuit = breaker(clock, probes=2)
+    for ok in (True, True, False, False):
+        circuit.record(ok, circuit.allow())
+    assert circuit.state == OPEN
+    assert circuit.allow() is None
+
+    clock.now = 5.0
+    assert circuit.available() and circuit.state == HALF_OPEN
+    probes = [circuit.allow(), circuit.allow()]
+    assert None not in probes and circuit.allow() is None
+    circuit.record(True, probes[0])
+    assert circuit.state == HALF_OPEN
+    circuit.record(True, probes[1])
+    assert circuit.state == CLOSED
+    assert circuit.stats()['recent_calls'] == 0
+
+
+def test_failed_probe_reopens():
+    clock = Clock()
+    circuit = breaker(clock)
+    for _ in range(4):
+        circuit.record(False, circuit.allow())
+    clock.now = 5.0
+    circuit.record(False, circuit.allow())
+    assert circuit.state == OPEN
+    assert circuit.retry_in() == 5.0
+
+
+def test_late_results_from_before_the_circuit_opened_do_not_decide_the_probe():
+    clock = Clock()
+    circuit = breaker(clock)
+    # Sent while closed, but only answers after the circuit has opened and gone half-open
+    slow = [circuit.allow() for _ in range(2)]
+    for _ in range(4):
+        circuit.record(False, circuit.allow())
+    assert circuit.state == OPEN
+
+    clock.now = 5.0
+    probe = circuit.allow()
+    assert circuit.state == HALF_OPEN
+    circuit.record(False, slow[0])
+    assert circuit.state == HALF_OPEN
+    circuit.record(True, probe)
+    assert circuit.state == CLOSED
+    circuit.record(False, slow[1])
+    assert circuit.stats()['recent_failures'] == 0
+
+
+def test_lost_probe_frees_its_place():
+    clock = Clock()
+    circuit = breaker(clock)
+    for _ in range(4):
+        circuit.record(False, circuit.allow())
+    clock.now = 5.0
+    assert circuit.allow() is not None
+    assert circuit.allow() is None
+    clock.now = 10.0
+    assert circuit.allow() is not None
+
+
+@pytest.fixture
+def routed(stub):
+    """Start a stub server and return a factory for routers in front of it, with short windows and open times."""
+    server, api_base = stub()
+    client = OpenRouterClient(api_base, 'stub-key', max_retries=0)
+
+    def route(models, open_seconds: float):
+        registry = MetricsRegistry()
+        router = ModelRouter(models, min_calls=2, failure_window=4, open_seconds=open_seconds, metrics=registry)
+
+        def complete(timeout: float = 5.0):
+            return router.complete(lambda payload, remaining: client.chat_completion(payload, timeout=remaining),
+                                   REQUEST, timeout)
+
+        return router, complete, registry
+
+    yield server, route
+    client.close()
+
+
+def circuit_states(router: ModelRouter) -> dict:
+    return {model: stats['circuit']['state'] for model, stats in router.stats().items()}
+
+
+def test_error_outage_opens_every_circuit_and_recovery_closes_them(routed):
+    server, route = routed
+    router, complete, registry = route(['model-a', 'model-b'], open_seconds=0.5)
+    server.configure(error_rate=1.0)
+    for _ in range(4):
+        assert complete()[0].status_code == 500
+    assert circuit_states(router) == {'model-a': OPEN, 'model-b': OPEN}
+
+    with pytest.raises(CircuitOpenError):
+        complete()
+    assert server.requests_failed == 4
+
+    server.configure()
+    time.sleep(0.6)
+    for _ in range(2):
+        assert complete()[0].status_code == 200
+    assert circuit_states(router) == {'model-a': CLOSED, 'model-b': CLOSED}
+    assert server.requests_served == 2
+    transitions = {(item['labels']['model'], item['labels']['state']): item['value']
+                   for item in registry.snapshot()['counters']['circuit_transitions_total']}
+    assert transitions == {(model, state): 1 for model in ('model-a', 'model-b') for state in (OPEN, HALF_OPEN, CLOSED)}
+
+
+def test_timeouts_open_the_circuit_and_a_failed_probe_reopens_it(routed):
+    server, route = routed
+    router, complete, _ = route(['model-a'], open_seconds=1.5)
+    server.configure(latency=1.5)
+    for _ in range(2):
+        with pytest.raises(requests.Timeout):
+            complete(timeout=1.0)
+    assert circuit_states(router) == {'model-a': OPEN}
+    with pytest.raises(CircuitOpenError):
+        complete(timeout=1.0)
+
+    time.sleep(1.6)
+    with pytest.raises(requests.Timeout):
+        complete(timeout=1.0)
+    assert circuit_states(router) == {'model-a': OPEN}
+    with pytest.raises(CircuitOpenError):
+        complete(timeout=1.0)
+
+
+def test_rate_limited_burst_does_not_open_the_circuit(stub):
+    server, api_base = stub(rate_limit=1, window=30.0)
+    client = OpenRouterClient(api_base, 'stub-key', max_retries=0)
+    router = ModelRouter(['model-a'], min_calls=2, failure_window=4, metrics=MetricsRegistry())
+
+    def complete(timeout: float):
+        return router.complete(lambda payload, remaining: client.chat_completion(payload, timeout=remaining),
+                               REQUEST, timeout)
+
+    try:
+        assert complete(5.0)[0].status_code == 200
+        # The quota is used up for 30s: too long to wait, so the 429 comes back
+        assert complete(5.0)[0].status_code == 429
+        # Meanwhile the scheduler holds requests back until they time out in its queue
+        for _ in range(3):
+            with pytest.raises(QueueTimeout):
+                complete(0.2)
+        assert server.requests_limited == 1
+        assert server.requests_served == 1
+        circuit = router.stats()['model-a']['circuit']
+        assert circuit['state'] == CLOSED
+        assert (circuit['recent_calls'], circuit['recent_failures']) == (1, 0)
+    finally:
+        client.close()
+
+
+def test_rate_limited_probe_frees_its_place():
+    clock = Clock()
+    circuit = breaker(clock)
+    for _ in range(4):
+        circuit.record(False, circuit.allow())
+    clock.now = 5.0
+    circuit.release(circuit.allow())
+    assert circuit.state == HALF_OPEN
+    circuit.record(True, circuit.allow())
+    assert circuit.state == CLOSED
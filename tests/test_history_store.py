@@ -0,0 +1,77 @@
+import contextlib
+import io
+import json
+
+import pytest
+
+from history_store import HistoryStore
+
+
+def post(topic: str, platform: str = 'Twitter', timestamp: str = '2024-05-01T09:00:00') -> dict:
+    return {'content': f"A post about {topic}", 'hashtags': [], 'image_suggestions': [], 'timestamp': timestamp,
+            'metadata': {'topic': topic, 'length': 'short', 'platform': platform, 'tone': 'Friendly',
+                         'language': 'EN'}}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"), legacy_path=None)
+    yield store
+    store.close()
+
+
+def test_legacy_json_history_is_imported_once(tmp_path):
+    legacy_path = tmp_path / "post_history.json"
+    legacy_path.write_text(json.dumps([post("Morning runs"), post("Evening walks")]), encoding='utf-8')
+    path = str(tmp_path / "history.db")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        store = HistoryStore(path, legacy_path=str(legacy_path))
+    assert [item['metadata']['topic'] for item in store.all()] == ["Morning runs", "Evening walks"]
+    store.close()
+
+    # Opening the store again, even after the file changed, doesn't import it a second time
+    legacy_path.write_text(json.dumps([post("Morning runs"), post("Evening walks"), post("Lunch")]), encoding='utf-8')
+    store = HistoryStore(path, legacy_path=str(legacy_path))
+    assert store.count() == 2
+    store.close()
+
+
+def test_cursor_pages_through_every_post_once(store):
+    for day in range(1, 26):
+        store.append(post(f"Topic {day}", timestamp=f"2024-05-{day:02d}T09:00:00"))
+
+    topics, cursor, pages = [], None, 0
+    while True:
+        page = store.query(limit=10, cursor=cursor)
+        topics += [item['metadata']['topic'] for item in page['posts']]
+        pages += 1
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert pages == 3
+    assert topics == [f"Topic {day}" for day in range(25, 0, -1)]
+
+    # Posts added while paging don't shift the pages that follow
+    first = store.query(limit=10)
+    store.append(post("Topic 26"))
+    second = store.query(limit=10, cursor=first['next_cursor'])
+    assert second['posts'][0]['metadata']['topic'] == "Topic 15"
+
+
+def test_topic_filter_matches_any_part_ignoring_case(store):
+    for topic in ("Healthy breakfast ideas", "Breakfast for busy parents", "Budget travel", "Tea_time"):
+        store.append(post(topic))
+    store.append(post("BREAKFAST smoothies", platform='LinkedIn'))
+
+    def topics(**filters):
+        return [item['metadata']['topic'] for item in store.query(**filters)['posts']]
+
+    # Through the trigram index
+    assert topics(topic='breakfast') == ["BREAKFAST smoothies", "Breakfast for busy parents",
+                                         "Healthy breakfast ideas"]
+    assert topics(topic='breakfast', platform='Twitter') == ["Breakfast for busy parents", "Healthy breakfast ideas"]
+    assert store.count(topic='eakf') == 3
+    # Too short for a trigram, or with LIKE wildcards, it falls back to a plain scan
+    assert topics(topic='tr') == ["Budget travel"]
+    assert topics(topic='a_t') == ["Tea_time"]
@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+from job_queue import CANCELLED, DONE, FAILED, QUEUED, RUNNING, JobQueue, JobWorker
+
+SPEC = {'topic': "Job queues", 'length': 'short', 'platform': 'Twitter', 'tone': 'Friendly'}
+
+
+class FakeGenerator:
+    """Stands in for SocialMediaPostGenerator: on_generate runs mid-generation, saved lists the saved posts."""
+
+    def __init__(self, on_generate=None):
+        self.on_generate = on_generate
+        self.saved = []
+
+    def generate_post(self, **options):
+        if self.on_generate:
+            self.on_generate()
+        return {'content': f"A post about {options['topic']}", 'metadata': {}}
+
+    def _save_history(self, post):
+        self.saved.append(post)
+        return len(self.saved)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), lease=0.2, backoff=0.5)
+    yield queue
+    queue.close()
+
+
+def test_job_is_claimed_again_once_its_lease_runs_out(queue):
+    job_id = queue.submit(SPEC)
+    assert queue.claim('worker-1')['id'] == job_id
+    assert queue.claim('worker-2') is None
+    time.sleep(0.3)
+    job = queue.claim('worker-2')
+    assert (job['id'], job['attempts'], job['worker']) == (job_id, 2, 'worker-2')
+
+
+def test_failed_attempt_backs_off_until_out_of_attempts(queue):
+    job_id = queue.submit(SPEC, max_attempts=2)
+    queue.claim('worker')
+    before = time.time()
+    assert queue.fail(job_id, "first")
+    job = queue.poll(job_id)
+    assert job['status'] == QUEUED
+    assert before + 0.5 * 0.8 <= job['run_after'] <= time.time() + 0.5 * 1.2
+    assert queue.claim('worker') is None
+
+    time.sleep(job['run_after'] - time.time() + 0.05)
+    assert queue.claim('worker')['attempts'] == 2
+    assert queue.fail(job_id, "second")
+    job = queue.poll(job_id)
+    assert (job['status'], job['error']) == (FAILED, "second")
+
+
+def test_idempotency_key_returns_the_first_job(queue):
+    job_id = queue.submit(SPEC, idempotency_key='post-1')
+    assert queue.submit(dict(SPEC, topic="Something else"), idempotency_key='post-1') == job_id
+    assert queue.submit(SPEC, idempotency_key='post-2') != job_id
+    assert queue.counts() == {QUEUED: 2}
+
+
+def test_post_is_not_saved_when_cancelled_while_running(queue):
+    job_id = queue.submit(SPEC)
+    generator = FakeGenerator(on_generate=lambda: queue.cancel(job_id))
+    assert JobWorker(queue, generator).run_once()
+    assert queue.poll(job_id)['status'] == CANCELLED
+    assert generator.saved == []
+
+
+def test_finished_job_points_at_its_post(queue):
+    job_id = queue.submit(SPEC)
+    generator = FakeGenerator()
+    JobWorker(queue, generator).run(drain=True)
+    job = queue.poll(job_id)
+    assert (job['status'], job['post_id'], job['attempts']) == (DONE, 1, 1)
+
+
+def test_interrupted_worker_puts_the_job_back(queue):
+    job_id = queue.submit(SPEC)
+
+    def interrupt():
+        assert queue.poll(job_id)['status'] == RUNNING
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        JobWorker(queue, FakeGenerator(on_generate=interrupt)).run_once()
+    job = queue.poll(job_id)
+    assert (job['status'], job['attempts'], job['worker']) == (QUEUED, 0, None)
+    assert queue.claim('worker')['id'] == job_id
@@ -0,0 +1,32 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from openrouter_client import OpenRouterClient
+
+REQUEST = {'model': 'stub', 'messages': [{'role': 'user', 'content': 'Write a post'}], 'max_tokens': 50}
+
+
+def test_sequential_requests_reuse_one_connection(stub):
+    server, api_base = stub()
+    client = OpenRouterClient(api_base, 'stub-key')
+    try:
+        for _ in range(10):
+            assert client.chat_completion(REQUEST, timeout=5).status_code == 200
+        assert client.connection_stats() == {'requests': 10, 'new_connections': 1, 'reused_connections': 9}
+        assert server.requests_served == 10
+    finally:
+        client.close()
+
+
+def test_concurrent_requests_stay_within_the_pool(stub):
+    server, api_base = stub(latency=0.05)
+    client = OpenRouterClient(api_base, 'stub-key', pool_size=4)
+    try:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            statuses = list(pool.map(lambda _: client.chat_completion(REQUEST, timeout=5).status_code, range(40)))
+        assert statuses == [200] * 40
+        stats = client.connection_stats()
+        assert stats['requests'] == 40
+        assert stats['new_connections'] <= 4
+        assert stats['reused_connections'] >= 36
+    finally:
+        client.close()
@@ -0,0 +1,126 @@
+import contextlib
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from metrics import MetricsRegistry
+from openrouter_client import OpenRouterClient
+from rate_limiter import PRIORITY_BATCH, PRIORITY_INTERACTIVE, RequestScheduler, parse_retry_after
+from social_media_generator import SocialMediaPostGenerator
+
+REQUEST = {'model': 'stub', 'messages': [{'role': 'user', 'content': 'Write a post'}], 'max_tokens': 50}
+RATE_LIMIT = 10
+POSTS = 20
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('2') == 2.0
+    assert parse_retry_after('-1') == 0.0
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+
+
+def test_429_is_requeued_after_retry_after(stub):
+    server, api_base = stub(rate_limit=1, window=1.0)
+    client = OpenRouterClient(api_base, 'stub-key')
+    try:
+        assert client.chat_completion(REQUEST, timeout=5).status_code == 200
+        start = time.monotonic()
+        response = client.chat_completion(REQUEST, timeout=5)
+        elapsed = time.monotonic() - start
+        assert response.status_code == 200
+        assert server.requests_limited == 1
+        assert server.requests_served == 2
+        # The stub asks for at least a second; the request waits it out before going again
+        assert elapsed >= 0.9
+        stats = client.scheduler.stats()
+        assert stats['rate_limited'] == 1
+        assert stats['concurrency_decreases'] == 1
+    finally:
+        client.close()
+
+
+def test_429_is_returned_when_the_wait_would_outlast_the_timeout(stub):
+    server, api_base = stub(rate_limit=1, window=1.0)
+    client = OpenRouterClient(api_base, 'stub-key')
+    try:
+        assert client.chat_completion(REQUEST, timeout=5).status_code == 200
+        assert client.chat_completion(REQUEST, timeout=1.5).status_code == 429
+        assert server.requests_limited == 1
+        assert client.scheduler.resume_at() > time.monotonic()
+    finally:
+        client.close()
+
+
+def test_interactive_requests_go_ahead_of_batch_after_a_pause(stub):
+    server, api_base = stub(latency=0.1, rate_limit=2, window=1.0)
+    client = OpenRouterClient(api_base, 'stub-key', scheduler=RequestScheduler(max_concurrency=1))
+    finished = []
+
+    def send(name: str, priority: int):
+        assert client.chat_completion(REQUEST, timeout=10, priority=priority).status_code == 200
+        finished.append(name)
+
+    try:
+        client.chat_completion(REQUEST, timeout=5)
+        client.chat_completion(REQUEST, timeout=5)
+        # Used up the quota: this 429 can't be waited out in time, so it only pauses the scheduler
+        assert client.chat_completion(REQUEST, timeout=1.5).status_code == 429
+        threads = []
+        for name, priority in (('batch', PRIORITY_BATCH), ('interactive', PRIORITY_INTERACTIVE)):
+            thread = threading.Thread(target=send, args=(name, priority))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.1)
+        for thread in threads:
+            thread.join(10)
+        assert finished == ['interactive', 'batch']
+    finally:
+        client.close()
+
+
+def test_retry_after_zero_still_pauses():
+    scheduler = RequestScheduler(min_pause=0.5)
+    start = time.monotonic()
+    scheduler.observe(429, {'Retry-After': '0'})
+    assert scheduler.resume_at() >= start + 0.5
+
+
+def test_request_finishes_within_its_timeout(stub):
+    server, api_base = stub(latency=1.5)
+    client = OpenRouterClient(api_base, 'stub-key', max_retries=0)
+    try:
+        start = time.monotonic()
+        with pytest.raises(requests.Timeout):
+            client.chat_completion(REQUEST, timeout=0.4)
+        assert time.monotonic() - start < 0.7
+    finally:
+        client.close()
+
+
+def test_posts_under_a_rate_limit_wait_instead_of_falling_back(stub, tmp_path):
+    server, api_base = stub(rate_limit=RATE_LIMIT, window=1.0)
+    generator = SocialMediaPostGenerator(history_path=str(tmp_path / "history.db"), token_stats_path=None,
+                                         metrics=MetricsRegistry())
+    generator.client = OpenRouterClient(api_base, 'stub-key', scheduler=generator.client.scheduler)
+    try:
+        start = time.monotonic()
+        with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=8) as pool:
+            posts = list(pool.map(lambda i: generator.generate_post(f"rate limits {i}", 'short', 'Twitter', 'Friendly'),
+                                  range(POSTS)))
+        elapsed = time.monotonic() - start
+    finally:
+        generator.client.close()
+        generator.history_store.close()
+
+    fallback_ratio = sum(bool(post['metadata'].get('fallback')) for post in posts) / POSTS
+    assert fallback_ratio == 0
+    assert server.requests_limited > 0
+    # Every post is a post request and an image request; the quota allows RATE_LIMIT of them a second
+    throughput = server.requests_served / elapsed
+    assert throughput >= RATE_LIMIT * 0.5, f"{throughput:.1f} requests/s against a limit of {RATE_LIMIT}/s"
@@ -0,0 +1,66 @@
+import contextlib
+import io
+import time
+
+from metrics import MetricsRegistry
+from openrouter_client import OpenRouterClient
+from response_cache import ResponseCache
+from social_media_generator import SocialMediaPostGenerator
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.set('a', "first")
+    cache.set('b', "second")
+    assert cache.get('a') == "first"
+    cache.set('c', "third")
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == ("first", "third")
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = ResponseCache(ttl=0.1)
+    cache.set('a', "first")
+    assert cache.get('a') == "first"
+    time.sleep(0.15)
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_zero_ttl_turns_caching_off():
+    cache = ResponseCache(ttl=0)
+    cache.set('a', "first")
+    assert cache.get('a') is None
+    assert cache.stats()['memory_entries'] == 0
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    ResponseCache(path=path).set('a', "first")
+
+    cache = ResponseCache(path=path)
+    assert cache.get('a') == "first"
+    assert cache.stats()['disk_hits'] == 1
+    # Now in memory too
+    assert cache.get('a') == "first"
+    assert cache.stats()['memory_hits'] == 1
+
+
+def test_fresh_post_bypasses_the_cache(stub, tmp_path):
+    server, api_base = stub()
+    generator = SocialMediaPostGenerator(history_path=str(tmp_path / "history.db"), token_stats_path=None,
+                                         metrics=MetricsRegistry())
+    generator.client = OpenRouterClient(api_base, 'stub-key', scheduler=generator.client.scheduler)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            generator.generate_post("Caching", 'short', 'Twitter', 'Friendly', save=False)
+            served = server.requests_served
+            generator.generate_post("Caching", 'short', 'Twitter', 'Friendly', save=False)
+            assert server.requests_served == served
+            generator.generate_post("Caching", 'short', 'Twitter', 'Friendly', fresh=True, save=False)
+    finally:
+        generator.client.close()
+        generator.history_store.close()
+    # The post and its image suggestions are both asked for again
+    assert server.requests_served == served + 2
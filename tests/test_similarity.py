@@ -0,0 +1,40 @@
+import pytest
+
+from metrics import MetricsRegistry
+from social_media_generator import SocialMediaPostGenerator
+
+BODY = "Small steps every morning add up. Keep going, because progress takes patience and courage."
+
+
+def post(content: str, topic: str = 'habits') -> dict:
+    return {'content': content, 'image_suggestions': [], 'hashtags': [], 'timestamp': '2024-01-01T00:00:00',
+            'metadata': {'topic': topic, 'length': 'short', 'platform': 'Twitter', 'tone': 'Friendly',
+                         'language': 'EN'}}
+
+
+@pytest.fixture
+def generator(tmp_path):
+    generator = SocialMediaPostGenerator(history_path=str(tmp_path / "history.db"), token_stats_path=None,
+                                         metrics=MetricsRegistry())
+    yield generator
+    generator.history_store.close()
+
+
+def test_stored_post_matches_itself(generator):
+    stored = post(f"{BODY}\n\nFollow for more daily tips! 👉")
+    post_id = generator._save_history(stored)
+    generator._save_history(post("Something else entirely: a recipe for a quick weeknight curry with rice.", 'food'))
+
+    matches = generator.find_similar(generator.history_store.get(post_id))
+    assert [(match['id'], match['distance'], match['similarity']) for match in matches] == [(post_id, 0, 1.0)]
+
+
+def test_post_with_another_cta_matches(generator):
+    post_id = generator._save_history(post(f"{BODY}\n\nFollow for more daily tips! 👉"))
+    matches = generator.find_similar(post(f"{BODY}\n\nSave this and share it with a friend 💬"))
+    assert [match['id'] for match in matches] == [post_id]
+
+
+def test_draft_text_matches(generator):
+    post_id = generator._save_history(post(f"{BODY}\n\nFollow for more daily tips! 👉"))
+    assert [match['id'] for match in generator.find_similar(BODY)] == [post_id]
@@ -0,0 +1,68 @@
+import contextlib
+import io
+
+from metrics import MetricsRegistry
+from openrouter_client import OpenRouterClient
+from prompt_templates import DEFAULT_TEMPLATES_PATH, PromptTemplates
+from social_media_generator import SocialMediaPostGenerator
+from structured_response import parse_structured_post
+
+
+def single_call_generator(api_base, tmp_path):
+    generator = SocialMediaPostGenerator(history_path=str(tmp_path / "history.db"), token_stats_path=None,
+                                         metrics=MetricsRegistry(), single_call=True)
+    generator.client = OpenRouterClient(api_base, 'stub-key', scheduler=generator.client.scheduler)
+    return generator
+
+
+def test_hashtags_separated_by_spaces_stay_separate():
+    parsed = parse_structured_post('{"post": "Hello", "hashtags": "#a #b"}')
+    assert parsed['hashtags'] == ['#a', '#b']
+    parsed = parse_structured_post('{"post": "Hello", "hashtags": ["#Start #Small", "#KeepGoing"]}')
+    assert parsed['hashtags'] == ['#Start', '#Small', '#KeepGoing']
+
+
+def test_hashtag_phrases_and_delimiters():
+    parsed = parse_structured_post('{"post": "Hello", "hashtags": "Start Small, #keep-going\\n#, #Today"}')
+    assert parsed['hashtags'] == ['#StartSmall', '#keepgoing', '#Today']
+
+
+def test_hashtags_are_capped_after_splitting():
+    parsed = parse_structured_post('{"post": "Hello", "hashtags": "#a #b #c #d #e #f #g"}', max_hashtags=3)
+    assert parsed['hashtags'] == ['#a', '#b', '#c']
+
+
+def test_truncated_response_keeps_the_post():
+    parsed = parse_structured_post('```json\n{"post": "Keep going.", "hashtags": ["#a", "#b')
+    assert parsed == {'post': 'Keep going.', 'hashtags': ['#a', '#b'], 'image_suggestions': []}
+
+
+def test_unparseable_structured_response_is_not_cached(stub, tmp_path):
+    server, api_base = stub(malformed=1.0)
+    generator = single_call_generator(api_base, tmp_path)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            generator.generate_post("Cache checks", 'short', 'Twitter', 'Friendly', save=False)
+            served = server.requests_served
+            generator.generate_post("Cache checks", 'short', 'Twitter', 'Friendly', save=False)
+    finally:
+        generator.client.close()
+        generator.history_store.close()
+    # The separate post and image requests come from the cache, the broken structured one is asked again
+    assert server.requests_served == served + 1
+
+
+def test_campaign_counts_requests_made_without_a_structured_template(stub, tmp_path):
+    server, api_base = stub()
+    generator = single_call_generator(api_base, tmp_path)
+    generator.prompts = PromptTemplates.load(DEFAULT_TEMPLATES_PATH)
+    del generator.prompts.templates['structured_post']
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = generator.generate_campaign("Request counts", 'short', 'Friendly',
+                                                 platforms=['Twitter', 'LinkedIn'])['requests']
+    finally:
+        generator.client.close()
+        generator.history_store.close()
+    assert report['made'] == server.requests_served
+    assert report['independent'] == 4
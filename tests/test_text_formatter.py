@@ -0,0 +1,35 @@
+from text_formatter import SentenceSegmenter, format_post
+
+
+def sentences(text: str, chunk_size: int = 0):
+    segmenter = SentenceSegmenter()
+    segments = []
+    if chunk_size:
+        for start in range(0, len(text), chunk_size):
+            segments += segmenter.feed(text[start:start + chunk_size])
+    else:
+        segments += segmenter.feed(text)
+    return [segment.text for segment in segments + segmenter.flush()]
+
+
+def test_dotted_initials_do_not_end_a_sentence():
+    text = "U.S. policy changed in 2020. Markets open at 9 a.m. sharp. Ask J. K. Rowling!"
+    expected = ["U.S. policy changed in 2020.", "Markets open at 9 a.m. sharp.", "Ask J. K. Rowling!"]
+    assert sentences(text) == expected
+    assert sentences(text, chunk_size=3) == expected
+
+
+def test_dotted_initials_end_a_sentence_before_a_capital():
+    assert sentences("She moved to the U.S. Then she started a company.") == [
+        "She moved to the U.S.", "Then she started a company."]
+
+
+def test_titles_and_numbered_items():
+    assert sentences("Dr. Tan says hi. 1. Drink water\n2. Sleep early") == [
+        "Dr. Tan says hi.", "1. Drink water", "2. Sleep early"]
+
+
+def test_hashtags_in_the_text_past_the_cap_leave_no_room_for_more():
+    rules = {'hashtag_style': True, 'max_hashtags': 5}
+    text = "Love #alpha and #beta and #gamma today."
+    assert format_post(text, rules, hashtags=['#x', '#y', '#z'], max_hashtags=2) == text
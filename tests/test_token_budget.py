@@ -0,0 +1,48 @@
+import time
+
+import pytest
+import requests
+
+from metrics import MetricsRegistry
+from openrouter_client import OpenRouterClient
+from rate_limiter import QueueTimeout
+from social_media_generator import SocialMediaPostGenerator
+from token_budget import TokenBudget
+
+REQUEST = {'model': 'model-a', 'messages': [{'role': 'user', 'content': 'Write a post'}], 'max_tokens': 50}
+
+
+@pytest.fixture
+def slow_generator(stub, tmp_path):
+    """A generator over two models whose requests to the stub take longer than their one-second timeout."""
+    server, api_base = stub(latency=1.5)
+    generator = SocialMediaPostGenerator(history_path=str(tmp_path / "history.db"), token_stats_path=None,
+                                         metrics=MetricsRegistry(), models=['model-a', 'model-b'])
+    generator.client = OpenRouterClient(api_base, 'stub-key', max_retries=0)
+    generator.token_budget = TokenBudget(min_timeout=1.0, max_timeout=1.0)
+    yield generator
+    generator.client.close()
+    generator.history_store.close()
+
+
+def rates(generator) -> dict:
+    return {model: generator.token_budget.tokens_per_second(model) for model in generator.models}
+
+
+def test_read_timeout_slows_only_the_routed_model(slow_generator):
+    with pytest.raises(requests.ReadTimeout):
+        slow_generator._chat_completion(REQUEST, 1.0, use_cache=False)
+    assert rates(slow_generator) == {'model-a': 15.0, 'model-b': 30.0}
+
+
+def test_timeout_cut_short_by_the_deadline_is_not_held_against_the_model(slow_generator):
+    with pytest.raises(requests.Timeout):
+        slow_generator._chat_completion(REQUEST, 1.0, use_cache=False, deadline=time.perf_counter() + 0.5)
+    assert rates(slow_generator) == {'model-a': 30.0, 'model-b': 30.0}
+
+
+def test_queue_timeout_is_not_held_against_the_model(slow_generator):
+    slow_generator.client.scheduler.observe(429, {'Retry-After': '30'})
+    with pytest.raises(QueueTimeout):
+        slow_generator._chat_completion(REQUEST, 1.0, use_cache=False)
+    assert rates(slow_generator) == {'model-a': 30.0, 'model-b': 30.0}
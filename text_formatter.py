@@ -0,0 +1,436 @@
+import re
+from typing import Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional
+
+# Code point ranges for emoji and the marks that attach to them
+EMOJI = "\u2300-\u23FF\u2600-\u27BF\u2B00-\u2BFF\U0001F000-\U0001FAFF"
+EMOJI_MODIFIERS = "\uFE0E\uFE0F\u20E3\U0001F3FB-\U0001F3FF\U000E0020-\U000E007F"
+EMOJI_CLUSTER = (f"(?:[\U0001F1E6-\U0001F1FF]{{2}}"
+                 f"|[{EMOJI}][{EMOJI_MODIFIERS}]*(?:\u200D[{EMOJI}][{EMOJI_MODIFIERS}]*)*)")
+# Combining marks that belong to the preceding character in a grapheme
+COMBINING = ("\u0300-\u036F\u0483-\u0489\u0591-\u05BD\u0610-\u061A\u064B-\u065F\u0900-\u0903\u093A-\u094F"
+             "\u0E31\u0E34-\u0E3A\u0E47-\u0E4E\u1AB0-\u1AFF\u1DC0-\u1DFF\u20D0-\u20FF" + EMOJI_MODIFIERS)
+
+TERMINATORS = ".!?…"
+CLOSERS = "\"'”’)]»"
+
+# A sentence ends at terminal punctuation (plus closing quotes and trailing emoji)
+# followed by whitespace, at an emoji followed by whitespace and a capital letter,
+# or at a line break. Every match starts with one of _BOUNDARY_START, which is
+# searched for first: re tries the full pattern at every position otherwise.
+_BOUNDARY = re.compile(
+    rf"(?P<end>[{re.escape(TERMINATORS)}]++[{re.escape(CLOSERS)}]*+(?:[ \t]*{EMOJI_CLUSTER})*+|(?:{EMOJI_CLUSTER})++)(?P<gap>\s+)"
+    r"|(?P<newline>\n\s*)"
+)
+_BOUNDARY_START = re.compile(f"[{re.escape(TERMINATORS)}\n{EMOJI}]")
+_EMOJI_CLUSTER = re.compile(EMOJI_CLUSTER)
+_SPACES = re.compile(r" {2,}")
+_LOOSE_PUNCTUATION = re.compile(rf" ([,;:{re.escape(TERMINATORS)}])")
+_HASHTAG = re.compile(r"(?<![\w#])#\w+")
+_GRAPHEME = re.compile(f"\r\n|[\U0001F1E6-\U0001F1FF]{{2}}|.[{COMBINING}]*(?:\u200D.[{COMBINING}]*)*", re.DOTALL)
+_WORD = re.compile(r"[^\W\d_]+(?:['’][^\W\d_]+)*")
+_TAIL_CHARS = frozenset(TERMINATORS + CLOSERS + "\u200D\uFE0E\uFE0F\u20E3")
+
+# Abbreviations whose period never ends a sentence (English and Bahasa Malaysia titles)
+TITLES = frozenset("""
+    mr mrs ms dr prof sr jr st mt gen col capt lt sgt rev hon vs e.g i.e a.k.a approx dept fig
+    tn pn hj hjh en cik sdn bhd kpd spt mis yg dgn utk bil
+""".split())
+# Abbreviations that end a sentence only when a capital letter follows
+TRAILING_ABBREVIATIONS = frozenset("etc dll dsb inc ltd co corp".split())
+# Dotted initialisms such as "U.S." and "a.m.", without their last period
+_DOTTED_INITIALS = re.compile(r"(?:[^\W\d_]\.)+[^\W\d_]")
+
+# PostFormatter line_breaks styles; True and False are the older boolean setting
+LINE_BREAK_STYLES = ('paragraph', 'sentence', 'none')
+LINE_BREAK_ALIASES = {None: 'paragraph', False: 'paragraph', True: 'sentence'}
+
+# Length-capped formatters segment long input this many characters at a time
+FEED_SLICE = 1024
+
+STOPWORDS = frozenset("""
+    about above after again against also always another anyone anything around because been before being
+    below between both cant could couldnt didnt does doesnt doing dont down during each even ever every
+    everyone everything from further gets getting have having here heres hers herself himself into isnt
+    its itself just know like made make many more most much must myself need never nothing often only
+    other ours ourselves over same shall should some someone something such than that thats their theirs
+    them themselves then there theres these they theyll theyre theyve thing things this those through
+    under until very want wasnt were what whats when where which while whom whose will with without wont
+    would wouldnt your youre yours yourself yourselves youll youve
+    adalah agar akan antara atau bagi bahawa banyak begitu belum boleh bukan dalam dapat dengan dari
+    hanya hendak ialah iaitu jangan juga kalau kamu kami kepada kerana ketika kita lagi lebih macam mahu
+    masih memang mereka pada pernah perlu saja sahaja sangat saya sebab sebelum sedang sedikit selepas
+    semasa semua seperti setiap sikit sini situ sana sudah supaya tapi telah tentang terhadap tetapi
+    tidak untuk yang
+""".split())
+
+
+class Segment(NamedTuple):
+    """A sentence and the kind of break after it: 0 space, 1 line break, 2 paragraph break."""
+    text: str
+    break_after: int
+
+
+class SentenceSegmenter:
+    """Splits text into sentences in one pass, incrementally as chunks arrive.
+
+    feed() returns the sentences completed by a chunk; the unfinished tail is
+    kept until more text or flush() arrives. Knows about abbreviations and
+    initials, list numbering, '?', '!', '…', closing quotes, emoji used as
+    sentence ends and line breaks, in English and Bahasa Malaysia text.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._start = 0
+        self._scan = 0
+
+    def feed(self, chunk: str) -> List[Segment]:
+        """Add text and return the sentences it completed."""
+        self._buffer += chunk
+        return self._segments(final=False)
+
+    def flush(self) -> List[Segment]:
+        """Return the remaining sentence, treating the end of input as its end."""
+        segments = self._segments(final=True)
+        tail = self._buffer[self._start:].strip()
+        if tail:
+            segments.append(Segment(tail, 0))
+        self._buffer, self._start, self._scan = "", 0, 0
+        return segments
+
+    def _segments(self, final: bool) -> List[Segment]:
+        buffer = self._buffer
+        segments = []
+        for match in _boundaries(buffer, self._scan):
+            if match.end() == len(buffer) and not final:
+                # The gap may continue (or a capital letter may follow) in the next chunk
+                self._scan = match.start()
+                break
+            if match.group('newline') is not None:
+                text_end = match.start()
+                newlines = match.group('newline').count('\n')
+            else:
+                text_end = match.start('gap')
+                if not self._is_boundary(buffer, match):
+                    continue
+                newlines = match.group('gap').count('\n')
+            text = buffer[self._start:text_end].strip()
+            if text:
+                segments.append(Segment(text, min(newlines, 2)))
+            elif segments and newlines:
+                # Blank lines only widen the break after the previous sentence
+                segments[-1] = Segment(segments[-1].text, max(segments[-1].break_after, min(newlines, 2)))
+            self._start = match.end()
+        else:
+            # Rescan any trailing punctuation, emoji or space that may become a boundary
+            scan = len(buffer)
+            while scan > self._start and _is_tail_char(buffer[scan - 1]):
+                scan -= 1
+            self._scan = max(scan, self._start)
+
+        if self._start > 4096:
+            # Drop consumed text so long streams don't grow the buffer
+            self._buffer = buffer[self._start:]
+            self._scan -= self._start
+            self._start = 0
+        return segments
+
+    def _is_boundary(self, buffer: str, match: re.Match) -> bool:
+        end = match.group('end')
+        following = buffer[match.end():match.end() + 1]
+        if end[0] not in TERMINATORS:
+            # An emoji only ends a sentence when the next one starts with a capital
+            return following.isupper()
+        if end.startswith(('...', '…')):
+            # An ellipsis followed by lowercase trails off mid-sentence
+            return not following.islower()
+        if end[0] != '.':
+            return True
+
+        word_start = max(buffer.rfind(' ', self._start, match.start()), buffer.rfind('\n', self._start, match.start()),
+                         self._start - 1) + 1
+        word = buffer[word_start:match.start()].lstrip("(\"'“‘").lower()
+        if word in TITLES:
+            return False
+        if word in TRAILING_ABBREVIATIONS or _DOTTED_INITIALS.fullmatch(word):
+            return following.isupper()
+        if len(word) == 1 and word.isalpha():
+            # An initial, as in "J. K. Rowling"
+            return False
+        if word.isdigit() and not buffer[self._start:word_start].strip():
+            # A numbered list item, "1. Drink water"
+            return False
+        return True
+
+
+def _boundaries(buffer: str, pos: int) -> Iterator[re.Match]:
+    """The matches _BOUNDARY.finditer would give, found faster."""
+    search, match = _BOUNDARY_START.search, _BOUNDARY.match
+    while True:
+        candidate = search(buffer, pos)
+        if candidate is None:
+            return
+        found = match(buffer, candidate.start())
+        if found is None:
+            pos = candidate.end()
+        else:
+            yield found
+            pos = found.end()
+
+
+def _tidy(text: str) -> str:
+    """Close up the spaces left where emoji or hashtags were removed."""
+    return _LOOSE_PUNCTUATION.sub(r"\1", _SPACES.sub(" ", text)).strip()
+
+
+def _is_tail_char(char: str) -> bool:
+    code = ord(char)
+    return char.isspace() or char in _TAIL_CHARS or 0x2300 <= code <= 0x2BFF or code >= 0x1F000
+
+
+def segment_sentences(text: str) -> List[Segment]:
+    """Split a whole text into sentences."""
+    segmenter = SentenceSegmenter()
+    return segmenter.feed(text) + segmenter.flush()
+
+
+def truncate_graphemes(text: str, limit: int, ellipsis: str = "…") -> str:
+    """Shorten text to at most limit code points, ending with ellipsis.
+
+    Cuts at the last word boundary that fits, or between graphemes for a
+    single long word, so emoji sequences and accented letters are never split.
+    """
+    if len(text) <= limit:
+        return text
+    budget = limit - len(ellipsis)
+    end, last_space = 0, None
+    for match in _GRAPHEME.finditer(text):
+        if match.end() > budget:
+            break
+        end = match.end()
+        if match.group().isspace():
+            last_space = match.start()
+    cut = text[:last_space if last_space else end].rstrip(" ,;:-")
+    return cut + ellipsis if cut else ""
+
+
+class HashtagCounter:
+    """Counts candidate hashtag words, skipping short words, stopwords and repeats."""
+
+    def __init__(self, min_length: int = 4):
+        self.min_length = min_length
+        self.counts: Dict[str, int] = {}
+
+    def add(self, text: str):
+        counts = self.counts
+        for match in _WORD.finditer(text):
+            word = match.group().lower().replace("'", "").replace("’", "")
+            if len(word) >= self.min_length and word not in STOPWORDS:
+                counts[word] = counts.get(word, 0) + 1
+
+    def top(self, limit: int = 5) -> List[str]:
+        """The most frequent words as hashtags, earlier words first on ties."""
+        counts = self.counts
+        return [f"#{word}" for word in sorted(counts, key=counts.get, reverse=True)[:limit]]
+
+
+def extract_hashtags(text: str, limit: int = 5) -> List[str]:
+    """Hashtags for the most frequent meaningful words in text."""
+    counter = HashtagCounter()
+    counter.add(text)
+    return counter.top(limit)
+
+
+class PostFormatter:
+    """Formats a post for a platform in a single pass, optionally as it streams in.
+
+    rules are a platform's format rules (see platform_rules.py):
+    line_breaks='sentence' puts every sentence on its own line, 'none' keeps
+    the post on one line and 'paragraph' (the default) keeps the source
+    paragraphs, grouping sentences into paragraph_sentences long paragraphs
+    if given. emojis_per_line caps the emoji on each line, max_hashtags caps
+    the hashtags written in the text plus those hashtag_style appends, and
+    max_length and max_words limit the formatted post, less reserve
+    characters kept free for a CTA.
+
+    Sentences that don't fit the limits are dropped; if not even the first
+    one fits, truncation='word' cuts it at a word boundary and
+    truncation='sentence' leaves the post empty (sentences == 0).
+    """
+
+    def __init__(self, rules: Optional[Mapping] = None, paragraph_sentences: Optional[int] = None,
+                 hashtags: Optional[Iterable[str]] = None, reserve: int = 0, truncation: str = 'word',
+                 max_hashtags: int = 5, hashtag_reserve: int = 30):
+        rules = rules or {}
+        self.line_breaks = LINE_BREAK_ALIASES.get(rules.get('line_breaks'), rules.get('line_breaks'))
+        if self.line_breaks not in LINE_BREAK_STYLES:
+            raise ValueError(f"Unknown line_breaks style: {self.line_breaks!r}")
+        self.hashtag_style = rules.get('hashtag_style', False)
+        self.emojis_per_line = rules.get('emojis_per_line')
+        self.max_length = rules.get('max_length')
+        self.max_words = rules.get('max_words')
+        self.paragraph_sentences = paragraph_sentences
+        self.hashtags = list(hashtags) if hashtags else None
+        self.reserve = reserve
+        self.truncation = truncation
+        # Only a platform's own cap limits hashtags written in the text
+        self.hashtag_cap = rules.get('max_hashtags')
+        self.max_hashtags = max_hashtags if self.hashtag_cap is None else min(max_hashtags, self.hashtag_cap)
+
+        self.sentences = 0
+        self.truncated = False
+        self._segmenter = SentenceSegmenter()
+        self._counter = HashtagCounter() if self.hashtag_style and not self.hashtags else None
+        self._parts: List[str] = []
+        self._length = 0
+        self._break = 0
+        self._paragraph_sentences = 0
+        self._line_emojis = 0
+        self._words = 0
+        self._text_hashtags: List[str] = []
+        self._closed = False
+        self._finished = False
+
+        # Characters left for the text itself
+        self.budget = None
+        if self.max_length is not None:
+            self.budget = self.max_length - reserve
+            if self.hashtag_style:
+                # Leave room for the hashtags that finish() appends
+                self.budget -= len(" ".join(self.hashtags)) + 2 if self.hashtags else hashtag_reserve
+
+    @property
+    def text(self) -> str:
+        """Everything formatted so far."""
+        return "".join(self._parts)
+
+    def feed(self, chunk: str) -> str:
+        """Add raw text and return the formatted text it completed."""
+        if self._closed:
+            return ""
+        if (self.budget is None and self.max_words is None) or len(chunk) <= FEED_SLICE:
+            return self._emit(self._segmenter.feed(chunk))
+        # A capped post may fill up early, so don't segment the rest of a long text
+        output = []
+        for start in range(0, len(chunk), FEED_SLICE):
+            output.append(self._emit(self._segmenter.feed(chunk[start:start + FEED_SLICE])))
+            if self._closed:
+                break
+        return "".join(output)
+
+    def finish(self) -> str:
+        """Format the remaining text, append hashtags and return what was added."""
+        if self._finished:
+            return ""
+        self._finished = True
+        output = "" if self._closed else self._emit(self._segmenter.flush())
+        self._closed = True
+
+        if self.hashtag_style:
+            tags = self.hashtags or (self._counter.top(self.max_hashtags) if self._counter else [])
+            # Hashtags already in the text count towards the cap and aren't repeated
+            written = {tag.lower() for tag in self._text_hashtags}
+            tags = [tag for tag in tags if tag.lower() not in written][:max(0, self.max_hashtags - len(written))]
+            limit = self.max_length - self.reserve if self.max_length is not None else None
+            length = self._length + 2
+            kept = []
+            for tag in tags:
+                if limit is not None and length + len(tag) + (1 if kept else 0) > limit:
+                    break
+                length += len(tag) + (1 if kept else 0)
+                kept.append(tag)
+            if kept:
+                block = ("\n\n" if self._parts else "") + " ".join(kept)
+                self._append(block)
+                output += block
+        return output
+
+    def _separator(self) -> str:
+        if not self._parts:
+            return ""
+        if self.line_breaks == 'sentence':
+            return "\n\n"
+        if self.line_breaks == 'none':
+            return " "
+        if self.paragraph_sentences:
+            if self._break == 2 or self._paragraph_sentences >= self.paragraph_sentences:
+                self._paragraph_sentences = 0
+                return "\n\n"
+            return "\n" if self._break == 1 else " "
+        return (" ", "\n", "\n\n")[self._break]
+
+    def _cap_emojis(self, text: str) -> str:
+        def keep(match):
+            self._line_emojis += 1
+            return match.group() if self._line_emojis <= self.emojis_per_line else ""
+        capped = _EMOJI_CLUSTER.sub(keep, text)
+        return _tidy(capped) if capped != text else capped
+
+    def _cap_hashtags(self, text: str) -> str:
+        kept = len(self._text_hashtags)
+
+        def keep(match):
+            nonlocal kept
+            kept += 1
+            return match.group() if kept <= self.hashtag_cap else ""
+        capped = _HASHTAG.sub(keep, text)
+        return _tidy(capped) if capped != text else capped
+
+    def _fits(self, separator: str, text: str) -> bool:
+        if self.budget is not None and self._length + len(separator) + len(text) > self.budget:
+            return False
+        return self.max_words is None or self._words + len(text.split()) <= self.max_words
+
+    def _truncate(self, text: str) -> str:
+        if self.max_words is not None:
+            words = text.split()
+            if len(words) > self.max_words:
+                text = " ".join(words[:self.max_words]) + "…"
+        return text if self.budget is None else truncate_graphemes(text, self.budget)
+
+    def _emit(self, segments: List[Segment]) -> str:
+        output = []
+        for segment in segments:
+            if self._closed:
+                break
+            separator = self._separator()
+            if "\n" in separator:
+                self._line_emojis = 0
+            text = segment.text if self.emojis_per_line is None else self._cap_emojis(segment.text)
+            if self.hashtag_cap is not None and "#" in text:
+                text = self._cap_hashtags(text)
+            if not text:
+                continue
+
+            if not self._fits(separator, text):
+                self.truncated = True
+                self._closed = True
+                if self._parts or self.truncation != 'word':
+                    break
+                text = self._truncate(text)
+                if not text:
+                    break
+
+            if self._counter is not None:
+                self._counter.add(text)
+            self._append(separator + text)
+            output.append(separator + text)
+            self._words += len(text.split())
+            if self.hashtag_cap is not None and "#" in text:
+                self._text_hashtags.extend(_HASHTAG.findall(text))
+            self.sentences += 1
+            self._paragraph_sentences += 1
+            self._break = segment.break_after
+        return "".join(output)
+
+    def _append(self, text: str):
+        self._parts.append(text)
+        self._length += len(text)
+
+
+def format_post(text: str, rules: Optional[Mapping] = None, **options) -> str:
+    """Format a whole post in one call; options are passed to PostFormatter."""
+    formatter = PostFormatter(rules, **options)
+    formatter.feed(text)
+    formatter.finish()
+    return formatter.text
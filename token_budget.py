@@ -0,0 +1,160 @@
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+DEFAULT_LANGUAGE = 'EN'
+# Tokens per word of typical model output. Bahasa Malaysia words are longer
+# and split into more tokens, so the same word count needs ~40% more tokens
+TOKENS_PER_WORD = {'EN': 1.35, 'BM': 1.9}
+# Characters of running text (spaces and punctuation included) per token
+CHARS_PER_TOKEN = {'EN': 4.0, 'BM': 3.0}
+# Letters per token inside a word, for estimate_tokens
+LETTERS_PER_TOKEN = {'EN': 4.5, 'BM': 3.2}
+
+_PIECES = re.compile(r"[^\W\d_]+|\d+|\S")
+
+
+def estimate_tokens(text: str, language: str = DEFAULT_LANGUAGE) -> int:
+    """Approximate the token count of text without the model's tokenizer."""
+    letters_per_token = LETTERS_PER_TOKEN.get(language, LETTERS_PER_TOKEN[DEFAULT_LANGUAGE])
+    tokens = 0
+    for piece in _PIECES.findall(text):
+        first = piece[0]
+        if first.isalpha():
+            tokens += math.ceil(len(piece) / letters_per_token)
+        elif first.isdigit():
+            tokens += math.ceil(len(piece) / 3)
+        else:
+            # Emoji and other symbols take several byte-level tokens
+            tokens += 1 if ord(first) < 0x2000 else 2
+    return tokens
+
+
+class TokenBudget:
+    """Sizes max_tokens from word targets and character limits, and timeouts from learned model throughput.
+
+    Throughput (completion tokens per second) is an exponentially weighted
+    average per model; models without samples use default_tokens_per_second.
+    With a path the averages are saved to a JSON file at most every
+    save_interval seconds, and loaded again on start.
+    """
+
+    def __init__(self, path: Optional[str] = None, headroom: float = 1.2, min_tokens: int = 64,
+                 default_tokens_per_second: float = 30.0, timeout_safety: float = 1.25, base_timeout: float = 5.0,
+                 min_timeout: float = 10.0, max_timeout: float = 180.0, alpha: float = 0.2,
+                 save_interval: float = 30.0):
+        self.path = path
+        self.headroom = headroom
+        self.min_tokens = min_tokens
+        self.default_tokens_per_second = default_tokens_per_second
+        self.timeout_safety = timeout_safety
+        self.base_timeout = base_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.alpha = alpha
+        self.save_interval = save_interval
+        self._models: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        # The first sample is saved straight away, later ones every save_interval
+        self._last_save = float('-inf')
+        if path:
+            self._load()
+
+    def for_words(self, words: int, language: str = DEFAULT_LANGUAGE) -> int:
+        """max_tokens for a post of about this many words."""
+        per_word = TOKENS_PER_WORD.get(language, TOKENS_PER_WORD[DEFAULT_LANGUAGE])
+        return max(self.min_tokens, math.ceil(words * per_word * self.headroom))
+
+    def for_chars(self, chars: int, language: str = DEFAULT_LANGUAGE) -> int:
+        """max_tokens for a post of at most this many characters."""
+        per_token = CHARS_PER_TOKEN.get(language, CHARS_PER_TOKEN[DEFAULT_LANGUAGE])
+        return max(self.min_tokens, math.ceil(chars / per_token * self.headroom))
+
+    def tokens_per_second(self, model: str) -> float:
+        stats = self._models.get(model)
+        return stats['tokens_per_second'] if stats else self.default_tokens_per_second
+
+    def timeout(self, max_tokens: int, models: Iterable[str]) -> float:
+        """Seconds to allow a request for up to max_tokens from the slowest of models."""
+        rate = min(self.tokens_per_second(model) for model in models)
+        seconds = self.base_timeout + self.timeout_safety * max_tokens / rate
+        return round(min(self.max_timeout, max(self.min_timeout, seconds)), 1)
+
+    def observe(self, model: str, completion_tokens: int, seconds: float):
+        """Record a finished completion of completion_tokens that took seconds."""
+        if completion_tokens <= 0 or seconds <= 0:
+            return
+        with self._lock:
+            self._update(model, completion_tokens / seconds)
+        self._maybe_save()
+
+    def observe_timeout(self, models: Iterable[str]):
+        """Halve the throughput of models a request timed out on, so the next timeouts are longer."""
+        with self._lock:
+            for model in models:
+                rate = self.tokens_per_second(model)
+                self._update(model, rate / 2, weight=0.5)
+        self._maybe_save()
+
+    def _update(self, model: str, rate: float, weight: Optional[float] = None):
+        stats = self._models.get(model)
+        if stats is None:
+            self._models[model] = {'tokens_per_second': rate, 'samples': 1}
+        else:
+            alpha = self.alpha if weight is None else weight
+            stats['tokens_per_second'] += alpha * (rate - stats['tokens_per_second'])
+            stats['samples'] += 1
+        self._dirty = True
+
+    def stats(self) -> Dict[str, Dict]:
+        """Learned tokens per second and sample count per model."""
+        with self._lock:
+            return {model: dict(stats) for model, stats in self._models.items()}
+
+    def _maybe_save(self):
+        if self.path and time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
+
+    def save(self):
+        """Write the learned throughput to path, if anything changed since the last save."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'models': {model: dict(stats) for model, stats in self._models.items()}}
+            self._dirty = False
+            self._last_save = time.monotonic()
+        # Write a temporary file and rename it, so a crash never leaves half a file behind
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".token_stats-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Error saving token stats: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Error loading token stats: {e}")
+            return
+        for model, stats in data.get('models', {}).items():
+            if stats.get('tokens_per_second', 0) > 0:
+                self._models[model] = {'tokens_per_second': float(stats['tokens_per_second']),
+                                       'samples': int(stats.get('samples', 0))}